@@ -0,0 +1,253 @@
+"""
+End-to-end throughput benchmark against the local mock Aura endpoint.
+
+Every configuration of the matrix runs in a fresh interpreter (so settings,
+CPU time and peak RSS are isolated) against its own mock server process, and
+reports requests/sec, p50/p95/p99 request latency, CPU seconds, requests per
+CPU second (the throughput one core sustains) and peak RSS.
+
+The event loop and HTTP backend are dimensions of the matrix too:
+
+    python -m benchmarks.bench_crawl --concurrency 1,5,20 --error-rate 0,0.05 --zips 20
+    python -m benchmarks.bench_crawl --loops asyncio,uvloop --transports httpx-h2,httpx-h1,aiohttp --keepalive 0,1
+
+The mock speaks plain HTTP/1.1, so httpx-h2 runs HTTP/1.1 there as well; the
+backends still differ in their own per-request overhead. Combinations whose
+library is not installed are reported as skipped.
+"""
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_one(config: dict) -> dict:
+    """Run a single configuration in this process. Must be called before any crawler import."""
+    workdir = config["workdir"]
+    os.environ.update({
+        "AURA_BASE_URL": config["base_url"],
+        "OUTPUT_PATH": os.path.join(workdir, "raw"),
+        "CACHE_PATH": os.path.join(workdir, "lmdb_cache"),
+        "SEQUENTIAL_FLOW": str(config["detail"]),
+        "PACING_DELAY_MIN": "0",
+        "PACING_DELAY_MAX": "0",
+        "RETRY_BASE_DELAY": str(config["retry_base_delay"]),
+        "PROXY_HOST": "",
+        "TRACE_PATH": "",
+        "EVENT_LOOP": config["loop"],
+        "HTTP_BACKEND": config["transport"],
+        "HTTP_KEEPALIVE": str(config["keepalive"]),
+    })
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(REPO_ROOT)
+
+    import asyncio
+    import logging
+    import resource
+
+    from core import process_listing
+    from core.captcha_router import CaptchaRouter
+    from core.context import AppContext, set_context
+    from core.event_loop import run_async
+
+    for name in list(logging.root.manager.loggerDict):
+        logging.getLogger(name).setLevel(config["log_level"])
+
+    async def stub_solve_captcha() -> str:
+        await asyncio.sleep(config["captcha_ms"] / 1000)
+        return "stub-captcha-token"
+
+    context = AppContext(cache_path=os.path.join(workdir, "lmdb_cache"), base_url=config["base_url"], use_proxy=False,
+                         captcha_router=CaptchaRouter({"stub": stub_solve_captcha}))
+    set_context(context)
+
+    latencies = []
+    original = context.client._request
+
+    async def timed_request(method, endpoint, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await original(method, endpoint, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    context.client._request = timed_request
+
+    with open(os.path.join(REPO_ROOT, "inputs/raw_files/specialities-doctor-types.json")) as f:
+        specialities = [{**d, "type": "Doctor"} for d in json.load(f)][:config["specialties"]]
+    zips = [str(10001 + i * 7).zfill(5) for i in range(config["zips"])]
+
+    async def crawl():
+        semaphore = asyncio.Semaphore(config["concurrency"])
+
+        async def one_zip(zip_code):
+            async with semaphore:
+                await process_listing.search_doctors(search_params={
+                    "zipCode": zip_code,
+                    "planType": "HIP",
+                    "networkCode": "BENCH",
+                    "size": config["page_size"],
+                    "specialities": specialities,
+                    "coverage_type": "M",
+                })
+
+        try:
+            await asyncio.gather(*(one_zip(z) for z in zips))
+        finally:
+            await context.aclose()
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    run_async(crawl())
+    wall = time.perf_counter() - started
+    context.close()
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    latencies.sort()
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    return {
+        "requests": len(latencies),
+        "wall_seconds": round(wall, 3),
+        "requests_per_sec": round(len(latencies) / wall, 2) if wall else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_utilisation": round(cpu / wall, 3) if wall else 0,
+        "requests_per_cpu_sec": round(len(latencies) / cpu, 2) if cpu else 0,
+        "peak_rss_mb": round(usage_after.ru_maxrss / 1024, 1),
+    }
+
+
+def run_config(config: dict, server_args: list[str]) -> dict:
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_aura", "--port", str(port), *server_args],
+        cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        server.stdout.readline()  # "Mock Aura listening on ..."
+        with tempfile.TemporaryDirectory(prefix="emblem-bench-") as workdir:
+            child_config = {**config, "base_url": f"http://127.0.0.1:{port}", "workdir": workdir}
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_crawl", "--run-one", json.dumps(child_config)],
+                cwd=REPO_ROOT, capture_output=True, text=True,
+            )
+        result_lines = [line for line in proc.stdout.splitlines() if line.startswith("RESULT ")]
+        if proc.returncode != 0 or not result_lines:
+            raise RuntimeError(f"Benchmark run failed: {proc.stderr[-2000:]}")
+        return json.loads(result_lines[-1][len("RESULT "):])
+    finally:
+        server.terminate()
+        server.wait()
+
+
+# Library each event loop and HTTP backend needs besides the crawler's requirements.
+OPTIONAL_MODULES = {"uvloop": "uvloop", "aiohttp": "aiohttp"}
+
+
+def missing_modules(*names: str) -> list[str]:
+    modules = [OPTIONAL_MODULES[name] for name in names if name in OPTIONAL_MODULES]
+    return [module for module in modules if importlib.util.find_spec(module) is None]
+
+
+def _bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _csv(cast):
+    return lambda value: [cast(v) for v in value.split(",")]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark crawler throughput against a local mock Aura endpoint.")
+    parser.add_argument("--concurrency", type=_csv(int), default=[1, 5], help="Comma separated zip concurrency levels")
+    parser.add_argument("--error-rate", type=_csv(float), default=[0.0], help="Comma separated mock 503 rates")
+    parser.add_argument("--records", type=_csv(str), default=["120"], help='Comma separated totalRecords specs, "N" or "MIN-MAX"')
+    parser.add_argument("--loops", type=_csv(str), default=["asyncio"], help="Comma separated event loops: asyncio, uvloop")
+    parser.add_argument("--transports", type=_csv(str), default=["httpx-h2"], help="Comma separated HTTP backends: httpx-h2, httpx-h1, aiohttp")
+    parser.add_argument("--keepalive", type=_csv(_bool), default=[False], help="Comma separated HTTP_KEEPALIVE values, e.g. 0,1")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--captcha-ms", type=float, default=0, help="Latency of the stub captcha solver")
+    parser.add_argument("--zips", type=int, default=10)
+    parser.add_argument("--specialties", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--detail", action="store_true", help="Fetch provider details after each listing page")
+    parser.add_argument("--fixtures", default=None, help="Directory with recorded listing/ and detail/ raw files")
+    parser.add_argument("--retry-base-delay", type=float, default=0.05)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", default=None, help="Write all results as JSON to this path")
+    parser.add_argument("--run-one", default=None, help=argparse.SUPPRESS)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.run_one:
+        print("RESULT " + json.dumps(run_one(json.loads(args.run_one))), flush=True)
+        return
+
+    results = []
+    header = (f"{'loop':>7} {'transport':>9} {'ka':>2} {'conc':>5} {'err':>5} {'records':>8} {'reqs':>6} {'req/s':>8} {'p50ms':>8} "
+              f"{'p95ms':>8} {'p99ms':>8} {'cpu_s':>7} {'cpu%':>6} {'req/cpu_s':>9} {'rss_mb':>7}")
+    print(header)
+    matrix = itertools.product(args.loops, args.transports, args.keepalive, args.concurrency, args.error_rate, args.records)
+    for loop, transport, keepalive, concurrency, error_rate, records in matrix:
+        prefix = f"{loop:>7} {transport:>9} {int(keepalive):>2} {concurrency:>5} {error_rate:>5} {records:>8}"
+        missing = missing_modules(loop, transport)
+        if missing:
+            print(f"{prefix} skipped: pip install {' '.join(missing)}", flush=True)
+            continue
+        config = {
+            "loop": loop,
+            "transport": transport,
+            "keepalive": keepalive,
+            "concurrency": concurrency,
+            "zips": args.zips,
+            "specialties": args.specialties,
+            "page_size": args.page_size,
+            "detail": args.detail,
+            "captcha_ms": args.captcha_ms,
+            "retry_base_delay": args.retry_base_delay,
+            "log_level": args.log_level,
+        }
+        server_args = ["--latency-ms", str(args.latency_ms), "--latency-sigma", str(args.latency_sigma),
+                       "--error-rate", str(error_rate), "--records", records]
+        if args.fixtures:
+            server_args += ["--fixtures", args.fixtures]
+
+        result = run_config(config, server_args)
+        results.append({**config, "error_rate": error_rate, "records": records, **result})
+        print(f"{prefix} {result['requests']:>6} {result['requests_per_sec']:>8} "
+              f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8} {result['cpu_seconds']:>7} "
+              f"{result['cpu_utilisation'] * 100:>5.1f}% {result['requests_per_cpu_sec']:>9} {result['peak_rss_mb']:>7}", flush=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
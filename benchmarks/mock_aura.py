@@ -0,0 +1,261 @@
+"""
+Local stand-in for the EmblemHealth Aura endpoint.
+
+Answers the `Member_findDoctor` and `Member_providerDetails` actions posted to
+``/member/s/sfsites/aura`` with recorded or synthetic payloads, after a
+configurable log-normal latency and with a configurable error rate. With
+``--fwuid`` it also rejects requests carrying another framework build with
+``aura:clientOutOfSync`` (``--deploy-after`` switches the build mid-run) and
+serves the current one on the community page. ``--captcha-reject-rate`` and
+``--throttle-rate`` answer searches with a rejected captcha (SUCCESS without
+results) or a Salesforce concurrency limit error.
+
+    python -m benchmarks.mock_aura --port 8765 --latency-ms 80 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import math
+import os
+import random
+from urllib.parse import parse_qs, urlsplit
+
+
+def _stable_int(*parts) -> int:
+    return int.from_bytes(hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=8).digest(), "big")
+
+
+def parse_records_spec(spec: str) -> tuple[int, int]:
+    """``"120"`` -> (120, 120), ``"0-300"`` -> (0, 300)."""
+    low, _, high = str(spec).partition("-")
+    return int(low), int(high or low)
+
+
+class MockAuraServer:
+    """
+    Minimal keep-alive HTTP/1.1 server speaking just enough Aura for the crawler.
+
+    Attributes:
+        latency_ms (float): Median response latency.
+        latency_sigma (float): Sigma of the log-normal latency distribution; 0 makes it constant.
+        error_rate (float): Probability of answering 503 instead of a payload.
+        records (tuple[int, int]): Range of ``totalRecords`` per search, picked deterministically per zip and specialty.
+        fixtures_dir (str | None): Directory holding recorded ``listing/`` and ``detail/`` raw files to replay.
+        fwuid (str | None): Framework build requests must carry; None accepts any.
+        deploy_after (int): After this many requests the expected fwuid changes, as on a Salesforce deploy (0 disables).
+        captcha_reject_rate (float): Probability of answering a search as if its captcha token was rejected.
+        throttle_rate (float): Probability of answering an action with a concurrency limit ERROR.
+        scale_by_distance (bool): Treat ``records`` as the count within 50 miles and scale it with the
+            searched area, so that a smaller ``distance`` returns fewer providers.
+    """
+
+    def __init__(self, latency_ms: float = 50, latency_sigma: float = 0.5, error_rate: float = 0.0,
+                 records: tuple[int, int] = (120, 120), fixtures_dir: str | None = None, seed: int = 0,
+                 fwuid: str | None = None, deploy_after: int = 0, captcha_reject_rate: float = 0.0,
+                 throttle_rate: float = 0.0, scale_by_distance: bool = False):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.records = records
+        self.random = random.Random(seed)
+        self.listing_fixtures = []
+        self.detail_fixtures = []
+        self.requests = 0
+        self.errors = 0
+        self.initial_fwuid = fwuid
+        self.deploy_after = deploy_after
+        self.out_of_sync = 0
+        self.captcha_reject_rate = captcha_reject_rate
+        self.throttle_rate = throttle_rate
+        self.captcha_rejected = 0
+        self.throttled = 0
+        self.scale_by_distance = scale_by_distance
+        if fixtures_dir:
+            self._load_fixtures(fixtures_dir)
+
+    def _load_fixtures(self, fixtures_dir: str):
+        for path in sorted(glob.glob(os.path.join(fixtures_dir, "listing", "**", "*.json"), recursive=True)):
+            with open(path) as f:
+                self.listing_fixtures.append(json.load(f))
+        for path in sorted(glob.glob(os.path.join(fixtures_dir, "detail", "**", "*.json"), recursive=True)):
+            with open(path) as f:
+                body = json.load(f).get("body", "")
+            for action in json.loads(body).get("actions", []):
+                return_value = (action.get("returnValue") or {}).get("returnValue")
+                if return_value:
+                    self.detail_fixtures.append(json.loads(return_value).get("IPResult"))
+
+    def _latency(self) -> float:
+        median = self.latency_ms / 1000
+        if self.latency_sigma <= 0:
+            return median
+        return self.random.lognormvariate(math.log(median), self.latency_sigma) if median > 0 else 0
+
+    def _total_records(self, zip_code: str, specialty: str, distance: str = "50mi") -> int:
+        low, high = self.records
+        total = low + _stable_int(zip_code, specialty) % (high - low + 1)
+        if self.scale_by_distance:
+            miles = float(str(distance).removesuffix("mi") or 50)
+            total = round(total * (miles / 50) ** 2)
+        return total
+
+    def find_doctor(self, params: dict) -> dict:
+        zip_code = str(params.get("zipCode", ""))
+        specialty = str(params.get("providerSpeciality", ""))
+        start = int(params.get("from", 0))
+        size = int(params.get("size", 50))
+        total = self._total_records(zip_code, specialty, params.get("distance", "50mi"))
+        count = max(0, min(size, total - start))
+
+        if self.listing_fixtures:
+            template = self.listing_fixtures[_stable_int(zip_code, specialty, start) % len(self.listing_fixtures)]
+            pool = template.get("providerList") or [{}]
+            providers = [dict(pool[i % len(pool)]) for i in range(count)]
+        else:
+            providers = [{} for _ in range(count)]
+
+        for i, provider in enumerate(providers):
+            # Zips sharing a 3-digit prefix share providers, like neighbouring real searches do.
+            index = start + i
+            provider["ProviderId"] = f"{specialty[:8]}-{zip_code[:3]}-{index}".replace(" ", "")
+            provider.setdefault("providerFullName", f"Provider {zip_code[:3]} {index}")
+        return {"totalRecords": total, "providerList": providers}
+
+    def provider_details(self, params: dict) -> dict:
+        provider_id = str(params.get("providerId", ""))
+        if self.detail_fixtures:
+            detail = dict(self.detail_fixtures[_stable_int(provider_id) % len(self.detail_fixtures)])
+        else:
+            detail = {"providerName": f"Provider {provider_id}", "locations": [{"address": "1 Main St", "zip": "10001"}] * 3}
+        detail["ProviderId"] = provider_id
+        return detail
+
+    @property
+    def fwuid(self) -> str | None:
+        if self.initial_fwuid and self.deploy_after and self.requests > self.deploy_after:
+            return f"{self.initial_fwuid}-next"
+        return self.initial_fwuid
+
+    def community_page(self) -> bytes:
+        config = {"context": {"mode": "PROD", "fwuid": self.fwuid, "app": "siteforce:communityApp",
+                              "loaded": {"APPLICATION@markup://siteforce:communityApp": f"{self.fwuid}-app"}}}
+        return f"<html><head><script>window.Aura = {json.dumps(config)};</script></head></html>".encode()
+
+    def handle_aura(self, body: bytes) -> bytes:
+        form = parse_qs(body.decode(), keep_blank_values=True)
+        if self.fwuid and json.loads(form["aura.context"][0]).get("fwuid") != self.fwuid:
+            self.out_of_sync += 1
+            return json.dumps({"event": {"descriptor": "markup://aura:clientOutOfSync", "attributes": {"values": {}}},
+                               "exceptionEvent": True}).encode()
+        message = json.loads(form["message"][0])
+        actions = []
+        for action in message.get("actions", []):
+            apex = action["params"]["params"]
+            params = json.loads(apex.get("input") or "{}")
+            method = apex.get("sMethodName")
+            if self.random.random() < self.throttle_rate:
+                self.throttled += 1
+                actions.append({"id": action.get("id"), "state": "ERROR", "returnValue": None,
+                                "error": [{"message": "ConcurrentPerOrgLongTxn Limit exceeded", "exceptionType": "System.LimitException"}]})
+                continue
+            if method == "Member_findDoctor" and self.random.random() < self.captcha_reject_rate:
+                self.captcha_rejected += 1
+                actions.append({"id": action.get("id"), "state": "SUCCESS",
+                                "returnValue": {"returnValue": json.dumps({"error": "Invalid captcha response"}), "cacheable": False},
+                                "error": []})
+                continue
+            if method == "Member_findDoctor":
+                result = self.find_doctor(params)
+            elif method == "Member_providerDetails":
+                result = self.provider_details(params)
+            else:
+                actions.append({"id": action.get("id"), "state": "ERROR", "returnValue": None, "error": [{"message": f"Unknown method {method}"}]})
+                continue
+            actions.append({
+                "id": action.get("id"),
+                "state": "SUCCESS",
+                "returnValue": {"returnValue": json.dumps({"IPResult": result}), "cacheable": False},
+                "error": [],
+            })
+        return json.dumps({"actions": actions, "context": {"mode": "PROD"}}).encode()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+
+                self.requests += 1
+                await asyncio.sleep(self._latency())
+
+                method, target = request_line.decode("latin-1").split(" ")[:2]
+                path = urlsplit(target).path
+                if self.random.random() < self.error_rate:
+                    self.errors += 1
+                    status, payload = "503 Service Unavailable", b"upstream unavailable"
+                elif method == "POST" and path.endswith("/sfsites/aura"):
+                    status, payload = "200 OK", self.handle_aura(body)
+                elif method == "GET" and self.initial_fwuid and path.endswith("/s/find-care-plans"):
+                    status, payload = "200 OK", self.community_page()
+                else:
+                    status, payload = "404 Not Found", b"not found"
+
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json;charset=UTF-8\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run a local mock Aura endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--records", default="120", help='totalRecords per search, "N" or "MIN-MAX"')
+    parser.add_argument("--fixtures", default=None, help="Directory with recorded listing/ and detail/ raw files")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fwuid", default=None, help="Reject requests carrying another aura.context fwuid")
+    parser.add_argument("--deploy-after", type=int, default=0, help="Switch to a new fwuid after this many requests")
+    parser.add_argument("--captcha-reject-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--scale-by-distance", action="store_true", help="Scale --records (counts within 50mi) with the searched distance")
+    return parser
+
+
+async def _serve(args):
+    server = MockAuraServer(args.latency_ms, args.latency_sigma, args.error_rate,
+                            parse_records_spec(args.records), args.fixtures, args.seed, args.fwuid, args.deploy_after,
+                            args.captcha_reject_rate, args.throttle_rate, args.scale_by_distance)
+    srv = await server.start(args.host, args.port)
+    print(f"Mock Aura listening on http://{args.host}:{args.port}", flush=True)
+    async with srv:
+        await srv.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_serve(build_parser().parse_args()))
+    except KeyboardInterrupt:
+        pass
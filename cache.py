@@ -116,6 +116,21 @@ class CacheHandler:
         """
         return not self.check_if_new(key)
 
+    def exists_many(self, keys) -> list:
+        """
+        Check several keys in a single read transaction.
+
+        Args:
+            keys: Iterable of keys to check
+
+        Returns:
+            list: True for each key that exists, in the order of ``keys``
+        """
+        self._ensure_open()
+
+        with self.env.begin(self.db) as txn:
+            return [txn.get(self._to_bytes(key)) is not None for key in keys]
+
     def get(self, key: Union[str, bytes], default: Optional[bytes] = None) -> Optional[bytes]:
         """
         Get a value from the cache.
@@ -134,6 +149,21 @@ class CacheHandler:
             result = txn.get(key_bytes)
             return result if result is not None else default
 
+    def get_many(self, keys) -> list:
+        """
+        Get several values in a single read transaction.
+
+        Args:
+            keys: Iterable of keys to retrieve
+
+        Returns:
+            list: The values as bytes (None for missing keys), in the order of ``keys``
+        """
+        self._ensure_open()
+
+        with self.env.begin(self.db) as txn:
+            return [txn.get(self._to_bytes(key)) for key in keys]
+
     def get_str(self, key: Union[str, bytes], default: Optional[str] = None) -> Optional[str]:
         """
         Get a value from the cache as a string.
@@ -176,6 +206,30 @@ class CacheHandler:
             print(f"Error setting cache key {key}: {e}")
             return False
 
+    def set_many(self, items) -> bool:
+        """
+        Store many key-value pairs in a single write transaction.
+        
+        Args:
+            items: Iterable of (key, value) pairs
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self._ensure_open()
+        
+        if self.readonly:
+            raise RuntimeError("Cannot write to a read-only cache")
+
+        try:
+            with self.env.begin(self.db, write=True) as txn:
+                for key, value in items:
+                    txn.put(self._to_bytes(key), self._to_bytes(value))
+            return True
+        except Exception as e:
+            print(f"Error setting cache keys: {e}")
+            return False
+
     def set_json(self, key: Union[str, bytes], value: dict) -> bool:
         """
         Store a JSON-serializable object in the cache.
@@ -215,6 +269,37 @@ class CacheHandler:
             print(f"Error deserializing JSON for key {key}: {e}")
             return default
 
+    def update_json(self, key: Union[str, bytes], update) -> Optional[dict]:
+        """
+        Read, modify and store a JSON object in a single write transaction.
+
+        LMDB serialises write transactions, also across processes, so
+        concurrent updates of the same key are not lost.
+
+        Args:
+            key: The key to update
+            update: Function called with the stored object (None if missing)
+                and returning the object to store
+
+        Returns:
+            The stored object, or None if the update failed
+        """
+        self._ensure_open()
+
+        if self.readonly:
+            raise RuntimeError("Cannot write to a read-only cache")
+
+        key_bytes = self._to_bytes(key)
+        try:
+            with self.env.begin(self.db, write=True) as txn:
+                current = txn.get(key_bytes)
+                value = update(json.loads(current) if current is not None else None)
+                txn.put(key_bytes, json.dumps(value).encode("utf-8"))
+            return value
+        except Exception as e:
+            print(f"Error updating cache key {key}: {e}")
+            return None
+
     def set_pickle(self, key: Union[str, bytes], value: any) -> bool:
         """
         Store a Python object using pickle.
@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+from core.archive import compact_shard
+from core.outputs import shard_of, read_raw, detail_filename
+from logger.logger import get_logger
+from settings import OUTPUT_PATH
+
+logger = get_logger("Compact")
+
+KINDS = ("listing", "detail")
+_HEX = set("0123456789abcdef")
+
+
+def loose_by_shard(kind: str):
+    """
+    Yield ``(shard, paths)`` of the loose raw files of ``kind``, one first-level shard at a time.
+
+    Files of the flat layout used before sharding are grouped by the shard their name hashes to.
+    """
+    root = os.path.join(OUTPUT_PATH, kind)
+    if not os.path.isdir(root):
+        return
+    flat = defaultdict(list)
+    shards = []
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(".json"):
+                flat[shard_of(entry.name)[0]].append(entry.path)
+            elif entry.is_dir() and len(entry.name) == 2 and set(entry.name) <= _HEX:
+                shards.append(entry.name)
+
+    for shard in sorted(set(shards) | set(flat)):
+        paths = flat.pop(shard, [])
+        for dirpath, _, filenames in os.walk(os.path.join(root, shard)):
+            paths.extend(os.path.join(dirpath, filename) for filename in filenames if filename.endswith(".json"))
+        yield shard, paths
+
+
+def _remove_empty_dirs(root: str):
+    for dirpath, _, _ in sorted(os.walk(root), key=lambda entry: -len(entry[0])):
+        if dirpath != root:
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+
+def compact(kinds: tuple = KINDS, min_age: float = 3600, keep_loose: bool = False) -> dict:
+    """
+    Pack the loose raw files under OUTPUT_PATH into one indexed pack per first-level shard.
+
+    Args:
+        kinds (tuple): Which raw outputs to compact, any of "listing" and "detail".
+        min_age (float): Leave shards with files younger than this many seconds loose.
+        keep_loose (bool): Keep the loose files after packing them.
+
+    Returns:
+        dict: Counters of packed, duplicate, carried, removed files and skipped shards per kind.
+    """
+    stats = {kind: {"packed": 0, "duplicates": 0, "carried": 0, "removed": 0, "skipped": 0} for kind in kinds}
+    for kind in kinds:
+        for shard, paths in loose_by_shard(kind):
+            for key, value in compact_shard(os.path.join(OUTPUT_PATH, kind), shard, paths, min_age, keep_loose).items():
+                stats[kind][key] += value
+        if not keep_loose:
+            _remove_empty_dirs(os.path.join(OUTPUT_PATH, kind))
+        logger.info(f"Compacted {kind}: {stats[kind]}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack loose raw outputs into indexed archives, or read one record back.")
+    parser.add_argument("--kind", choices=KINDS, action="append", help="Compact only this kind of raw output (repeatable)")
+    parser.add_argument("--min-age", type=float, default=3600, help="Leave shards with files younger than this many seconds loose (default: 3600)")
+    parser.add_argument("--keep-loose", action="store_true", help="Keep the loose files after packing")
+    parser.add_argument("--get", metavar="KEY", help="Print a saved record instead: a ProviderId with --kind detail, a listing filename with --kind listing")
+    args = parser.parse_args()
+
+    if args.get:
+        kind = (args.kind or ["detail"])[0]
+        content = read_raw(kind, detail_filename(args.get) if kind == "detail" else args.get)
+        if content is None:
+            sys.exit(f"No {kind} record for {args.get}")
+        sys.stdout.write(content.decode("utf-8") + "\n")
+    else:
+        compact(tuple(args.kind or KINDS), args.min_age, args.keep_loose)
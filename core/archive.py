@@ -0,0 +1,255 @@
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+from logger.logger import get_logger
+
+logger = get_logger("Archive")
+
+MAGIC = b"EMBPACK1"
+_RECORD = struct.Struct("<IIQ")     # key length, value length, mtime
+_SLOT = struct.Struct("<QQ")        # key hash (0 marks an empty slot), record offset
+_FOOTER = struct.Struct("<QQQ8s")   # index offset, slots, records, magic
+
+
+def key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+class PackWriter:
+    """
+    Writes a pack: raw records followed by an open-addressing index over their keys.
+
+    Layout (little endian)::
+
+        "EMBPACK1"
+        record*   key length u32 | value length u32 | mtime u64 | key | value
+        slot*     key hash u64 | record offset u64     (power of two slots, at most half full)
+        footer    index offset u64 | slots u64 | records u64 | "EMBPACK1"
+
+    The pack is written to a temporary file and moved into place on `close`, so data and
+    index are replaced together and readers never see a partial pack.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._tmp = f"{path}.tmp"
+        self._file = open(self._tmp, "wb")
+        self._file.write(MAGIC)
+        self._offset = len(MAGIC)
+        self._offsets = {}
+
+    def add(self, key: str, value: bytes, mtime: float = 0):
+        """Append a record. Keys must be unique within a pack."""
+        key_bytes = key.encode("utf-8")
+        if key_bytes in self._offsets:
+            raise ValueError(f"Duplicate key in pack: {key}")
+        self._file.write(_RECORD.pack(len(key_bytes), len(value), int(mtime)))
+        self._file.write(key_bytes)
+        self._file.write(value)
+        self._offsets[key_bytes] = self._offset
+        self._offset += _RECORD.size + len(key_bytes) + len(value)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def close(self):
+        slots = 1 << max(3, (2 * len(self._offsets) - 1).bit_length())
+        mask = slots - 1
+        table = bytearray(slots * _SLOT.size)
+        for key, offset in self._offsets.items():
+            h = key_hash(key)
+            i = h & mask
+            while _SLOT.unpack_from(table, i * _SLOT.size)[0]:
+                i = (i + 1) & mask
+            _SLOT.pack_into(table, i * _SLOT.size, h, offset)
+
+        self._file.write(table)
+        self._file.write(_FOOTER.pack(self._offset, slots, len(self._offsets), MAGIC))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp)
+
+
+class PackReader:
+    """
+    Memory-mapped read access to a pack written by `PackWriter`.
+
+    `get` hashes the key and probes the index, so a lookup touches a couple of pages
+    whatever the size of the pack. Iterating scans the records in write order.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < len(MAGIC) + _FOOTER.size or self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"Not a pack file: {path}")
+        self._index_offset, self._slots, self.count, magic = _FOOTER.unpack_from(self._map, len(self._map) - _FOOTER.size)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"Truncated pack file: {path}")
+
+    def __enter__(self) -> "PackReader":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        self._map.close()
+
+    def read(self, offset: int) -> tuple[str, bytes, int]:
+        """The ``(key, value, mtime)`` of the record at ``offset``."""
+        key_length, value_length, mtime = _RECORD.unpack_from(self._map, offset)
+        start = offset + _RECORD.size
+        key = self._map[start:start + key_length].decode("utf-8")
+        return key, self._map[start + key_length:start + key_length + value_length], mtime
+
+    def offset_of(self, key: str) -> int | None:
+        key_bytes = key.encode("utf-8")
+        h = key_hash(key_bytes)
+        mask = self._slots - 1
+        i = h & mask
+        while True:
+            slot_hash, offset = _SLOT.unpack_from(self._map, self._index_offset + i * _SLOT.size)
+            if slot_hash == 0:
+                return None
+            if slot_hash == h:
+                key_length = _RECORD.unpack_from(self._map, offset)[0]
+                start = offset + _RECORD.size
+                if self._map[start:start + key_length] == key_bytes:
+                    return offset
+            i = (i + 1) & mask
+
+    def get(self, key: str) -> bytes | None:
+        """The value stored under ``key``, or None."""
+        record = self.record(key)
+        return None if record is None else record[1]
+
+    def record(self, key: str) -> tuple[str, bytes, int] | None:
+        """The ``(key, value, mtime)`` stored under ``key``, or None."""
+        offset = self.offset_of(key)
+        return None if offset is None else self.read(offset)
+
+    def __contains__(self, key: str) -> bool:
+        return self.offset_of(key) is not None
+
+    def __iter__(self):
+        """Yield ``(key, offset, mtime)`` of every record."""
+        offset = len(MAGIC)
+        while offset < self._index_offset:
+            key_length, value_length, mtime = _RECORD.unpack_from(self._map, offset)
+            start = offset + _RECORD.size
+            yield self._map[start:start + key_length].decode("utf-8"), offset, mtime
+            offset = start + key_length + value_length
+
+
+_readers: dict[str, tuple[tuple, PackReader]] = {}
+
+
+def open_pack(path: str) -> PackReader | None:
+    """
+    A cached reader of the pack at ``path``, reopened when compaction replaced the file; None if there is none.
+
+    The reader of a replaced pack is dropped from the cache but not closed: a caller may still
+    hold it, and its mapping of the old file stays valid until the last reference goes away.
+    Offsets of one reader are meaningless in another, so keep the reader you took them from,
+    or address records by key.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    identity = (stat.st_ino, stat.st_mtime_ns)
+    cached = _readers.get(path)
+    if cached and cached[0] == identity:
+        return cached[1]
+    reader = PackReader(path)
+    _readers[path] = (identity, reader)
+    return reader
+
+
+def compact_shard(root: str, shard: str, loose: list[str], min_age: float = 3600, keep_loose: bool = False) -> dict:
+    """
+    Pack the loose files of one shard into ``{root}/{shard}.pack``.
+
+    The loose files are merged with the records already packed (a loose file replaces the
+    packed record of the same name), the new pack is swapped in, and the loose files are
+    removed unless they were modified in the meantime. When a file exists both in the flat
+    layout of older runs and in its shard directory, the newest copy is packed (the sharded
+    one on a tie) and the other is removed with it.
+
+    Args:
+        root (str): Directory of one kind of raw output, e.g. ``outputs/raw/detail``.
+        shard (str): First shard level, two hex digits.
+        loose (list[str]): Paths of the loose files belonging to the shard.
+        min_age (float): Skip the shard if any loose file is younger than this, in seconds;
+            it is presumably still being written.
+        keep_loose (bool): Keep the loose files after packing.
+
+    Returns:
+        dict: ``packed`` loose files, ``duplicates`` older copies of them left out,
+        ``carried`` records from the previous pack, ``removed`` loose files, and
+        ``skipped`` (1 if the shard was too recent).
+    """
+    stats = {"packed": 0, "duplicates": 0, "carried": 0, "removed": 0, "skipped": 0}
+    if not loose:
+        return stats
+    mtimes = {path: os.stat(path).st_mtime for path in loose}
+    if max(mtimes.values()) > time.time() - min_age:
+        stats["skipped"] = 1
+        return stats
+
+    newest = {}
+    for path in loose:
+        name = os.path.basename(path)
+        # Deeper paths are the sharded copies; they win over flat ones of the same age.
+        rank = (mtimes[path], path.count(os.sep))
+        if name not in newest or rank > newest[name][0]:
+            newest[name] = (rank, path)
+    stats["duplicates"] = len(loose) - len(newest)
+
+    pack_path = os.path.join(root, f"{shard}.pack")
+    previous = PackReader(pack_path) if os.path.exists(pack_path) else None
+    writer = PackWriter(pack_path)
+    try:
+        names = set()
+        for name, (_, path) in sorted(newest.items()):
+            with open(path, "rb") as f:
+                writer.add(name, f.read(), mtimes[path])
+            names.add(name)
+            stats["packed"] += 1
+        if previous is not None:
+            for key, offset, mtime in previous:
+                if key not in names:
+                    writer.add(key, previous.read(offset)[1], mtime)
+                    stats["carried"] += 1
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if previous is not None:
+            previous.close()
+
+    if not keep_loose:
+        for path, mtime in mtimes.items():
+            try:
+                if os.stat(path).st_mtime == mtime:
+                    os.remove(path)
+                    stats["removed"] += 1
+            except FileNotFoundError:
+                pass
+    return stats
@@ -0,0 +1,338 @@
+import asyncio
+import json
+import re
+import time
+from dataclasses import dataclass, field, replace
+from urllib.parse import quote, unquote, urlencode
+
+from logger.logger import get_logger
+from .metrics import AURA_CONTEXT_REFRESHES
+from .radius import DEFAULT_DISTANCE
+from settings import AURA_FWUID, AURA_APP, AURA_APP_VERSION, AURA_COMMUNITY_PATH, AURA_REFRESH_COOLDOWN
+
+logger = get_logger("AuraRequest")
+
+_SPLICE_RE = re.compile(r"__SPLICE_(\w+?)__")
+# Values made only of these characters are unchanged by JSON escaping and url-encoding (captcha tokens, ids, zips).
+_VERBATIM_RE = re.compile(r"[A-Za-z0-9_.~-]*")
+# A string sentinel inside the action input ends up wrapped in these (an escaped, url-encoded quote).
+_NESTED_QUOTE = "%5C%22"
+
+
+def _compact(value) -> str:
+    return json.dumps(value, separators=(',', ':'))
+
+
+@dataclass(frozen=True)
+class AuraContext:
+    """
+    The ``aura.context`` form field, identifying the Salesforce framework build and app version.
+
+    The encoded form is computed once; every request of a run shares it.
+    """
+    fwuid: str = AURA_FWUID
+    app: str = AURA_APP
+    app_version: str = AURA_APP_VERSION
+    mode: str = "PROD"
+    encoded: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        context = {
+            "mode": self.mode,
+            "fwuid": self.fwuid,
+            "app": self.app,
+            "loaded": {
+                f"APPLICATION@markup://{self.app}": self.app_version
+            },
+            "dn": [],
+            "globals": {},
+            "uad": True
+        }
+        object.__setattr__(self, "encoded", quote(_compact(context), safe=''))
+
+
+_aura_context = AuraContext()
+
+
+def get_aura_context() -> AuraContext:
+    """The Aura context used by new requests."""
+    return _aura_context
+
+
+def set_aura_context(context: AuraContext):
+    """Swap the Aura context used by new requests, e.g. after a framework update."""
+    global _aura_context
+    _aura_context = context
+
+
+def is_out_of_sync(body: str) -> bool:
+    """True if an Aura response rejects the request's framework build (``aura:clientOutOfSync``)."""
+    return "clientOutOfSync" in body
+
+
+def _aura_json(body: str) -> dict | None:
+    # Aura may prefix its JSON with an anti-hijacking guard.
+    start = body.find("{")
+    try:
+        return json.loads(body[start:]) if start >= 0 else None
+    except ValueError:
+        return None
+
+
+def context_from_payload(body: str, current: AuraContext) -> AuraContext | None:
+    """The context announced in an Aura response's ``context`` object, if it carries a fwuid."""
+    payload = _aura_json(body) or {}
+    context = payload.get("context") or {}
+    fwuid = context.get("fwuid")
+    if not fwuid:
+        return None
+    app_version = (context.get("loaded") or {}).get(f"APPLICATION@markup://{current.app}", current.app_version)
+    return replace(current, fwuid=fwuid, app_version=app_version)
+
+
+def context_from_page(html: str, current: AuraContext) -> AuraContext | None:
+    """
+    The context the community page bootstraps with. It appears in the inline Aura config
+    and, url-encoded, in the ``app.js`` bootstrap URL.
+    """
+    text = unquote(html)
+    fwuid = re.search(r'"fwuid"\s*:\s*"([^"]+)"', text)
+    if not fwuid:
+        return None
+    app_version = re.search(rf'"APPLICATION@markup://{re.escape(current.app)}"\s*:\s*"([^"]+)"', text)
+    return replace(current, fwuid=fwuid.group(1), app_version=app_version.group(1) if app_version else current.app_version)
+
+
+class _ContextRefresher:
+    """Single-flight refresh of the process-wide Aura context."""
+
+    def __init__(self):
+        self._lock = None
+        self._loop = None
+        self._failed_at = 0.0
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        return self._lock
+
+    async def refresh(self, client, stale: AuraContext, body: str) -> bool:
+        """
+        Replace ``stale`` with the current context, read from ``body`` or else the community page.
+
+        Concurrent callers wait for the first one, and see its result. After a failed refresh,
+        callers give up without fetching again for AURA_REFRESH_COOLDOWN seconds.
+
+        Returns:
+            bool: True if a context different from ``stale`` is now in use.
+        """
+        async with self._get_lock():
+            if get_aura_context() != stale:
+                return True
+            if time.monotonic() - self._failed_at < AURA_REFRESH_COOLDOWN:
+                return False
+
+            context, source = context_from_payload(body, stale), "payload"
+            if context is None or context == stale:
+                page = await client._request("GET", AURA_COMMUNITY_PATH)
+                context, source = (context_from_page(page["body"], stale) if page else None), "page"
+
+            if context is None or context == stale:
+                self._failed_at = time.monotonic()
+                AURA_CONTEXT_REFRESHES.inc(source="failed")
+                logger.error("aura.context is out of sync and no newer fwuid could be found; update AURA_FWUID/AURA_APP_VERSION")
+                return False
+
+            set_aura_context(context)
+            AURA_CONTEXT_REFRESHES.inc(source=source)
+            logger.warning(f"aura.context refreshed from the {source}: fwuid {context.fwuid} | app version {context.app_version}")
+            return True
+
+
+_refresher = _ContextRefresher()
+
+
+async def post_aura(client, url: str, render, headers: dict) -> dict:
+    """
+    POST an Aura action and re-send it once with a refreshed context if the framework build went stale.
+
+    Args:
+        client (BaseClient): The client to send with.
+        url (str): The Aura endpoint path.
+        render (callable): Builds the form body for a given `AuraContext`.
+        headers (dict): Request headers.
+
+    Returns:
+        dict: The `BaseClient._request` result. Callers should stop retrying when its
+            body is still `is_out_of_sync`, as further attempts are bound to fail.
+    """
+    context = get_aura_context()
+    response = await client._request("POST", url, content=render(context), headers=headers)
+    if response and is_out_of_sync(response["body"]):
+        logger.warning(f"aura.context out of sync (fwuid {context.fwuid})")
+        if await _refresher.refresh(client, context, response["body"]):
+            response = await client._request("POST", url, content=render(get_aura_context()), headers=headers)
+    return response
+
+
+class Slot:
+    """A variable field of an action input. ``numeric`` values are spliced unquoted (JSON numbers)."""
+
+    def __init__(self, name: str, numeric: bool = False):
+        self.name = name
+        self.numeric = numeric
+
+
+class AuraActionTemplate:
+    """
+    A pre-encoded ``ApexActionController/ACTION$execute`` form body with splice points.
+
+    The body is ``message``, ``aura.context``, ``aura.pageURI`` and ``aura.token`` url-encoded,
+    where ``message`` is a JSON document whose action input is itself a JSON string. The
+    template is compiled once by encoding the action with sentinel values, so rendering only
+    encodes the variable fields and joins byte-identical output to building and encoding the
+    whole payload per request.
+
+    Example:
+        >>> template = AuraActionTemplate("Member_providerDetails", {"providerId": Slot("providerId"), "tenantId": "EH"})
+        >>> body = template.render(action_id="198;a", providerId="0012")
+    """
+
+    def __init__(self, method_name: str, input_fields: dict):
+        """
+        Args:
+            method_name (str): The integration procedure (``sMethodName``), e.g. ``Member_findDoctor``.
+            input_fields (dict): The action input in order; `Slot` values are filled in per request.
+        """
+        self.method_name = method_name
+        self.numeric = {value.name for value in input_fields.values() if isinstance(value, Slot) and value.numeric}
+        self.fields = [value.name for value in input_fields.values() if isinstance(value, Slot)]
+
+        inputs = {
+            key: f"__SPLICE_{value.name}__" if isinstance(value, Slot) else value
+            for key, value in input_fields.items()
+        }
+        message = {
+            "actions": [{
+                "id": "__SPLICE_action_id__",
+                "descriptor": "aura://ApexActionController/ACTION$execute",
+                "callingDescriptor": "UNKNOWN",
+                "params": {
+                    "namespace": "vlocity_ins",
+                    "classname": "BusinessProcessDisplayController",
+                    "method": "GenericInvoke2NoCont",
+                    "params": {
+                        "input": _compact(inputs),
+                        "options": "{}",
+                        "sClassName": "vlocity_ins.IntegrationProcedureService",
+                        "sMethodName": method_name,
+                    },
+                    "cacheable": False,
+                    "isContinuation": False,
+                },
+            }]
+        }
+        encoded = urlencode({
+            "message": _compact(message),
+            "aura.context": "__SPLICE_aura_context__",
+            "aura.pageURI": '',
+            "aura.token": "null"
+        }, quote_via=quote)
+        for name in self.numeric:
+            encoded = encoded.replace(f"{_NESTED_QUOTE}__SPLICE_{name}__{_NESTED_QUOTE}", f"__SPLICE_{name}__")
+
+        # parts alternates literal text and slot names: [text, name, text, name, ..., text]
+        self.parts = _SPLICE_RE.split(encoded)
+
+    @staticmethod
+    def encode_input_value(value) -> str:
+        """Encode a string of the action input: JSON-escaped twice (input, then message) and url-encoded."""
+        value = str(value)
+        if _VERBATIM_RE.fullmatch(value):
+            return value
+        return quote(json.dumps(json.dumps(value)[1:-1])[1:-1], safe='')
+
+    @staticmethod
+    def encode_message_value(value) -> str:
+        """Encode a string of the message itself (the action id): JSON-escaped once and url-encoded."""
+        value = str(value)
+        if _VERBATIM_RE.fullmatch(value):
+            return value
+        return quote(json.dumps(value)[1:-1], safe='')
+
+    def render(self, action_id: str, context: AuraContext | None = None, **values) -> bytes:
+        """
+        Build the form body.
+
+        Args:
+            action_id (str): The Aura action id, e.g. ``"188;a"``.
+            context (AuraContext | None): Defaults to the current `get_aura_context()`.
+            **values: One value per `Slot` of the template.
+
+        Returns:
+            bytes: The ``application/x-www-form-urlencoded`` body.
+        """
+        encoded = {
+            "action_id": self.encode_message_value(action_id),
+            "aura_context": (context or _aura_context).encoded,
+        }
+        for name in self.fields:
+            value = values[name]
+            encoded[name] = _compact(value) if name in self.numeric else self.encode_input_value(value)
+
+        parts = self.parts
+        out = [parts[0]]
+        for i in range(1, len(parts), 2):
+            out.append(encoded[parts[i]])
+            out.append(parts[i + 1])
+        return "".join(out).encode("ascii")
+
+
+FIND_DOCTOR = AuraActionTemplate("Member_findDoctor", {
+    "lastName": Slot("lastName"),
+    "tenantId": "EH",
+    "planId": "",
+    "planType": Slot("planType"),
+    "firstName": Slot("firstName"),
+    "ServiceType": Slot("ServiceType"),
+    "networkId": "",
+    "networkCode": Slot("networkCode"),
+    "distance": Slot("distance"),
+    "zipCode": Slot("zipCode"),
+    "providerSpeciality": Slot("providerSpeciality"),
+    "from": Slot("from", numeric=True),
+    "size": Slot("size", numeric=True),
+    "fhn": "",
+    "captchaResp": Slot("captchaResp"),
+})
+
+PROVIDER_DETAILS = AuraActionTemplate("Member_providerDetails", {
+    "providerId": Slot("providerId"),
+    "tenantId": "EH",
+    "planType": Slot("planType"),
+    "networkCode": Slot("networkCode"),
+    "fhn": "",
+    "ServiceType": Slot("ServiceType"),
+    "providerSpeciality": ""
+})
+
+
+def find_doctor_body(action_id: str, *, zip_code: str, specialty: str, service_type: str, plan_type: str,
+                     network_code: str, start: int, size: int, captcha_token: str, distance: str = DEFAULT_DISTANCE,
+                     first_name: str = "", last_name: str = "", context: AuraContext | None = None) -> bytes:
+    """Form body of a provider listing search (``Member_findDoctor``). A missing captcha token is sent as ``""``."""
+    return FIND_DOCTOR.render(
+        action_id, context,
+        lastName=last_name, planType=plan_type, firstName=first_name, ServiceType=service_type,
+        networkCode=network_code, distance=distance, zipCode=zip_code, providerSpeciality=specialty,
+        **{"from": start}, size=size, captchaResp=captcha_token or "",
+    )
+
+
+def provider_details_body(action_id: str, *, provider_id: str, plan_type: str, network_code: str, service_type: str,
+                          context: AuraContext | None = None) -> bytes:
+    """Form body of a provider detail lookup (``Member_providerDetails``)."""
+    return PROVIDER_DETAILS.render(
+        action_id, context, providerId=provider_id, planType=plan_type, networkCode=network_code, ServiceType=service_type,
+    )
@@ -0,0 +1,146 @@
+import json
+from dataclasses import dataclass
+from enum import Enum
+
+from .aura_request import is_out_of_sync
+
+
+class Outcome(str, Enum):
+    SUCCESS = "success"                    # Results returned
+    EMPTY = "empty"                        # Valid answer without any records
+    CAPTCHA_REJECTED = "captcha_rejected"  # The search was answered without results: the token was not accepted
+    THROTTLED = "throttled"                # Salesforce request or concurrency limits
+    STALE_CONTEXT = "stale_context"        # aura:clientOutOfSync, the fwuid is outdated
+    SERVER_ERROR = "server_error"          # Transient failure: INCOMPLETE action, error page, unparseable body
+    INVALID = "invalid"                    # The action itself was rejected (bad parameters, Apex exception)
+
+
+class Action(str, Enum):
+    RETURN = "return"                    # Hand the result to the caller
+    RESOLVE_CAPTCHA = "resolve_captcha"  # Retry at once with a fresh captcha token
+    BACK_OFF = "back_off"                # Retry after the policy's backoff
+    FAIL_FAST = "fail_fast"              # Give up, another attempt would fail the same way
+
+
+OUTCOME_ACTIONS = {
+    Outcome.SUCCESS: Action.RETURN,
+    Outcome.EMPTY: Action.RETURN,
+    Outcome.CAPTCHA_REJECTED: Action.RESOLVE_CAPTCHA,
+    Outcome.THROTTLED: Action.BACK_OFF,
+    Outcome.SERVER_ERROR: Action.BACK_OFF,
+    Outcome.STALE_CONTEXT: Action.FAIL_FAST,
+    Outcome.INVALID: Action.FAIL_FAST,
+}
+
+# Substrings of Aura error messages, checked in order.
+_ERROR_PATTERNS = (
+    (("captcha",), Outcome.CAPTCHA_REJECTED),
+    (("request_limit_exceeded", "concurrentperorg", "too many", "rate limit", "limit exceeded"), Outcome.THROTTLED),
+    (("unable to lock row", "timed out", "timeout", "service unavailable", "try again"), Outcome.SERVER_ERROR),
+)
+
+
+@dataclass
+class AuraResponse:
+    """
+    A classified Aura response.
+
+    Attributes:
+        outcome (Outcome): What the response means.
+        result (dict | list | None): The decoded ``IPResult`` for SUCCESS and EMPTY outcomes.
+        message (str): Error details, for logging.
+    """
+    outcome: Outcome
+    result: dict | list | None = None
+    message: str = ""
+
+    @property
+    def action(self) -> Action:
+        return OUTCOME_ACTIONS[self.outcome]
+
+
+def _error_outcome(message: str, default: Outcome) -> Outcome:
+    lowered = message.lower()
+    for needles, outcome in _ERROR_PATTERNS:
+        if any(needle in lowered for needle in needles):
+            return outcome
+    return default
+
+
+def _error_message(action: dict) -> str:
+    errors = action.get("error") or []
+    if isinstance(errors, dict):
+        errors = [errors]
+    return "; ".join(
+        str(error.get("message") or error.get("exceptionType") or error) if isinstance(error, dict) else str(error)
+        for error in errors
+    )
+
+
+def _is_empty(ip_result) -> bool:
+    # A listing that searched and found nothing; anything else without data is not an answer.
+    return isinstance(ip_result, dict) and "totalRecords" in ip_result \
+        and not ip_result.get("totalRecords") and not ip_result.get("providerList")
+
+
+def classify(body: str, expects_captcha: bool = False) -> AuraResponse:
+    """
+    Parse an Aura response body once and classify it.
+
+    Args:
+        body (str): The raw response body.
+        expects_captcha (bool): The request carried a captcha token. A SUCCESS action without an
+            ``IPResult`` then means the token was rejected; otherwise it is treated as transient.
+
+    Returns:
+        AuraResponse: The outcome and, for SUCCESS and EMPTY, the ``IPResult``.
+    """
+    if is_out_of_sync(body):
+        return AuraResponse(Outcome.STALE_CONTEXT, message="aura:clientOutOfSync")
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return AuraResponse(Outcome.SERVER_ERROR, message=f"Unparseable response: {body[:200]!r}")
+
+    try:
+        return _classify_actions(payload, expects_captcha)
+    except (AttributeError, TypeError, ValueError) as exc:
+        return AuraResponse(Outcome.SERVER_ERROR, message=f"Malformed response: {exc}")
+
+
+def _classify_actions(payload, expects_captcha: bool) -> AuraResponse:
+    actions = payload.get("actions") if isinstance(payload, dict) else None
+    if not actions:
+        event = (payload.get("event") or {}).get("descriptor", "") if isinstance(payload, dict) else ""
+        return AuraResponse(Outcome.SERVER_ERROR, message=f"No actions in response {event}".strip())
+
+    # The first failure is reported unless a later action of the response succeeded.
+    failure = None
+    for action in actions:
+        state = action.get("state")
+        if state == "SUCCESS":
+            return_value = (action.get("returnValue") or {}).get("returnValue")
+            decoded = json.loads(return_value) if return_value else None
+            ip_result = decoded.get("IPResult") if isinstance(decoded, dict) else None
+
+            if _is_empty(ip_result):
+                return AuraResponse(Outcome.EMPTY, ip_result)
+            if ip_result:
+                return AuraResponse(Outcome.SUCCESS, ip_result)
+
+            # SUCCESS without results: for a search this usually means the captcha token was not accepted.
+            message = f"SUCCESS without IPResult: {str(return_value)[:200]}"
+            outcome = _error_outcome(message, Outcome.CAPTCHA_REJECTED if expects_captcha else Outcome.SERVER_ERROR)
+            failure = failure or AuraResponse(outcome, message=message)
+            continue
+
+        message = _error_message(action) or f"Action state {state}"
+        if state == "ERROR":
+            outcome = _error_outcome(message, Outcome.INVALID)
+        else:
+            # INCOMPLETE (the server did not finish the action) and ABORTED are transient.
+            outcome = _error_outcome(message, Outcome.SERVER_ERROR)
+        failure = failure or AuraResponse(outcome, message=message)
+
+    return failure
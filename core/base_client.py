@@ -1,12 +1,13 @@
 # base_client.py
-import httpx
-import asyncio
-import time
-from browserforge.headers import HeaderGenerator
+# The HTTP library and browserforge are imported on first request; they dominate the import time of the crawler.
 from urllib.parse import urljoin
 from settings import PROXY_HOST, PROXY_PORT, PROXY_USERNAME, PROXY_PASSWORD
 
 from logger.logger import get_logger
+from .retry_policy import RetryPolicy
+from .transport import Transport, TransportError, make_transport
+from .tracing import span
+from .metrics import HTTP_REQUESTS, HTTP_LATENCY, HTTP_BYTES_SENT, HTTP_BYTES_RECEIVED
 
 logger = get_logger("BaseClient")
 
@@ -16,12 +17,19 @@ class BaseClient:
     proxy support, and custom header generation.
     This class provides a foundation for making HTTP requests with built-in resilience features
     including exponential backoff retries, proxy configuration, and customizable timeouts.
+    Requests are sent by a `Transport` (httpx over HTTP/2 or HTTP/1.1, or aiohttp);
+    with HTTP_KEEPALIVE its pooled connections stay open until `aclose`.
+    Retry decisions (retryable status codes, jittered backoff, retry budget and
+    circuit breaker) are delegated to a `RetryPolicy`; pass a shared one to make
+    several clients draw from the same budget and breaker.
     Attributes:
         base_url (str): The base URL for all requests. Trailing slashes are removed.
-        retries (int): The number of retry attempts for failed requests. Defaults to 5.
+        retries (int): The number of attempts for failed requests. Defaults to 5.
         timeout (int): The timeout duration in seconds for each request. Defaults to 20.
-        backoff (float): The backoff multiplier for exponential backoff between retries. Defaults to 2.5.
+        backoff (float): The base delay for exponential backoff between retries. Defaults to 2.5.
         proxies (str | None): The proxy URL to be used for requests, if configured. None if proxy is not enabled.
+        retry_policy (RetryPolicy): The policy driving retries. Built from `retries` and `backoff` if not given.
+        transport (Transport): Sends the requests. Built from HTTP_BACKEND on first request if not given.
     Example:
         >>> client = BaseClient(
         ...     base_url="https://api.example.com",
@@ -32,12 +40,15 @@ class BaseClient:
         ... )
         >>> response = await client._request("GET", "/users")
     """
-    def __init__(self, base_url: str, use_proxy: bool = False, retries: int | bool = 5, timeout: int = 60, backoff: float = 2.5):
+    def __init__(self, base_url: str, use_proxy: bool = False, retries: int | bool = 5, timeout: int = 60, backoff: float = 2.5, retry_policy: RetryPolicy | None = None, transport: Transport | None = None):
         self.base_url = base_url.rstrip("/")
         self.retries = 5 if retries is True else (1 if retries is False else retries)
         self.timeout = timeout
         self.backoff = backoff
         self.proxies = None
+        self._header_generator = None
+        self._transport = transport
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=self.retries, base_delay=backoff)
 
         if use_proxy:
             if PROXY_HOST and PROXY_PORT:
@@ -54,12 +65,33 @@ class BaseClient:
             else:
                 logger.warning("`use_proxy` is True, but PROXY_HOST and PROXY_PORT not found in .env file.")
 
+    @property
+    def transport(self) -> Transport:
+        if self._transport is None:
+            self._transport = make_transport(proxy=self.proxies, timeout=self.timeout)
+        return self._transport
+
+    async def aclose(self):
+        """Close the pooled connections of the transport, if any."""
+        if self._transport is not None:
+            await self._transport.aclose()
+
+    def _generate_headers(self) -> dict:
+        """Browser-like headers from a HeaderGenerator built once per client."""
+        if self._header_generator is None:
+            from browserforge.headers import HeaderGenerator
+            self._header_generator = HeaderGenerator(device='desktop', locale='en-US', http_version=2)
+        hg = self._header_generator
+        return hg.generate() if hasattr(hg, "generate") else getattr(hg, "headers", {})
+
     async def _request(self, method: str, endpoint: str, **kwargs) -> dict:
         """
         Sends an asynchronous HTTP request to the specified endpoint.
         This method constructs the full URL by joining the base URL with the provided endpoint,
         generates custom headers using the HeaderGenerator, and merges them with any headers
-        provided in the request parameters. It supports retries in case of request errors.
+        provided in the request parameters. Transport errors and retryable status codes
+        (429, 5xx, ...) are retried according to `retry_policy`; other error statuses
+        fail immediately.
         Args:
             method (str): The HTTP method to use for the request (e.g., 'GET', 'POST').
             endpoint (str): The endpoint to which the request is sent.
@@ -68,16 +100,14 @@ class BaseClient:
                 - params (dict): URL parameters to include in the request.
                 - json (dict): JSON data to send in the request body.
         Returns:
-            dict: A dictionary containing the response status, headers, cookies, and body.
-        Raises:
-            httpx.RequestError: If the request fails after the specified number of retries.
+            dict: A dictionary containing the response status, headers, cookies, and body,
+                or an empty dict if the request failed. Callers must check for the empty
+                dict before reading `body`.
         """
-        
         url = urljoin(self.base_url, endpoint)
 
-        hg = HeaderGenerator(device='desktop', locale='en-US', http_version=2)
         try:
-            custom_headers = hg.generate() if hasattr(hg, "generate") else getattr(hg, "headers", {})
+            custom_headers = self._generate_headers()
         except Exception as e:
             logger.warning(f"Failed to generate headers from HeaderGenerator: {e}")
             custom_headers = {}
@@ -95,19 +125,52 @@ class BaseClient:
 
         kwargs['headers'] = merged_headers
 
-        for attempt in range(1, self.retries + 1):
+        policy = self.retry_policy
+        last_error = None
+        body = kwargs.get('content', kwargs.get('data'))
+        body_size = len(body) if isinstance(body, (str, bytes)) else 0
+
+        for attempt in range(1, policy.max_attempts + 1):
+            if not await policy.before_attempt(attempt):
+                break
+
+            HTTP_BYTES_SENT.inc(body_size)
             try:
-                async with httpx.AsyncClient(proxy=self.proxies, timeout=self.timeout, verify=False, http2=True) as client:
-                    response = await client.request(method, url, **kwargs)
-                response.raise_for_status()
-                return {
-                    "status": response.status_code,
-                    "headers": dict(response.headers),
-                    "cookies": dict(response.cookies),
-                    "body": response.text
-                }
-            except httpx.RequestError as e:
-                sleep_time = self.backoff ** attempt
-                await asyncio.sleep(sleep_time)
-        
+                with span("http.attempt", method=method, endpoint=endpoint, attempt=attempt) as attempt_span, HTTP_LATENCY.time(method=method):
+                    response = await self.transport.request(method, url, **kwargs)
+                    if attempt_span:
+                        attempt_span.set(status=response.status_code, bytes=response.size)
+            except TransportError as e:
+                HTTP_REQUESTS.inc(method=method, outcome="transport_error")
+                policy.record_failure()
+                last_error = str(e)
+                logger.warning(f"Request error on {method} {endpoint}: {last_error} | Attempt {attempt}/{policy.max_attempts}")
+            else:
+                HTTP_BYTES_RECEIVED.inc(response.size)
+                if response.is_success:
+                    HTTP_REQUESTS.inc(method=method, outcome="success")
+                    policy.record_success()
+                    return {
+                        "status": response.status_code,
+                        "headers": response.headers,
+                        "cookies": response.cookies,
+                        "body": response.text
+                    }
+
+                last_error = f"HTTP {response.status_code}"
+                if not policy.is_retryable_status(response.status_code):
+                    HTTP_REQUESTS.inc(method=method, outcome="error_status")
+                    # The upstream answered; a client error says nothing about its health.
+                    policy.record_success()
+                    logger.error(f"Non-retryable {last_error} on {method} {endpoint}")
+                    return {}
+
+                HTTP_REQUESTS.inc(method=method, outcome="retryable_status")
+                policy.record_failure()
+                logger.warning(f"Retryable {last_error} on {method} {endpoint} | Attempt {attempt}/{policy.max_attempts}")
+
+            if attempt < policy.max_attempts:
+                await policy.sleep_before_retry(attempt)
+
+        logger.error(f"Giving up on {method} {endpoint}: {last_error}")
         return {}
@@ -0,0 +1,185 @@
+import asyncio
+import inspect
+import time
+
+from logger.logger import get_logger
+from .metrics import CAPTCHA_SOLVES, CAPTCHA_LATENCY, CAPTCHA_TOKENS, CAPTCHA_COST
+from settings import (
+    CAPTCHA_PROVIDERS,
+    CAPTCHA_COSTS,
+    CAPTCHA_SOLVE_TIMEOUT,
+    CAPTCHA_LATENCY_WEIGHT,
+    CAPTCHA_FAILURE_THRESHOLD,
+    CAPTCHA_COOLDOWN,
+)
+
+logger = get_logger("CaptchaRouter")
+
+
+def parse_costs(spec: str) -> dict[str, float]:
+    """Parse ``"capsolver=0.001,2captcha=0.003"`` into a cost per token by provider."""
+    costs = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, cost = item.partition("=")
+        costs[name.strip()] = float(cost or 0)
+    return costs
+
+
+class SolverStats:
+    """
+    Running record of one captcha provider.
+
+    Latency is an exponentially weighted average of successful solves. Acceptance is
+    the share of its tokens the Aura endpoint accepted, counting one accepted pseudo-token:
+    a new provider starts at 100%, so it is tried before one whose tokens are known to fail.
+    """
+
+    def __init__(self, cost: float = 0.0, alpha: float = 0.2):
+        self.cost = cost
+        self.alpha = alpha
+        self.latency = None
+        self.solves = 0
+        self.failures = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.spent = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def acceptance(self) -> float:
+        return (self.accepted + 1) / (self.accepted + self.rejected + 1)
+
+    def record_solve(self, seconds: float, token: str):
+        if token:
+            self.solves += 1
+            self.spent += self.cost
+            self.consecutive_failures = 0
+            self.latency = seconds if self.latency is None else self.alpha * seconds + (1 - self.alpha) * self.latency
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "cost": self.cost, "latency": self.latency, "solves": self.solves, "failures": self.failures,
+            "accepted": self.accepted, "rejected": self.rejected, "acceptance": round(self.acceptance, 4),
+            "spent": round(self.spent, 6), "cooling_down": self.cooldown_until > time.monotonic(),
+        }
+
+
+class CaptchaRouter:
+    """
+    Routes captcha solves to the provider with the lowest expected cost per accepted token.
+
+    A provider's score is ``(cost + latency_weight * latency) / acceptance``: what one
+    token costs in money and in time, divided by the chance the endpoint accepts it.
+    Providers without a solve yet score on cost alone, so each gets tried. A solve that
+    fails or exceeds ``timeout`` falls back to the next provider; after
+    ``failure_threshold`` consecutive failures a provider cools down for ``cooldown``
+    seconds. Acceptance is fed back by the caller through `feedback`.
+
+    Solvers are callables returning a token (empty on failure). Blocking solvers, like
+    the 2Captcha and Capsolver SDKs, run in a worker thread so they do not stall the
+    event loop.
+    """
+
+    def __init__(self, solvers: dict, costs: dict | None = None, order: list | None = None,
+                 timeout: float = CAPTCHA_SOLVE_TIMEOUT, latency_weight: float = CAPTCHA_LATENCY_WEIGHT,
+                 failure_threshold: int = CAPTCHA_FAILURE_THRESHOLD, cooldown: float = CAPTCHA_COOLDOWN):
+        """
+        Args:
+            solvers (dict): Solver callable (sync or async, no arguments) by provider name.
+            costs (dict | None): Price of one token by provider name, e.g. in USD.
+            order (list | None): Providers to route between; their order breaks ties. All solvers by default.
+            timeout (float): Seconds before a solve is abandoned for the next provider.
+            latency_weight (float): Price of one second of solve latency, in the unit of ``costs``.
+            failure_threshold (int): Consecutive failures before a provider cools down.
+            cooldown (float): Seconds a failing provider is skipped.
+        """
+        self.solvers = solvers
+        self.order = [name for name in (order or list(solvers)) if name in solvers]
+        unknown = set(order or ()) - set(solvers)
+        if unknown:
+            logger.error(f"Unknown captcha providers ignored: {', '.join(sorted(unknown))}")
+        self.costs = costs or {}
+        self.stats = {name: SolverStats(self.costs.get(name, 0.0)) for name in self.order}
+        self.timeout = timeout
+        self.latency_weight = latency_weight
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+    def score(self, provider: str) -> float:
+        stats = self.stats[provider]
+        return (stats.cost + self.latency_weight * (stats.latency or 0.0)) / stats.acceptance
+
+    def ranked(self) -> list[str]:
+        """Providers from best to worst; cooling down ones last."""
+        now = time.monotonic()
+        return sorted(self.order, key=lambda name: (self.stats[name].cooldown_until > now, self.score(name)))
+
+    async def _call(self, provider: str) -> str:
+        solver = self.solvers[provider]
+        if inspect.iscoroutinefunction(solver):
+            return await asyncio.wait_for(solver(), self.timeout)
+        # The thread keeps running after a timeout; its token is then dropped.
+        return await asyncio.wait_for(asyncio.to_thread(solver), self.timeout)
+
+    async def solve(self, provider: str | None = None) -> tuple[str, str | None]:
+        """
+        Solve a captcha with the best provider, falling back to the others.
+
+        Args:
+            provider (str | None): Use only this provider instead of routing.
+
+        Returns:
+            tuple[str, str | None]: The token (empty if every provider failed) and the provider that produced it.
+        """
+        if provider and provider not in self.solvers:
+            logger.error(f"Unsupported captcha provider: {provider}")
+            return "", None
+
+        for name in [provider] if provider else self.ranked():
+            stats = self.stats.setdefault(name, SolverStats(self.costs.get(name, 0.0)))
+            start = time.perf_counter()
+            token = ""
+            try:
+                token = await self._call(name) or ""
+            except asyncio.TimeoutError:
+                logger.warning(f"Captcha provider {name} timed out after {self.timeout}s")
+            except Exception as e:
+                logger.error(f"Captcha provider {name} failed: {e}")
+            finally:
+                elapsed = time.perf_counter() - start
+                stats.record_solve(elapsed, token)
+                CAPTCHA_LATENCY.observe(elapsed, provider=name)
+                CAPTCHA_SOLVES.inc(provider=name, outcome="success" if token else "failed")
+
+            if token:
+                CAPTCHA_COST.inc(stats.cost, provider=name)
+                return token, name
+            if stats.consecutive_failures >= self.failure_threshold:
+                stats.cooldown_until = time.monotonic() + self.cooldown
+                logger.warning(f"Captcha provider {name} failed {stats.consecutive_failures} times in a row; cooling down for {self.cooldown}s")
+        return "", None
+
+    def feedback(self, provider: str | None, accepted: bool):
+        """Record whether the Aura endpoint accepted a token of ``provider``."""
+        if provider not in self.stats:
+            return
+        stats = self.stats[provider]
+        if accepted:
+            stats.accepted += 1
+        else:
+            stats.rejected += 1
+        CAPTCHA_TOKENS.inc(provider=provider, outcome="accepted" if accepted else "rejected")
+
+    def report(self) -> dict:
+        """Stats and current score of each provider."""
+        return {name: {**stats.as_dict(), "score": self.score(name)} for name, stats in self.stats.items()}
+
+
+def default_router() -> CaptchaRouter:
+    """Router over the solvers of `core.helpers`, configured by the CAPTCHA_* settings."""
+    from .helpers import SOLVERS
+    return CaptchaRouter(SOLVERS, parse_costs(CAPTCHA_COSTS), [name.strip() for name in CAPTCHA_PROVIDERS.split(",") if name.strip()])
@@ -0,0 +1,169 @@
+import os
+import threading
+
+from settings import AURA_BASE_URL, CACHE_PATH, PROVIDER_STORE_PATH
+
+
+class AppContext:
+    """
+    Process-wide resources of the crawler, created on first use.
+
+    Holds the LMDB cache, the retry policy shared by the Aura requests, the
+    HTTP client, the captcha router, the dead-letter store and the provider store. Nothing is opened when the context is created, so importing
+    the crawler has no side effects. Resources passed to the constructor are
+    used as-is, which lets tests and benchmarks inject their own.
+
+    A context belongs to the process that created it: `get_context` hands a
+    forked child a fresh one, since LMDB environments and connection pools
+    must not be shared across ``fork()``.
+    """
+
+    def __init__(self, cache_path: str = CACHE_PATH, base_url: str = AURA_BASE_URL, use_proxy: bool = True,
+                 cache=None, retry_policy=None, client=None, dead_letters=None, captcha_router=None):
+        """
+        Args:
+            cache_path (str): Directory of the LMDB cache.
+            base_url (str): Base URL of the Aura endpoint.
+            use_proxy (bool): Route requests through the proxy configured in settings.
+            cache (CacheHandler | None): Cache to use instead of opening ``cache_path``.
+            retry_policy (RetryPolicy | None): Policy to use instead of a default one.
+            client (BaseClient | None): Client to use instead of building one.
+            dead_letters (DeadLetterStore | None): Store to use instead of the one at DEAD_LETTER_PATH.
+            captcha_router (CaptchaRouter | None): Router to use instead of one over the CAPTCHA_PROVIDERS.
+        """
+        self.pid = os.getpid()
+        self.cache_path = cache_path
+        self.base_url = base_url
+        self.use_proxy = use_proxy
+        self._cache = cache
+        self._retry_policy = retry_policy
+        self._client = client
+        self._dead_letters = dead_letters
+        self._captcha_router = captcha_router
+        self._radius_planner = None
+        self._provider_store = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        """The LMDB cache of processed providers (`CacheHandler`)."""
+        if self._cache is None:
+            with self._lock:
+                if self._cache is None:
+                    from cache import CacheHandler
+                    self._cache = CacheHandler(cache_path=self.cache_path, use_existing_cache=True)
+        return self._cache
+
+    @property
+    def retry_policy(self):
+        """The `RetryPolicy` shared by every request to the Aura endpoint."""
+        if self._retry_policy is None:
+            from .retry_policy import RetryPolicy
+            self._retry_policy = RetryPolicy()
+        return self._retry_policy
+
+    @property
+    def client(self):
+        """The `BaseClient` used for listing and detail requests."""
+        if self._client is None:
+            from .base_client import BaseClient
+            self._client = BaseClient(base_url=self.base_url, use_proxy=self.use_proxy, retry_policy=self.retry_policy)
+        return self._client
+
+    @property
+    def captcha_router(self):
+        """The `CaptchaRouter` listing requests get their captcha tokens from."""
+        if self._captcha_router is None:
+            from .captcha_router import default_router
+            self._captcha_router = default_router()
+        return self._captcha_router
+
+    @property
+    def digests(self):
+        """The `DigestIndex` of incremental mode, stored in the cache."""
+        from .incremental import DigestIndex
+        return DigestIndex(self.cache)
+
+    @property
+    def radius_planner(self):
+        """The `RadiusPlanner` of ADAPTIVE_RADIUS, with learned radii stored in the cache."""
+        if self._radius_planner is None:
+            from .radius import RadiusPlanner
+            self._radius_planner = RadiusPlanner(self.cache)
+        return self._radius_planner
+
+    @property
+    def yield_stats(self):
+        """The `YieldStats` of the searches, stored in the cache."""
+        from .yield_stats import YieldStats
+        return YieldStats(self.cache)
+
+    @property
+    def dead_letters(self):
+        """The `DeadLetterStore` permanent failures are recorded in."""
+        if self._dead_letters is None:
+            from .dead_letter import DeadLetterStore
+            self._dead_letters = DeadLetterStore()
+        return self._dead_letters
+
+    @property
+    def provider_store(self):
+        """The `ProviderStore` at PROVIDER_STORE_PATH, or None when it is disabled."""
+        if self._provider_store is None and PROVIDER_STORE_PATH:
+            with self._lock:
+                if self._provider_store is None:
+                    from .provider_store import ProviderStore
+                    self._provider_store = ProviderStore(PROVIDER_STORE_PATH)
+        return self._provider_store
+
+    async def aclose(self):
+        """Close the pooled HTTP connections of the client; call it on the loop the crawl ran on."""
+        if self._client is not None:
+            await self._client.aclose()
+
+    def close(self):
+        """Release the resources opened so far."""
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        if self._dead_letters is not None:
+            self._dead_letters.close()
+        if self._provider_store is not None:
+            self._provider_store.close()
+            self._provider_store = None
+        self._client = None
+        self._radius_planner = None
+
+
+_context: AppContext | None = None
+# Contexts inherited through fork(). They are kept referenced, never closed or
+# collected, so the child does not touch the parent's LMDB environment.
+_inherited: list[AppContext] = []
+
+
+def get_context() -> AppContext:
+    """The context of the current process, created on first use."""
+    global _context
+    if _context is None or _context.pid != os.getpid():
+        if _context is not None:
+            _inherited.append(_context)
+        _context = AppContext()
+    return _context
+
+
+def set_context(context: AppContext | None) -> AppContext | None:
+    """Install ``context`` as the process context (None resets it). Returns the previous one."""
+    global _context
+    previous, _context = _context, context
+    return previous
+
+
+def _after_fork_in_child():
+    global _context
+    if _context is not None:
+        _inherited.append(_context)
+        _context = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
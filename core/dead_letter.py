@@ -0,0 +1,146 @@
+import glob
+import json
+import os
+import socket
+import threading
+import time
+
+from logger.logger import get_logger
+from .outputs import network_slug
+from settings import DEAD_LETTER_PATH
+
+logger = get_logger("DeadLetter")
+
+LISTING = "listing"
+DETAIL = "detail"
+
+
+def listing_letter(search_params: dict, service_type: str, specialty: str, page: int) -> tuple[str, dict]:
+    """The ``(key, unit)`` of a listing page: the search (without its specialty list), the specialty and the page."""
+    search = {key: value for key, value in search_params.items() if key != "specialities"}
+    key = "|".join((
+        LISTING, str(search.get("zipCode", "")), str(search.get("planType", "")),
+        network_slug(search.get("networkCode", "")), f"{service_type}:{specialty}", str(page),
+    ))
+    return key, {"search_params": search, "specialty": {"type": service_type, "code": specialty}, "page": page}
+
+
+def detail_letter(provider: dict, plan_type: str, network_code: str, service_type: str, provider_speciality: str) -> tuple[str, dict]:
+    """The ``(key, unit)`` of a provider detail lookup, with the arguments of `process_provider`."""
+    key = "|".join((DETAIL, str(provider.get("ProviderId", "")), plan_type, network_slug(network_code), service_type))
+    return key, {
+        "provider": {"ProviderId": provider.get("ProviderId"), "providerFullName": provider.get("providerFullName", "")},
+        "plan_type": plan_type,
+        "network_code": network_code,
+        "service_type": service_type,
+        "provider_speciality": provider_speciality,
+    }
+
+
+class DeadLetterStore:
+    """
+    Append-only NDJSON store of work that failed permanently, replayable with ``main.py --retry-failed``.
+
+    Each process appends to its own segment (``<host>-<pid>.ndjson``) in ``directory``, so
+    shards and workers sharing the directory never interleave lines. A letter holds the
+    full work unit, the failure class (an `Outcome` value, ``transport`` or ``exception``),
+    the attempts made and the last error. A unit that later succeeds gets a ``resolved``
+    line; when reading, the last line of each key wins.
+
+    Example:
+        >>> store = DeadLetterStore("outputs/dead_letter")
+        >>> store.record(*listing_letter(params, "Doctor", "Cardiology", 3), failure="throttled", attempts=4, error="...")
+        >>> [letter["key"] for letter in store.pending()]
+    """
+
+    def __init__(self, directory: str = DEAD_LETTER_PATH):
+        self.directory = directory
+        self._file = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _segment(self):
+        if self._file is None or self._pid != os.getpid():
+            # A forked child writes its own segment rather than the parent's file object.
+            os.makedirs(self.directory, exist_ok=True)
+            self._pid = os.getpid()
+            path = os.path.join(self.directory, f"{socket.gethostname()}-{self._pid}.ndjson")
+            self._file = open(path, "a", encoding="utf-8")
+        return self._file
+
+    def _append(self, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            segment = self._segment()
+            segment.write(line)
+            segment.flush()
+
+    def record(self, key: str, unit: dict, failure: str, attempts: int, error: str = ""):
+        """
+        Store a failed unit.
+
+        Args:
+            key (str): Stable identity of the unit (see `listing_letter`, `detail_letter`).
+            unit (dict): Everything needed to run the unit again.
+            failure (str): Failure class, e.g. ``captcha_rejected``, ``throttled``, ``transport``, ``exception``.
+            attempts (int): Attempts made before giving up.
+            error (str): The last error message.
+        """
+        kind = key.split("|", 1)[0]
+        self._append({"key": key, "kind": kind, "unit": unit, "failure": failure, "attempts": attempts,
+                      "error": error[:1000], "ts": int(time.time())})
+
+    def resolve(self, key: str):
+        """Mark a stored unit as done."""
+        self._append({"key": key, "resolved": True, "ts": int(time.time())})
+
+    def _read(self) -> dict[str, dict]:
+        latest = {}
+        failures = {}
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.ndjson"))):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash.
+                        continue
+                    key = entry["key"]
+                    previous = latest.get(key)
+                    if previous is not None and previous["ts"] > entry["ts"]:
+                        continue
+                    if not entry.get("resolved"):
+                        failures[key] = failures.get(key, 0) + 1
+                        entry["failures"] = failures[key]
+                    latest[key] = entry
+        return latest
+
+    def pending(self, kind: str | None = None) -> list[dict]:
+        """
+        Unresolved letters, the latest per key.
+
+        Args:
+            kind (str | None): Only ``listing`` or ``detail`` letters.
+
+        Returns:
+            list[dict]: Letters with ``key``, ``kind``, ``unit``, ``failure``, ``attempts``, ``error``,
+                ``ts`` and ``failures`` (how many times the unit was stored).
+        """
+        return [
+            entry for entry in self._read().values()
+            if not entry.get("resolved") and (kind is None or entry["kind"] == kind)
+        ]
+
+    def stats(self) -> dict:
+        """Pending letters per kind and failure class."""
+        counts = {}
+        for entry in self.pending():
+            name = f"{entry['kind']}:{entry['failure']}"
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = None
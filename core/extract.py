@@ -0,0 +1,30 @@
+from .aura_response import Outcome, classify
+
+
+def extract_ip_result(body: str) -> dict | list | None:
+    """
+    The ``IPResult`` of a raw Aura response body, read with `classify` like the live crawl
+    reads it; None unless the response is a SUCCESS, the only kind of answer the crawl saves.
+    """
+    classified = classify(body)
+    return classified.result if classified.outcome is Outcome.SUCCESS else None
+
+
+def listing_records(ip_result: dict, context: dict) -> list[dict]:
+    """
+    Flatten a listing ``IPResult`` into one record per provider, tagged with the search context.
+
+    Args:
+        ip_result (dict): The listing ``IPResult`` (``totalRecords`` and ``providerList``).
+        context (dict): Search context (``specialty``, ``service_type``, ``plan_type``, ``network_code``, ``zip``, ``page``).
+    """
+    return [
+        {**provider, "_search": context}
+        for provider in ip_result.get("providerList", []) or []
+        if provider.get("ProviderId")
+    ]
+
+
+def detail_record(provider_id: str, ip_result) -> dict:
+    """Wrap a detail ``IPResult`` with the provider id it belongs to."""
+    return {"ProviderId": provider_id, "detail": ip_result}
@@ -1,6 +1,8 @@
 import os
 import random
 from logger.logger import get_logger
+from .tracing import span
+from .metrics import FILE_WRITES, FILE_WRITE_LATENCY, FILE_WRITE_BYTES
 from urllib.parse import urljoin
 from settings import PLAYWRIGHT_SESSION_PATH, PROXY_URL, PROXY_USERNAME, PROXY_PASSWORD, PROXY_HOST, PROXY_PORT
 
@@ -50,31 +52,21 @@ def two_cap():
         return result['code']
 
 
-async def solve_captcha(provider: str = 'capsolver') -> str:
+async def solve_captcha(provider: str | None = None) -> str:
     """
-    Solves a captcha using the specified provider.
+    Solves a captcha through the context's `CaptchaRouter`.
 
     Args:
-        provider (str): The captcha solving service to use.
-                        Accepted values are "capsolver", "2captcha", or "browser automation".
-                        Default is "capsolver".
+        provider (str | None): The captcha solving service to use: "capsolver", "2captcha"
+                        or "browser". By default the router picks the provider with the
+                        lowest cost per accepted token and falls back to the others.
 
     Returns:
-        str: The captcha token or solution.
-
-    Raises:
-        ValueError: If an unsupported provider is specified.
+        str: The captcha token or solution, empty if no provider produced one.
     """
-
-    if provider == "capsolver":
-        return capsolver()
-    elif provider == "2captcha":
-        return two_cap()
-    elif provider == "browser":
-        return await fake_solve_captcha()
-    else:
-        logger.error(f"Unsupported captcha provider: {provider}")
-        return ""
+    from .context import get_context
+    token, _ = await get_context().captcha_router.solve(provider)
+    return token
 
 
 
@@ -289,6 +281,10 @@ async def fake_solve_captcha(page_url: str = "https://my.emblemhealth.com/member
     logger.error("Failed to solve captcha after multiple attempts.")
     return None  # or raise an exception if preferred
 
+# Captcha solvers by provider name, routed by `core.captcha_router.CaptchaRouter`.
+SOLVERS = {"capsolver": capsolver, "2captcha": two_cap, "browser": fake_solve_captcha}
+
+
 async def human_curve(page, start, end, steps=30):
     x1, y1 = start
     x2, y2 = end
@@ -348,15 +344,25 @@ def save_content_as_json(content, path):
     Save the provided content as a JSON file at the specified path.
     
     :param content: The content to save (must be serializable to JSON).
-    :param path: The file path where the JSON should be saved.
+    :param path: The file path where the JSON should be saved. Missing (shard) directories are created.
     """
     import json
     
     try:
-        with open(path, 'w') as json_file:
-            json.dump(content, json_file, indent=4)
+        with span("file.write", path=path), FILE_WRITE_LATENCY.time():
+            data = json.dumps(content, indent=4)
+            try:
+                json_file = open(path, 'w')
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                json_file = open(path, 'w')
+            with json_file:
+                json_file.write(data)
+        FILE_WRITES.inc(outcome="success")
+        FILE_WRITE_BYTES.inc(len(data))
         logger.info(f"Content successfully saved to {path}")
     except Exception as e:
+        FILE_WRITES.inc(outcome="failed")
         logger.error(f"Error saving content to JSON: {e}")
 
 
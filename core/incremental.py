@@ -0,0 +1,105 @@
+import hashlib
+import json
+import time
+
+from .metrics import INCREMENTAL_RECORDS
+
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+# Listing fields that depend on the search rather than the provider (distance from the searched zip).
+VOLATILE_FIELDS = frozenset({"distance", "Distance", "distanceInMiles", "_search"})
+
+
+def content_digest(value) -> str:
+    """Digest of a JSON value, independent of key order."""
+    encoded = json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def entry_digest(provider: dict) -> str:
+    """Digest of a listing entry without its search dependent fields."""
+    return content_digest({key: value for key, value in provider.items() if key not in VOLATILE_FIELDS})
+
+
+def page_key(listing_filename: str) -> str:
+    return f"page:{listing_filename}"
+
+
+def entry_key(provider_id: str) -> str:
+    return f"entry:{provider_id}"
+
+
+def detail_key(provider_id: str) -> str:
+    return f"detail:{provider_id}"
+
+
+class DigestIndex:
+    """
+    Content digests of listing pages, listing entries and provider details, kept in the LMDB cache.
+
+    Each record is stored under a prefixed key (``page:``, ``entry:``, ``detail:``) next to the
+    provider ids of the cache, as JSON with its ``digest``, ``first_seen``, ``last_seen`` and
+    ``changed_at`` times (epoch seconds). Observing a batch of records is one read and one
+    write transaction.
+    """
+
+    def __init__(self, cache):
+        """
+        Args:
+            cache (CacheHandler): The cache the digests are stored in.
+        """
+        self.cache = cache
+
+    def observe(self, records: list[tuple[str, str]], now: int | None = None) -> list[str]:
+        """
+        Record the current digests and compare them to the stored ones.
+
+        Args:
+            records (list[tuple[str, str]]): ``(key, digest)`` pairs, keys built with `page_key`,
+                `entry_key` or `detail_key`.
+            now (int | None): Observation time, defaults to the current time.
+
+        Returns:
+            list[str]: ``new``, ``changed`` or ``unchanged`` per record.
+        """
+        if not records:
+            return []
+        now = int(time.time()) if now is None else now
+        previous = self.cache.get_many(key for key, _ in records)
+
+        statuses, updates = [], []
+        for (key, digest), stored in zip(records, previous):
+            stored = json.loads(stored) if stored else None
+            if stored is None:
+                status, entry = NEW, {"digest": digest, "first_seen": now, "last_seen": now, "changed_at": now}
+            else:
+                status = UNCHANGED if stored["digest"] == digest else CHANGED
+                entry = {**stored, "digest": digest, "last_seen": now}
+                if status == CHANGED:
+                    entry["changed_at"] = now
+            statuses.append(status)
+            updates.append((key, json.dumps(entry, separators=(',', ':'))))
+            INCREMENTAL_RECORDS.inc(kind=key.split(":", 1)[0], status=status)
+
+        self.cache.set_many(updates)
+        return statuses
+
+    def observe_listing(self, listing_filename: str, ip_result: dict) -> tuple[str, dict[str, str]]:
+        """
+        Observe a listing page and each of its entries in one transaction.
+
+        Returns:
+            tuple[str, dict[str, str]]: The status of the page, and of each entry by ``ProviderId``.
+        """
+        providers = {provider["ProviderId"]: provider for provider in ip_result.get("providerList") or [] if provider.get("ProviderId")}
+        statuses = self.observe(
+            [(page_key(listing_filename), content_digest(ip_result))]
+            + [(entry_key(provider_id), entry_digest(provider)) for provider_id, provider in providers.items()]
+        )
+        return statuses[0], dict(zip(providers, statuses[1:]))
+
+    def get(self, key: str) -> dict | None:
+        """The stored record of ``key`` (``digest``, ``first_seen``, ``last_seen``, ``changed_at``), or None."""
+        return self.cache.get_json(key)
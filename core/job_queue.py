@@ -0,0 +1,250 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterable
+
+
+@dataclass
+class Job:
+    """A claimed unit of work. ``key`` identifies the unit (zip, plan and optionally specialty)."""
+    key: str
+    payload: dict
+    attempts: int
+    lease_expires: float
+
+
+class JobQueue(ABC):
+    """
+    Work distribution shared by several crawler nodes.
+
+    Units are claimed under a lease: the claiming worker must renew it with
+    ``heartbeat`` while it works, and a lease that is not renewed (crashed or
+    partitioned worker) expires so another worker can claim the unit again.
+    Enqueueing and completion are idempotent, so every node may seed the same
+    job list and a unit finished twice is recorded once.
+    """
+
+    @abstractmethod
+    def enqueue_many(self, jobs: Iterable[tuple[str, dict]]) -> int:
+        """Add ``(key, payload)`` units, ignoring keys already known. Returns the number added."""
+
+    @abstractmethod
+    def claim(self, worker_id: str, limit: int = 1) -> list[Job]:
+        """Lease up to ``limit`` pending (or lease-expired) units to ``worker_id``."""
+
+    @abstractmethod
+    def heartbeat(self, worker_id: str, keys: Iterable[str]) -> int:
+        """Extend the leases ``worker_id`` still holds on ``keys``. Returns the number renewed."""
+
+    @abstractmethod
+    def complete(self, key: str, worker_id: str) -> bool:
+        """Mark a unit done. Returns False if it was already done."""
+
+    @abstractmethod
+    def fail(self, key: str, worker_id: str, error: str = "") -> None:
+        """Give a unit back after a failed attempt; it is parked as failed after too many attempts."""
+
+    @abstractmethod
+    def meta(self, name: str, default: str) -> str:
+        """The value stored under ``name`` with the queue; ``default`` is stored first if there is none."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Number of units per status (pending, leased, done, failed)."""
+
+    def remaining(self) -> int:
+        """Units that may still be claimed now or once a lease expires."""
+        stats = self.stats()
+        return stats.get("pending", 0) + stats.get("leased", 0)
+
+    def close(self):
+        pass
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    ``JobQueue`` backed by a single SQLite file, usable from several machines on shared storage.
+
+    Claims run in ``BEGIN IMMEDIATE`` transactions so two workers never lease the
+    same unit. The rollback journal is used instead of WAL, which is not safe on
+    network filesystems. Lease deadlines use wall-clock time, so node clocks
+    should be roughly in sync (well within ``lease_seconds``).
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 600, max_attempts: int = 5):
+        """
+        Args:
+            path (str): Path of the SQLite database file, created if missing.
+            lease_seconds (float): Lease duration granted by ``claim`` and ``heartbeat``.
+            max_attempts (int): Claims of a unit before it is parked as failed.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # One connection shared by the event loop's worker threads (asyncio.to_thread).
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                owner TEXT,
+                lease_expires REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status_lease ON jobs (status, lease_expires);
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+
+    def _transaction(self):
+        return _ImmediateTransaction(self.conn, self._lock)
+
+    def enqueue_many(self, jobs: Iterable[tuple[str, dict]], batch_size: int = 10000) -> int:
+        added = 0
+        batch = []
+        now = time.time()
+
+        def flush():
+            nonlocal added
+            with self._transaction():
+                before = self.conn.total_changes
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO jobs (key, payload, updated_at) VALUES (?, ?, ?)", batch
+                )
+                added += self.conn.total_changes - before
+            batch.clear()
+
+        for key, payload in jobs:
+            batch.append((key, json.dumps(payload), now))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        return added
+
+    def claim(self, worker_id: str, limit: int = 1) -> list[Job]:
+        now = time.time()
+        with self._transaction():
+            # Units whose worker kept dying on them are parked instead of re-leased forever.
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed', owner = NULL, error = 'lease expired', updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            rows = self.conn.execute(
+                "SELECT key, payload, attempts FROM jobs "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            if not rows:
+                return []
+
+            expires = now + self.lease_seconds
+            self.conn.executemany(
+                "UPDATE jobs SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE key = ?",
+                [(worker_id, expires, now, key) for key, _, _ in rows],
+            )
+        return [Job(key, json.loads(payload), attempts + 1, expires) for key, payload, attempts in rows]
+
+    def heartbeat(self, worker_id: str, keys: Iterable[str]) -> int:
+        now = time.time()
+        with self._transaction():
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE key = ? AND owner = ? AND status = 'leased'",
+                [(now + self.lease_seconds, now, key, worker_id) for key in keys],
+            )
+            return self.conn.total_changes - before
+
+    def complete(self, key: str, worker_id: str) -> bool:
+        with self._transaction():
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = 'done', owner = ?, error = NULL, updated_at = ? WHERE key = ? AND status != 'done'",
+                (worker_id, time.time(), key),
+            )
+            return cursor.rowcount > 0
+
+    def fail(self, key: str, worker_id: str, error: str = "") -> None:
+        with self._transaction():
+            self.conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "owner = NULL, lease_expires = 0, error = ?, updated_at = ? "
+                "WHERE key = ? AND owner = ? AND status = 'leased'",
+                (self.max_attempts, error[:1000], time.time(), key, worker_id),
+            )
+
+    def meta(self, name: str, default: str) -> str:
+        with self._transaction():
+            self.conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES (?, ?)", (name, default))
+            return self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()[0]
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            stats = dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            stats["expired"] = self.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'leased' AND lease_expires < ?", (now,)
+            ).fetchone()[0]
+        return stats
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class _ImmediateTransaction:
+    """Write transaction taken up front, so concurrent claimers queue on the lock instead of deadlocking."""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+        return None
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def open_job_queue(url: str, **kwargs) -> JobQueue:
+    """
+    Open the job queue backend named by ``url``.
+
+    ``sqlite:///path/to/jobs.db`` (or a bare file path) selects ``SQLiteJobQueue``.
+    Other backends (e.g. a Redis stand-in) implement ``JobQueue`` and are added here.
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteJobQueue(url[len("sqlite:///"):], **kwargs)
+    if "://" not in url:
+        return SQLiteJobQueue(url, **kwargs)
+    raise ValueError(f"Unsupported job queue backend: {url}")
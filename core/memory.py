@@ -0,0 +1,101 @@
+import asyncio
+import os
+import resource
+import tracemalloc
+
+from logger.logger import get_logger
+from .metrics import MEMORY_RSS
+from settings import MEMORY_REPORT_INTERVAL, MEMORY_TRACEMALLOC_FRAMES, MEMORY_TOP_N
+
+logger = get_logger("Memory")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# Allocations of the import machinery and of tracemalloc itself are noise in the reports.
+_IGNORED = (
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes() -> int:
+    """Resident set size of the process; the peak RSS where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def _mb(size: float) -> str:
+    return f"{size / 1048576:.1f} MB"
+
+
+class MemoryReporter:
+    """
+    Logs the RSS of the process and, optionally, where Python memory is allocated.
+
+    With ``frames`` above 0, tracemalloc records that many stack frames per allocation and
+    each report lists the ``top`` allocation sites by size, with their growth since the
+    previous report; a site that keeps growing across reports is where memory leaks.
+    tracemalloc slows allocation-heavy code down noticeably, so leave it off on normal runs.
+    """
+
+    def __init__(self, interval: float = MEMORY_REPORT_INTERVAL, frames: int = MEMORY_TRACEMALLOC_FRAMES, top: int = MEMORY_TOP_N):
+        self.interval = interval
+        self.frames = frames
+        self.top = top
+        self._previous = None
+
+    def start(self):
+        if self.frames > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self):
+        if self.frames > 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._previous = None
+
+    def report(self) -> dict:
+        """Log one report. Returns the RSS and, when tracing, the traced current and peak sizes in bytes."""
+        rss = rss_bytes()
+        MEMORY_RSS.set(rss)
+        result = {"rss": rss}
+        if not tracemalloc.is_tracing():
+            logger.info(f"RSS {_mb(rss)}")
+            return result
+
+        current, peak = tracemalloc.get_traced_memory()
+        result.update(traced=current, traced_peak=peak)
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        key = "traceback" if self.frames > 1 else "lineno"
+        compared = self._previous is not None
+        if compared:
+            stats = snapshot.compare_to(self._previous, key)[:self.top]
+        else:
+            stats = snapshot.statistics(key)[:self.top]
+        self._previous = snapshot
+
+        lines = []
+        for stat in stats:
+            growth = f" ({'+' if stat.size_diff >= 0 else '-'}{_mb(abs(stat.size_diff))})" if compared else ""
+            site = " <- ".join(f"{frame.filename}:{frame.lineno}" for frame in reversed(stat.traceback))
+            lines.append(f"  {_mb(stat.size)} in {stat.count} blocks{growth}: {site}")
+        ranking = "allocation sites by growth" if compared else "allocation sites"
+        logger.info(f"RSS {_mb(rss)}, traced {_mb(current)} (peak {_mb(peak)}); top {ranking}:\n" + "\n".join(lines))
+        return result
+
+    async def run(self):
+        """Report every ``interval`` seconds until cancelled."""
+        self.start()
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    self.report()
+                except Exception as e:
+                    logger.warning(f"Memory report failed: {e}")
+        finally:
+            self.stop()
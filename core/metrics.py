@@ -0,0 +1,287 @@
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from logger.logger import get_logger
+
+logger = get_logger("Metrics")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labelnames)
+
+    def _format_labels(self, key: tuple, extra: dict | None = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in self._values.items()]
+
+    def snapshot(self) -> list[dict]:
+        return [{"labels": dict(zip(self.labelnames, key)), "value": value} for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. queue depths."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed distribution with sum and count, Prometheus style."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time spent inside the ``with`` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': bound})} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': '+Inf'})} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {self._sums[key]}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+    def snapshot(self) -> list[dict]:
+        return [
+            {
+                "labels": dict(zip(self.labelnames, key)),
+                "count": sum(counts),
+                "sum": self._sums[key],
+                "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], counts)),
+            }
+            for key, counts in self._counts.items()
+        ]
+
+
+class MetricsRegistry:
+    """
+    In-process registry of counters, gauges and histograms.
+
+    Everything runs on the event loop thread, so no locking is done. Metrics
+    are exposed in the Prometheus text format by `serve_metrics` and as a
+    JSON document by `snapshot`.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self.started_at = time.time()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        hits = CACHE_LOOKUPS.value(result="hit")
+        lookups = hits + CACHE_LOOKUPS.value(result="miss")
+        return {
+            "timestamp": time.time(),
+            "uptime_seconds": time.time() - self.started_at,
+            "cache_hit_ratio": hits / lookups if lookups else None,
+            "metrics": {name: metric.snapshot() for name, metric in self._metrics.items()},
+        }
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter("emblem_http_requests_total", "HTTP attempts made by BaseClient by outcome.", ("method", "outcome"))
+HTTP_LATENCY = registry.histogram("emblem_http_request_seconds", "Latency of a single HTTP attempt.", ("method",))
+HTTP_BYTES_SENT = registry.counter("emblem_http_bytes_sent_total", "Request body bytes sent.")
+HTTP_BYTES_RECEIVED = registry.counter("emblem_http_bytes_received_total", "Response body bytes received.")
+CAPTCHA_SOLVES = registry.counter("emblem_captcha_solves_total", "Captcha solve calls by provider and outcome.", ("provider", "outcome"))
+CAPTCHA_LATENCY = registry.histogram("emblem_captcha_solve_seconds", "Captcha solve latency.", ("provider",))
+CAPTCHA_TOKENS = registry.counter("emblem_captcha_tokens_total", "Captcha tokens accepted or rejected by the Aura endpoint, by provider.", ("provider", "outcome"))
+CAPTCHA_COST = registry.counter("emblem_captcha_cost_total", "Price of the solved captcha tokens by provider (CAPTCHA_COSTS units).", ("provider",))
+LISTING_REQUESTS = registry.counter("emblem_listing_requests_total", "Listing page fetches by outcome.", ("outcome",))
+LISTING_LATENCY = registry.histogram("emblem_listing_request_seconds", "Listing page fetch latency including captcha and retries.")
+DETAIL_REQUESTS = registry.counter("emblem_detail_requests_total", "Provider detail fetches by outcome.", ("outcome",))
+DETAIL_LATENCY = registry.histogram("emblem_detail_request_seconds", "Provider detail fetch latency including retries.")
+FILE_WRITES = registry.counter("emblem_file_writes_total", "Output files written by outcome.", ("outcome",))
+FILE_WRITE_LATENCY = registry.histogram("emblem_file_write_seconds", "Latency of encoding and writing an output file.")
+FILE_WRITE_BYTES = registry.counter("emblem_file_write_bytes_total", "Bytes written to output files.")
+STORE_WRITES = registry.counter("emblem_store_writes_total", "Provider store upserts written by outcome.", ("outcome",))
+CACHE_LOOKUPS = registry.counter("emblem_cache_lookups_total", "Cache lookups by result.", ("result",))
+QUEUE_DEPTH = registry.gauge("emblem_queue_depth", "Work items waiting or in flight per stage.", ("stage",))
+MEMORY_RSS = registry.gauge("emblem_process_rss_bytes", "Resident set size of the process at the last memory report.")
+AURA_RESPONSES = registry.counter("emblem_aura_responses_total", "Classified Aura responses by request kind (listing, detail) and outcome.", ("kind", "outcome"))
+INCREMENTAL_RECORDS = registry.counter("emblem_incremental_records_total", "Records observed in incremental mode by kind (page, entry, detail) and status (new, changed, unchanged).", ("kind", "status"))
+LISTING_PAGES = registry.counter("emblem_listing_pages_total", "Listing pages of the searched specialties by result (fetched, failed, skipped by the overlap cut-off).", ("result",))
+SEARCH_RADIUS = registry.counter("emblem_search_radius_total", "Distances the listing searches settled on, by miles.", ("miles",))
+RADIUS_PROBES = registry.counter("emblem_radius_probes_total", "First pages fetched again at another distance, by direction (shrink, widen).", ("direction",))
+YIELD_SEARCHES = registry.counter("emblem_yield_searches_total", "Specialty searches by yield prediction (searched, reprobed, skipped as predicted empty).", ("result",))
+AURA_CONTEXT_REFRESHES = registry.counter("emblem_aura_context_refreshes_total", "Stale aura.context refreshes by source (payload, page) or outcome.", ("source",))
+
+
+def merge_snapshots(snapshots: list[dict]) -> dict:
+    """
+    Combine JSON snapshots from several processes into one: counters, gauges and
+    histogram buckets are summed per label set.
+    """
+    merged: dict[str, dict[tuple, dict]] = {}
+    for snapshot in snapshots:
+        for name, series in snapshot.get("metrics", {}).items():
+            target = merged.setdefault(name, {})
+            for entry in series:
+                key = tuple(sorted(entry["labels"].items()))
+                current = target.get(key)
+                if current is None:
+                    target[key] = json.loads(json.dumps(entry))
+                elif "buckets" in entry:
+                    current["count"] += entry["count"]
+                    current["sum"] += entry["sum"]
+                    for bound, count in entry["buckets"].items():
+                        current["buckets"][bound] = current["buckets"].get(bound, 0) + count
+                else:
+                    current["value"] += entry["value"]
+
+    metrics = {name: list(series.values()) for name, series in merged.items()}
+    cache_lookups = {tuple(e["labels"].values()): e["value"] for e in metrics.get(CACHE_LOOKUPS.name, [])}
+    hits, misses = cache_lookups.get(("hit",), 0), cache_lookups.get(("miss",), 0)
+    return {
+        "timestamp": time.time(),
+        "processes": len(snapshots),
+        "cache_hit_ratio": hits / (hits + misses) if hits + misses else None,
+        "metrics": metrics,
+    }
+
+
+async def _handle_metrics_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await reader.readline()
+        # Drain the request headers; the body is never used.
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        path = request_line.split(b" ")[1] if request_line.count(b" ") >= 2 else b"/"
+        if path.startswith(b"/metrics"):
+            status, content_type, body = "200 OK", "text/plain; version=0.0.4", registry.render_prometheus().encode()
+        elif path.startswith(b"/snapshot"):
+            status, content_type, body = "200 OK", "application/json", json.dumps(registry.snapshot()).encode()
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.warning(f"Error serving metrics: {e}")
+    finally:
+        writer.close()
+
+
+async def serve_metrics(port: int, host: str = "127.0.0.1") -> asyncio.AbstractServer:
+    """
+    Start a minimal HTTP endpoint exposing ``/metrics`` (Prometheus text format)
+    and ``/snapshot`` (JSON). Returns the server; close it when the run ends.
+    """
+    server = await asyncio.start_server(_handle_metrics_request, host, port)
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
+
+
+def write_snapshot(path: str):
+    """Atomically write the current JSON snapshot to ``path``."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry.snapshot(), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def snapshot_periodically(path: str, interval: float):
+    """Write a JSON snapshot every ``interval`` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            write_snapshot(path)
+        except Exception as e:
+            logger.warning(f"Failed to write metrics snapshot to {path}: {e}")
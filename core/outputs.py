@@ -0,0 +1,182 @@
+import glob
+import hashlib
+import os
+import re
+from urllib.parse import quote, unquote
+
+from settings import OUTPUT_PATH, OUTPUT_SHARD_DEPTH
+
+# Characters kept verbatim in filenames; anything else (notably "/" as in
+# "Pregnancy/Pre-Natal/Post-Partum" and "_" used as separator) is percent-encoded.
+_SAFE_CHARS = " &,()-.'"
+
+_LISTING_RE = re.compile(
+    r"^raw_results_(?P<specialty>.+)_(?P<service_type>[^_]+)_(?P<plan_type>[^_]+)_net-(?P<network>[^_]*)_(?P<zip>\d{5})_page_(?P<page>\d+)\.json$"
+)
+# Files written before the plan was part of the name.
+_LEGACY_LISTING_RE = re.compile(
+    r"^raw_results_(?P<specialty>.+)_(?P<service_type>[^_]+)_(?P<zip>\d{5})_page_(?P<page>\d+)\.json$"
+)
+_DETAIL_RE = re.compile(r"^raw_results_(?P<provider_id>.+)\.json$")
+
+
+def _encode(value) -> str:
+    # quote() never encodes "_", the field separator of listing filenames.
+    return quote(str(value), safe=_SAFE_CHARS).replace("_", "%5F")
+
+
+def _encode_network(network_code: str) -> str:
+    # "-" is encoded too: a literal "-" marks the slug of older names (see `parse_listing_filename`).
+    return _encode(network_code).replace("-", "%2D")
+
+
+def network_slug(network_code: str) -> str:
+    """``"D013, D014"`` -> ``"D013-D014"``. Used in keys; it does not keep the spacing of the code."""
+    return "-".join(code.strip() for code in str(network_code).split(",") if code.strip())
+
+
+def listing_filename(specialty: str, service_type: str, zip_code: str, page: int, plan_type: str, network_code: str) -> str:
+    """
+    Name of a saved listing page. The plan is part of the name so that plans
+    sharing a specialty and zip no longer overwrite each other's pages. The
+    network code is kept as sent, so `parse_listing_filename` returns it unchanged.
+    """
+    return (
+        f"raw_results_{_encode(specialty)}_{_encode(service_type)}_{_encode(plan_type)}"
+        f"_net-{_encode_network(network_code)}_{zip_code}_page_{page}.json"
+    )
+
+
+def detail_filename(provider_id: str) -> str:
+    return f"raw_results_{_encode(provider_id)}.json"
+
+
+def shard_of(filename: str, depth: int = 1) -> list[str]:
+    """Hash-prefix directories of a raw file: ``depth`` levels of two hex digits."""
+    digest = hashlib.blake2b(filename.encode("utf-8"), digest_size=8).hexdigest()
+    return [digest[2 * level:2 * level + 2] for level in range(depth)]
+
+
+def raw_path(kind: str, filename: str) -> str:
+    """
+    Path of a raw file of ``kind`` ("listing" or "detail"), e.g.
+    ``outputs/raw/detail/3f/a2/raw_results_X.json`` with OUTPUT_SHARD_DEPTH 2.
+    """
+    return os.path.join(OUTPUT_PATH, kind, *shard_of(filename, OUTPUT_SHARD_DEPTH), filename)
+
+
+def pack_path(kind: str, filename: str) -> str:
+    """Pack the compaction tool moves a raw file into: one per first shard level."""
+    return os.path.join(OUTPUT_PATH, kind, f"{shard_of(filename)[0]}.pack")
+
+
+def listing_path(*args, **kwargs) -> str:
+    return raw_path("listing", listing_filename(*args, **kwargs))
+
+
+def detail_path(provider_id: str) -> str:
+    return raw_path("detail", detail_filename(provider_id))
+
+
+def read_raw(kind: str, filename: str) -> bytes | None:
+    """
+    Content of a saved raw file, wherever it is: the sharded path, the flat layout of
+    older runs, or a pack.
+    """
+    from .archive import open_pack
+
+    for path in (raw_path(kind, filename), os.path.join(OUTPUT_PATH, kind, filename)):
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+    reader = open_pack(pack_path(kind, filename))
+    return reader.get(filename) if reader is not None else None
+
+
+def load_raw(kind: str, path: str, key: str | None) -> tuple[str, bytes, float]:
+    """
+    The ``(name, content, mtime)`` of an `iter_raw` item of ``kind``: a loose raw file, or the
+    record ``key`` of a pack.
+
+    Compaction may run meanwhile. Packed records are looked up by key in the current pack,
+    which carries every record of the one it replaced, and a loose file that was packed
+    since it was listed is read from its pack.
+
+    Raises:
+        FileNotFoundError: The file or record is gone.
+    """
+    from .archive import open_pack
+
+    if key is None:
+        name = os.path.basename(path)
+        try:
+            with open(path, "rb") as f:
+                return name, f.read(), os.fstat(f.fileno()).st_mtime
+        except FileNotFoundError:
+            path, key = pack_path(kind, name), name
+    reader = open_pack(path)
+    record = reader.record(key) if reader is not None else None
+    if record is None:
+        raise FileNotFoundError(f"{key} is not in {path}")
+    return record
+
+
+def iter_raw(kind: str):
+    """
+    Yield ``(path, key)`` for every saved raw file of ``kind`` without listing the whole
+    tree up front: loose files (sharded or flat) with key None, then the keys of packed
+    records not shadowed by a loose file of the same name. Read them with `load_raw`.
+    """
+    from .archive import PackReader
+
+    root = os.path.join(OUTPUT_PATH, kind)
+    if not os.path.isdir(root):
+        return
+    loose = set()
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(".json"):
+                loose.add(filename)
+                yield os.path.join(dirpath, filename), None
+    for path in sorted(glob.glob(os.path.join(root, "*.pack"))):
+        with PackReader(path) as reader:
+            for key, _, _ in reader:
+                if key not in loose:
+                    yield path, key
+
+
+def parse_listing_filename(filename: str) -> dict | None:
+    """
+    Recover the search context from a listing filename, or None if it does not match.
+    Legacy names (without plan) are accepted with empty ``plan_type`` and ``network_code``.
+    Names holding a `network_slug`, as written before the network code was encoded as is,
+    give the codes joined by ``", "``.
+    """
+    name = os.path.basename(filename)
+    match = _LISTING_RE.match(name)
+    if match:
+        network = match["network"]
+        network = ", ".join(unquote(code) for code in network.split("-")) if "-" in network else unquote(network)
+        plan_type = unquote(match["plan_type"])
+    else:
+        match = _LEGACY_LISTING_RE.match(name)
+        if not match:
+            return None
+        network = plan_type = ""
+
+    return {
+        "specialty": unquote(match["specialty"]),
+        "service_type": unquote(match["service_type"]),
+        "plan_type": plan_type,
+        "network_code": network,
+        "zip": match["zip"],
+        "page": int(match["page"]),
+    }
+
+
+def parse_detail_filename(filename: str) -> str | None:
+    """Return the provider id encoded in a detail filename."""
+    match = _DETAIL_RE.match(os.path.basename(filename))
+    return unquote(match["provider_id"]) if match else None
@@ -0,0 +1,85 @@
+import time
+
+from settings import PAGINATION_CUTOFF_PAGES, PAGINATION_SAMPLE_STRIDE
+
+
+def listed_key(provider_id: str) -> str:
+    return f"listed:{provider_id}"
+
+
+def mark_listed(cache, provider_ids: list) -> bool | None:
+    """
+    Record the providers of a listing page as listed, and tell whether all of them were listed before.
+
+    One read transaction checks the page's ``ProviderId``s; only the new ones are written.
+
+    Returns:
+        bool | None: True if every provider was already known, None for a page without providers.
+    """
+    keys = [listed_key(provider_id) for provider_id in provider_ids if provider_id]
+    if not keys:
+        return None
+    known = cache.exists_many(keys)
+    if not all(known):
+        now = str(int(time.time()))
+        cache.set_many((key, now) for key, was_known in zip(keys, known) if not was_known)
+    return all(known)
+
+
+class OverlapPagination:
+    """
+    Page walk of one specialty search that stops once its pages only repeat known providers.
+
+    Results are ranked by distance, so neighbouring zips return largely the same providers.
+    After ``cutoff`` consecutive pages whose providers were all listed before (by any
+    search), the remaining pages are skipped, or with a ``stride`` only every ``stride``-th
+    page is fetched. A sampled page with a new provider resumes the full walk from there;
+    the pages skipped before it are not revisited.
+
+    Example:
+        >>> pages = OverlapPagination(cutoff=2)
+        >>> page = 1
+        >>> while page <= pages.total_pages:
+        ...     page = pages.advance(page, mark_listed(cache, provider_ids_of(page)))
+    """
+
+    def __init__(self, total_pages: int = 1, cutoff: int = PAGINATION_CUTOFF_PAGES, stride: int = PAGINATION_SAMPLE_STRIDE):
+        """
+        Args:
+            total_pages (int): Pages of the search, updated once the first page tells.
+            cutoff (int): Consecutive fully known pages before cutting off; 0 walks every page.
+            stride (int): Sampling stride after the cut-off; 0 stops instead.
+        """
+        self.total_pages = total_pages
+        self.cutoff = cutoff
+        self.stride = stride
+        self.streak = 0
+        self.fetched = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.cutoff > 0
+
+    @property
+    def skipped(self) -> int:
+        """Pages of the search that were never requested."""
+        return max(0, self.total_pages - self.fetched)
+
+    def advance(self, page: int, fully_known: bool | None) -> int:
+        """
+        Record the outcome of ``page`` and return the next page to fetch (past `total_pages` when done).
+
+        Args:
+            page (int): The page just fetched.
+            fully_known (bool | None): All its providers were listed before; None when unknown
+                (failed or empty page), which leaves the streak as it is.
+        """
+        self.fetched += 1
+        if fully_known is True:
+            self.streak += 1
+        elif fully_known is False:
+            self.streak = 0
+
+        if self.enabled and self.streak >= self.cutoff:
+            return page + self.stride if self.stride > 0 else self.total_pages + 1
+        return page + 1
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from logger.logger import get_logger
+from .extract import listing_records, extract_ip_result
+from .outputs import iter_raw, load_raw, read_raw, parse_listing_filename, detail_filename
+
+logger = get_logger("ParquetExport")
+
+PARTITIONS = ("state", "plan_type", "specialty")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError as e:
+        raise ImportError("The Parquet export needs pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def provider_schema():
+    """Arrow schema of the exported provider rows."""
+    pa = _pyarrow()
+    return pa.schema([
+        ("provider_id", pa.string()),
+        ("provider_name", pa.string()),
+        ("state", pa.string()),
+        ("plan_type", pa.string()),
+        ("network_code", pa.string()),
+        ("specialty", pa.string()),
+        ("service_type", pa.string()),
+        ("zip", pa.string()),
+        ("page", pa.int32()),
+        ("listed_at", pa.timestamp("s")),
+        ("listing", pa.string()),            # listing entry as JSON
+        ("detail", pa.string()),             # detail IPResult as JSON, null if never fetched
+    ])
+
+
+def _row_key(provider_id: str, context: dict) -> int:
+    key = f"{provider_id}|{context['plan_type']}|{context['network_code']}|{context['service_type']}:{context['specialty']}"
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class ProviderRows:
+    """
+    Streams provider rows from the saved listing pages, one per ``ProviderId`` within each
+    plan (``planType`` and ``networkCode``) and specialty.
+
+    The first listing a provider is seen in supplies its search context, including the state of
+    the searched zip. Only a 64-bit digest of each row already emitted is kept, in a set of
+    ints that costs about 70 bytes per row, so memory grows with the number of distinct rows
+    rather than with their content.
+    """
+
+    def __init__(self, states: dict[str, str] | None = None, with_detail: bool = True):
+        """
+        Args:
+            states (dict[str, str] | None): State code by five-digit zip; read from the Excel inputs if omitted.
+            with_detail (bool): Join each provider's saved detail.
+        """
+        if states is None:
+            from utils import read_uszips_data
+            states = {str(row["zip"]).zfill(5): row["state_id"] for row in read_uszips_data()}
+        self.states = states
+        self.with_detail = with_detail
+        self.stats = {"listing_files": 0, "rows": 0, "duplicates": 0, "errors": 0, "with_detail": 0}
+        self._seen = set()
+
+    def __iter__(self):
+        for path, key in iter_raw("listing"):
+            try:
+                name, raw, mtime = load_raw("listing", path, key)
+                context = parse_listing_filename(name)
+                if context is None:
+                    raise ValueError("unrecognised listing filename")
+                records = listing_records(json.loads(raw), context)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Skipping {path}: {type(e).__name__}: {e}")
+                continue
+            self.stats["listing_files"] += 1
+
+            for record in records:
+                provider_id = str(record["ProviderId"])
+                key = _row_key(provider_id, context)
+                if key in self._seen:
+                    self.stats["duplicates"] += 1
+                    continue
+                self._seen.add(key)
+
+                detail = self._detail(provider_id)
+                self.stats["rows"] += 1
+                yield {
+                    "provider_id": provider_id,
+                    "provider_name": record.get("providerFullName"),
+                    "state": self.states.get(context["zip"]),
+                    "plan_type": context["plan_type"],
+                    "network_code": context["network_code"],
+                    "specialty": context["specialty"],
+                    "service_type": context["service_type"],
+                    "zip": context["zip"],
+                    "page": context["page"],
+                    "listed_at": int(mtime),
+                    "listing": json.dumps({k: v for k, v in record.items() if k != "_search"}),
+                    "detail": detail,
+                }
+
+    def _detail(self, provider_id: str) -> str | None:
+        if not self.with_detail:
+            return None
+        raw = read_raw("detail", detail_filename(provider_id))
+        try:
+            ip_result = extract_ip_result(json.loads(raw).get("body", "")) if raw is not None else None
+        except (ValueError, AttributeError) as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Unreadable detail of provider {provider_id}: {e}")
+            return None
+        if not ip_result:
+            return None
+        self.stats["with_detail"] += 1
+        return json.dumps(ip_result)
+
+
+def record_batches(rows, schema, batch_size: int = 10000):
+    """Group rows into Arrow record batches of ``batch_size``, so only one batch is held at a time."""
+    pa = _pyarrow()
+    columns = {name: [] for name in schema.names}
+    count = 0
+    for row in rows:
+        for name in schema.names:
+            columns[name].append(row[name])
+        count += 1
+        if count == batch_size:
+            yield pa.RecordBatch.from_pydict(columns, schema=schema)
+            columns = {name: [] for name in schema.names}
+            count = 0
+    if count:
+        yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def export_parquet(output_dir: str, batch_size: int = 10000, with_detail: bool = True, states: dict | None = None) -> dict:
+    """
+    Write the providers of the saved raw outputs as a Parquet dataset partitioned by
+    ``state``, ``plan_type`` and ``specialty`` (hive style, e.g. ``state=NY/plan_type=HIP/...``).
+
+    Rows are streamed in record batches, so memory stays bounded by ``batch_size`` and
+    the set of row digests. The dataset is written next to ``output_dir`` and swapped in
+    once complete.
+
+    Args:
+        output_dir (str): Directory of the dataset; replaced as a whole.
+        batch_size (int): Rows per record batch (and at most per row group).
+        with_detail (bool): Join the saved provider details.
+        states (dict | None): State code by zip, see `ProviderRows`.
+
+    Returns:
+        dict: Counters of listing files, rows, duplicates, rows with detail and errors.
+    """
+    pa = _pyarrow()
+    schema = provider_schema()
+    rows = ProviderRows(states, with_detail)
+    tmp_dir = f"{output_dir.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    started = time.perf_counter()
+
+    pa.dataset.write_dataset(
+        record_batches(rows, schema, batch_size),
+        tmp_dir,
+        schema=schema,
+        format="parquet",
+        partitioning=pa.dataset.partitioning(pa.schema([schema.field(name) for name in PARTITIONS]), flavor="hive"),
+        basename_template="part-{i}.parquet",
+        max_rows_per_group=batch_size,
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+    os.makedirs(tmp_dir, exist_ok=True)  # write_dataset creates nothing when there are no rows
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.replace(tmp_dir, output_dir)
+    logger.info(f"Exported {rows.stats['rows']} providers to {output_dir} in {time.perf_counter() - started:.1f}s: {rows.stats}")
+    return rows.stats
@@ -0,0 +1,121 @@
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+
+from logger.logger import get_logger
+from .metrics import QUEUE_DEPTH
+from .process_detail import process_provider
+from settings import DETAIL_WORKERS, DETAIL_QUEUE_SIZE
+
+logger = get_logger("Pipeline")
+
+_stage: contextvars.ContextVar["DetailStage | None"] = contextvars.ContextVar("detail_stage", default=None)
+_unit: contextvars.ContextVar["_Unit | None"] = contextvars.ContextVar("detail_unit", default=None)
+
+
+class _Unit:
+    """Providers submitted on behalf of one zip or job queue unit and not finished yet."""
+
+    def __init__(self):
+        self.pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def add(self):
+        self.pending += 1
+        self._idle.clear()
+
+    def done(self):
+        self.pending -= 1
+        if not self.pending:
+            self._idle.set()
+
+    async def wait(self):
+        await self._idle.wait()
+
+
+class DetailStage:
+    """
+    Bounded queue between the listing pages and the provider detail fetches.
+
+    A listing page submits its providers and moves on to the next page; ``workers`` tasks
+    fetch the details. When ``maxsize`` providers are waiting, `submit` blocks, so listing
+    requests never run far ahead of detail requests and memory stays bounded whatever the
+    size of the crawl. Each provider is processed in a copy of the submitter's context, so
+    its log fields and trace spans still name the zip, plan and specialty.
+
+    Used as an async context manager around a crawl; tasks started inside it submit through
+    `submit_detail`. Use `unit_details` to wait for the details of one unit.
+    """
+
+    def __init__(self, workers: int = DETAIL_WORKERS, maxsize: int = DETAIL_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self._queue = None
+        self._tasks = []
+        self._token = None
+
+    async def __aenter__(self) -> "DetailStage":
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._token = _stage.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        _stage.reset(self._token)
+        try:
+            if exc_type is None:
+                await self._queue.join()
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, *args, **kwargs):
+        """Queue ``process_provider(*args, **kwargs)``, waiting while the queue is full."""
+        unit = _unit.get()
+        if unit is not None:
+            unit.add()
+        QUEUE_DEPTH.inc(stage="detail_waiting")
+        await self._queue.put((contextvars.copy_context(), unit, args, kwargs))
+
+    async def _work(self):
+        while True:
+            context, unit, args, kwargs = await self._queue.get()
+            QUEUE_DEPTH.dec(stage="detail_waiting")
+            QUEUE_DEPTH.inc(stage="detail_in_flight")
+            try:
+                await asyncio.create_task(process_provider(*args, **kwargs), context=context)
+            except Exception as e:
+                logger.error(f"Detail of provider {getattr(args[0], 'provider_id', '?') if args else '?'} failed: {e}")
+            finally:
+                QUEUE_DEPTH.dec(stage="detail_in_flight")
+                if unit is not None:
+                    unit.done()
+                self._queue.task_done()
+
+
+async def submit_detail(*args, **kwargs) -> bool:
+    """
+    Hand ``process_provider(*args, **kwargs)`` to the running `DetailStage`.
+
+    Returns:
+        bool: False if no stage is running; the caller then processes the provider itself.
+    """
+    stage = _stage.get()
+    if stage is None:
+        return False
+    await stage.submit(*args, **kwargs)
+    return True
+
+
+@asynccontextmanager
+async def unit_details():
+    """Wait on exit until the details submitted inside the block are processed."""
+    unit = _Unit()
+    token = _unit.set(unit)
+    try:
+        yield unit
+    finally:
+        _unit.reset(token)
+    await unit.wait()
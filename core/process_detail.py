@@ -1,119 +1,142 @@
-from .base_client import BaseClient
-from urllib.parse import urlencode, quote
-from logger.logger import get_logger
-import json
+from logger.logger import get_logger, log_context
 import os
 import random
 import asyncio
+import time
 from .helpers import two_cap, capsolver, save_content_as_json, fake_solve_captcha
+from .context import get_context
+from .dead_letter import detail_letter
+from .metrics import DETAIL_REQUESTS, DETAIL_LATENCY, CACHE_LOOKUPS, AURA_RESPONSES
+from .tracing import span
+from .aura_request import provider_details_body, post_aura
+from .aura_response import classify, Action, Outcome
+from .outputs import detail_path
+from .records import ProviderSummary
+from .incremental import UNCHANGED, content_digest, detail_key
 from configs import HEADERS
-from settings import OUTPUT_PATH, SEQUENTIAL_FLOW
-from cache import CacheHandler
+from settings import OUTPUT_PATH, SEQUENTIAL_FLOW, INCREMENTAL, DETAIL_FRESHNESS_DAYS
 
-cache = CacheHandler(use_existing_cache=True)
-client = BaseClient(base_url="https://my.emblemhealth.com", use_proxy=True, retries=False)
 logger = get_logger("Process Detail")
 
-async def process_provider(provider: dict, plan_type:str, network_code:str, service_type:str, provider_speciality:str) -> bool:
+def _is_processed(provider_id: str, listing_changed: bool) -> bool:
+    cache = get_context().cache
+    if not INCREMENTAL:
+        return cache.exists(provider_id)
+    # The cache value is the time the detail was saved; older caches hold other values there.
+    fetched_at = cache.get_str(provider_id)
+    if listing_changed or fetched_at is None:
+        return False
+    try:
+        fetched_at = int(fetched_at)
+    except ValueError:
+        # Age unknown: treat as stale, and the fetch stores its time.
+        return False
+    return time.time() - fetched_at < DETAIL_FRESHNESS_DAYS * 86400
+
+
+async def process_provider(provider: ProviderSummary | dict, plan_type:str, network_code:str, service_type:str, provider_speciality:str,
+                           listing_changed: bool = False) -> bool:
     """
     Asynchronously processes a single provider's details based on the given parameters.
 
     Args:
-        provider (dict): A dictionary containing the provider's information, including 'ProviderId' and 'providerFullName'.
+        provider (ProviderSummary | dict): The provider's summary, or a listing entry with its 'ProviderId' and 'providerFullName'.
         plan_type (str): The type of plan associated with the provider.
         network_code (str): The network code for the provider.
         service_type (str): The type of service the provider offers.
         provider_speciality (str): The speciality of the provider.
+        listing_changed (bool): The provider's listing entry changed since the last run. In incremental
+            mode this forces a fetch; otherwise details older than DETAIL_FRESHNESS_DAYS are fetched again.
 
     Returns:
         bool: True if the provider processing is successful, False otherwise.
     """
 
-    provider_id = provider['ProviderId']
-    if cache.exists(provider_id):
-        logger.info(f"Provider {provider['providerFullName']} | ID: {provider['ProviderId']} already processed. Skipping.")
+    provider = ProviderSummary.of(provider)
+    provider_id = provider.provider_id
+    if _is_processed(provider_id, listing_changed):
+        CACHE_LOOKUPS.inc(result="hit")
+        DETAIL_REQUESTS.inc(outcome="cached")
+        logger.info(f"Provider {provider.name} | ID: {provider_id} already processed. Skipping.")
         return True
+    CACHE_LOOKUPS.inc(result="miss")
+
+    with span("detail.provider", provider_id=provider_id, service_type=service_type), log_context(provider=provider_id):
+        return await _fetch_provider_detail(provider, plan_type, network_code, service_type, provider_speciality)
+
+
+async def _fetch_provider_detail(provider: ProviderSummary, plan_type:str, network_code:str, service_type:str, provider_speciality:str) -> bool:
+    provider_id = provider.provider_id
+    started_at = time.perf_counter()
         
-    logger.info(f"Processing provider {provider['providerFullName']} | ID: {provider['ProviderId']}")
-    aura_context = {"mode":"PROD","fwuid":"VFJhRGxfRlFsN29ySGg2SXFsaUZsQTFLcUUxeUY3ZVB6dE9hR0VheDVpb2cxMy4zMzU1NDQzMi41MDMzMTY0OA","app":"siteforce:communityApp","loaded":{"APPLICATION@markup://siteforce:communityApp":"1411_ppEHPnivv6tDSveOy-pRIw"},"dn":[],"globals":{},"uad":True}
-    
-    inputs = {
-        "providerId":f"{provider_id}",
-        "tenantId":"EH",
-        "planType":f"{plan_type}",
-        "networkCode":f"{network_code}",
-        "fhn":"",
-        "ServiceType":f"{service_type}",
-        "providerSpeciality":""
-    }
-
-    message = {
-        "actions": [
-            {
-                "id": "198;a",
-                "descriptor": "aura://ApexActionController/ACTION$execute",
-                "callingDescriptor": "UNKNOWN",
-                "params": {
-                    "namespace": "vlocity_ins",
-                    "classname": "BusinessProcessDisplayController",
-                    "method": "GenericInvoke2NoCont",
-                    "params": {
-                        "input": json.dumps(inputs, separators=(',', ':')),
-                        "options": "{}",
-                        "sClassName": "vlocity_ins.IntegrationProcedureService",
-                        "sMethodName": "Member_providerDetails"
-                    },
-                    "cacheable": False,
-                    "isContinuation": False
-                }
-            }
-        ]
-    }
-    
-    payload = {
-        "message": json.dumps(message, separators=(',', ':')),
-        "aura.context": json.dumps(aura_context, separators=(',', ':')),
-        "aura.pageURI" : "",
-        "aura.token":"null"
-    }
-    
-    payload = urlencode(payload, quote_via=quote)
+    logger.info(f"Processing provider {provider.name} | ID: {provider_id}")
+    def render(context):
+        return provider_details_body(
+            "198;a", provider_id=f"{provider_id}", plan_type=f"{plan_type}", network_code=f"{network_code}", service_type=f"{service_type}",
+            context=context,
+        )
+
     rid = random.randint(43, 47)
     url = f"/member/s/sfsites/aura?r={rid}&aura.ApexAction.execute=1"
     
     os.makedirs(f"{OUTPUT_PATH}/detail", exist_ok=True)
 
-    for attempt in range(1, 11):
+    client = get_context().client
+    policy = client.retry_policy
+    max_attempts = policy.max_attempts
+    action = None
+    attempts, failure, error = 0, "transport", ""
+
+    for attempt in range(1, max_attempts + 1):
+        if attempt > 1:
+            # Transport errors were already retried by the client; these are Aura level retries.
+            if not policy.allow_retry():
+                break
+            logger.info(f"Retrying... (Attempt {attempt}/{max_attempts})")
+            if action is Action.BACK_OFF:
+                await policy.sleep_before_retry(attempt - 1)
+
         logger.debug(f"Making request to {url} | Attempt {attempt}")
-        try:
-            response = await client._request("POST",
-            url,
-            data=payload,
-            headers=HEADERS
-            )
-
-            resp = json.loads(response['body'])
-            data = [
-                action for action in resp.get("actions", [])
-                if "returnValue" in action and "returnValue" in action["returnValue"]
-            ]
-
-            for d in data:
-                if d['state'] != "SUCCESS":
-                    continue
-                results = d['returnValue']['returnValue']
-                results = json.loads(results).get("IPResult", [])
-
-                if results:
-                    filename = f"raw_results_{provider_id}.json"
-                    save_content_as_json(response, f"{OUTPUT_PATH}/detail/{filename}")
-                    return True
-
-        except Exception as exc:
-            logger.error(f"Error during search_doctors: {exc}")
-            if attempt >=10:
-                logger.critical(f"Max retries reached. Failing the request. | Provider ID: {provider_id} | Plan Type: {plan_type} | Network Code: {network_code} | Service Type: {service_type} | Provider Speciality: {provider_speciality}")
+        response = await post_aura(client, url, render, HEADERS)
+        attempts += 1
+
+        if not response:
+            # The client has exhausted its own retries (or hit a non-retryable status).
+            failure, error = "transport", "No response after the client's retries"
+            break
+
+        with span("detail.parse", bytes=len(response['body'])):
+            classified = classify(response['body'])
+        AURA_RESPONSES.inc(kind="detail", outcome=classified.outcome.value)
+        action = classified.action
+        failure, error = classified.outcome.value, classified.message
+
+        if classified.outcome is Outcome.SUCCESS:
+            if INCREMENTAL and get_context().digests.observe([(detail_key(provider_id), content_digest(classified.result))])[0] == UNCHANGED:
+                logger.debug(f"Detail of provider {provider_id} unchanged since the last fetch; not rewritten")
             else:
-                logger.info(f"Retrying... (Attempt {attempt}/10)")
-    
+                save_content_as_json(response, detail_path(provider_id))
+            if get_context().provider_store is not None:
+                get_context().provider_store.add_detail(provider_id, classified.result)
+            get_context().cache.set(provider_id, str(int(time.time())))
+            DETAIL_LATENCY.observe(time.perf_counter() - started_at)
+            DETAIL_REQUESTS.inc(outcome="success")
+            return True
+
+        if classified.outcome is Outcome.THROTTLED:
+            # Throttling answers with HTTP 200, so the client cannot tell the breaker about it.
+            policy.record_failure()
+
+        if action is not Action.BACK_OFF:
+            # Detail lookups carry no captcha, so anything that is neither a result nor transient is final.
+            logger.error(f"Non-retryable Aura response ({classified.outcome.value}): {classified.message} | Provider ID: {provider_id}")
+            break
+
+        logger.warning(f"Aura response {classified.outcome.value}: {classified.message} | Attempt {attempt}/{max_attempts}")
+
+    logger.critical(f"Giving up on the request. | Provider ID: {provider_id} | Plan Type: {plan_type} | Network Code: {network_code} | Service Type: {service_type} | Provider Speciality: {provider_speciality}")
+    DETAIL_LATENCY.observe(time.perf_counter() - started_at)
+    get_context().dead_letters.record(*detail_letter(provider.as_dict(), plan_type, network_code, service_type, provider_speciality),
+                                      failure=failure, attempts=attempts, error=error)
+    DETAIL_REQUESTS.inc(outcome="failed")
     return False
\ No newline at end of file
@@ -1,28 +1,53 @@
-from .base_client import BaseClient
-from urllib.parse import urlencode, quote
-from logger.logger import get_logger
+from logger.logger import get_logger, log_context, redact
 from .process_detail import process_provider
-import json
 import os
 import random
 import asyncio
-from .helpers import save_content_as_json, solve_captcha
+import time
+from .helpers import save_content_as_json
+from .metrics import LISTING_REQUESTS, LISTING_LATENCY, LISTING_PAGES, AURA_RESPONSES, SEARCH_RADIUS, RADIUS_PROBES
+from .tracing import span
+from .aura_request import find_doctor_body, post_aura
+from .aura_response import classify, Action, Outcome
+from .outputs import listing_path, listing_filename
+from .incremental import CHANGED, UNCHANGED
+from .pagination import OverlapPagination, mark_listed
+from .radius import DEFAULT_DISTANCE, distance_param
+from .context import get_context
+from .dead_letter import listing_letter
+from .pipeline import submit_detail
+from .records import ListingPage
 from configs import HEADERS
-from settings import OUTPUT_PATH, SEQUENTIAL_FLOW
+from settings import OUTPUT_PATH, SEQUENTIAL_FLOW, INCREMENTAL, ADAPTIVE_RADIUS, PACING_DELAY_MIN, PACING_DELAY_MAX
 
 
 
-client = BaseClient(base_url="https://my.emblemhealth.com", use_proxy=True, retries=False)
 logger = get_logger("Listing")
 
 
-async def search_doctors(search_params: dict={}):
+def page_count(total_results: int, page_size: int = 50) -> int:
+    return (total_results // page_size) + (1 if total_results % page_size > 0 else 0)
+
+
+async def search_doctors(search_params: dict={}) -> bool:
+    """
+    Fetch every listing page of each specialty in ``search_params`` for one zip and plan.
+
+    With ADAPTIVE_RADIUS the distance of each specialty is chosen by `probe_radius` and used
+    for all of its pages. The ``totalRecords`` of each specialty is added to the `YieldStats`,
+    and with YIELD_SKIP_EMPTY specialties predicted empty for this plan and region are skipped.
+
+    Returns:
+        bool: True if every page was fetched, False if some page failed after retries.
+    """
     logger.info("Starting search_doctors...")
+    complete = True
     
     plan_type = search_params.get("planType", "")
     network_code = search_params.get("networkCode", "")
     page_size = 50
     zip_code = search_params.get("zipCode", "10001")
+    yields = get_context().yield_stats
     
     os.makedirs(f"{OUTPUT_PATH}/listing", exist_ok=True)
 
@@ -32,77 +57,186 @@ async def search_doctors(search_params: dict={}):
         service_type = sp['type']
         specialty = sp['code']
         
+        if yields.should_skip(plan_type, network_code, f"{service_type}:{specialty}", zip_code):
+            logger.info(f"Skipping {specialty} ({service_type}): no results in the region in the last run | Zip: {zip_code}")
+            continue
+
         # Reset page counter for each specialty
         page = 1
-        total_pages = 1
+        pages = OverlapPagination()
+        params = search_params
 
         logger.info(f"Processing specialty: {specialty} ({service_type}) | Zip: {zip_code}")
 
-        while page <= total_pages:
-            start = (page - 1) * page_size
-            logger.info(f"Fetching page {page} of {total_pages} | Zip: {zip_code} | Start: {start}")
-            
-            try:
-                response = await make_request(page, service_type, specialty, search_params, start)
+        with span("listing.specialty", specialty=specialty, service_type=service_type, zip=zip_code), \
+                log_context(zip=zip_code, plan=plan_type, specialty=specialty, service_type=service_type):
+            while page <= pages.total_pages:
+                start = (page - 1) * page_size
+                logger.info(f"Fetching page {page} of {pages.total_pages} | Zip: {zip_code} | Start: {start}")
                 
-                # Check if response is empty (failed after retries)
-                if not response:
+                with span("listing.page", page=page, start=start), log_context(page=page):
+                    if page == 1 and ADAPTIVE_RADIUS:
+                        params, first_page = await probe_radius(search_params, service_type, specialty, page_size)
+                        listing = await fetch_listing_page(params, service_type, specialty, page, page_size,
+                                                           response=first_page) if first_page else None
+                        del first_page
+                    else:
+                        listing = await fetch_listing_page(params, service_type, specialty, page, page_size)
+
+                fully_known = None
+                if listing is None:
                     logger.error(f"Failed to fetch results for {specialty} ({service_type}) page {page}")
-                    page += 1
-                    continue
-                
-                filename = f"raw_results_{specialty}_{service_type}_{zip_code}_page_{page}.json"
-                save_content_as_json(response, f"{OUTPUT_PATH}/listing/{filename}")
-
-                if page == 1:
-                    total_results = response.get('totalRecords', 0)
-                    if total_results == 0:
-                        logger.info(f"No results found for {specialty} ({service_type}). | Zip: {zip_code}")
-                        break
-                    total_pages = (total_results // page_size) + (1 if total_results % page_size > 0 else 0)
-                    logger.info(f"Total results: {total_results}, Total pages: {total_pages}")
-
-                if SEQUENTIAL_FLOW:
-                    results = response.get('providerList', [])
-                    for result in results:
-                        await process_provider(result, plan_type, network_code, service_type, specialty)
-
-                page += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing page {page} for {specialty} ({service_type}): {e}")
-                page += 1
-                continue
-        
-        logger.info(f"Completed specialty: {specialty} ({service_type}) | Total pages processed: {page - 1}")
-        
+                    LISTING_PAGES.inc(result="failed")
+                    complete = False
+                else:
+                    LISTING_PAGES.inc(result="fetched")
+                    if page == 1:
+                        total_results = listing.total_records
+                        yields.record(plan_type, network_code, f"{service_type}:{specialty}", zip_code, total_results)
+                        pages.total_pages = page_count(total_results, page_size)
+                        if total_results == 0:
+                            logger.info(f"No results found for {specialty} ({service_type}). | Zip: {zip_code}")
+                            break
+                        logger.info(f"Total results: {total_results}, Total pages: {pages.total_pages}")
+                    if pages.enabled:
+                        fully_known = mark_listed(get_context().cache, [provider.provider_id for provider in listing.providers])
+                page = pages.advance(page, fully_known)
+
+            if pages.skipped:
+                LISTING_PAGES.inc(pages.skipped, result="skipped")
+                logger.info(f"Skipped {pages.skipped}/{pages.total_pages} pages of already listed providers | {specialty} ({service_type}) | Zip: {zip_code}")
+
+        logger.info(f"Completed specialty: {specialty} ({service_type}) | Total pages processed: {pages.fetched}")
+
+    return complete
+
+async def probe_radius(search_params: dict, service_type: str, specialty: str, page_size: int = 50) -> tuple[dict, dict]:
+    """
+    Fetch the first listing page of a specialty at the distance the `RadiusPlanner` settles on.
+
+    The page is fetched at the planned distance and again at a smaller (or larger) one while
+    its ``totalRecords`` is outside the planner's target; each distance is tried once.
+
+    Returns:
+        tuple[dict, dict]: ``search_params`` with the chosen ``distance``, and the first page
+        at that distance (empty if it failed).
+    """
+    zip_code = search_params.get("zipCode", "10001")
+    search = f"{service_type}:{specialty}"
+    planner = get_context().radius_planner
+
+    miles = planner.initial(zip_code, search)
+    tried = []
+    while True:
+        params = {**search_params, "distance": distance_param(miles)}
+        response = await make_request(1, service_type, specialty, params, 0)
+        if not response:
+            return params, {}
+
+        tried.append(miles)
+        total = response.get('totalRecords', 0)
+        proposal = planner.adjust(zip_code, search, miles, total, tried)
+        if proposal == miles:
+            SEARCH_RADIUS.inc(miles=f"{miles:g}")
+            logger.info(f"Search radius {params['distance']}: {total} results, {page_count(total, page_size)} pages")
+            return params, response
+
+        RADIUS_PROBES.inc(direction="shrink" if proposal < miles else "widen")
+        logger.info(f"{total} results within {params['distance']}; searching again within {distance_param(proposal)}")
+        miles = proposal
+
+
+async def fetch_listing_page(search_params: dict, service_type: str, specialty: str, page: int, page_size: int = 50,
+                             response: dict | None = None) -> ListingPage | None:
+    """
+    Fetch and save one listing page and, with SEQUENTIAL_FLOW, the details of its providers.
+
+    Inside a running `DetailStage` the providers are queued for it and the page returns
+    as soon as they are queued; otherwise their details are fetched one by one here.
+
+    A page that fails is recorded in the dead-letter store, from where
+    ``main.py --retry-failed`` fetches it again through this function.
+
+    Args:
+        response (dict | None): The page's ``IPResult`` if it was already fetched (by `probe_radius`);
+            it is then saved and processed without another request.
+
+    Returns:
+        ListingPage | None: ``totalRecords`` and the providers of the page, or None if it failed.
+        The decoded ``IPResult`` itself is released once the page is saved.
+    """
+    plan_type = search_params.get("planType", "")
+    network_code = search_params.get("networkCode", "")
+    zip_code = search_params.get("zipCode", "10001")
+    start = (page - 1) * page_size
+
+    try:
+        if response is None:
+            response = await make_request(page, service_type, specialty, search_params, start)
+        if not response:
+            return None
+
+        entries = {}
+        page_status = None
+        if INCREMENTAL:
+            page_status, entries = get_context().digests.observe_listing(
+                listing_filename(specialty, service_type, zip_code, page, plan_type, network_code), response)
+
+        if page_status == UNCHANGED:
+            logger.debug(f"Listing page {page} unchanged since the last run; not rewritten")
+        else:
+            save_content_as_json(response, listing_path(specialty, service_type, zip_code, page, plan_type, network_code))
+
+        store = get_context().provider_store
+        if store is not None:
+            store.add_listing(response.get('providerList', []), zip_code, plan_type, network_code, service_type, specialty)
+
+        listing = ListingPage.from_result(response)
+        # The page is saved; drop the decoded IPResult before waiting on the detail stage.
+        del response
+        if SEQUENTIAL_FLOW:
+            for provider in listing.providers:
+                args = (provider, plan_type, network_code, service_type, specialty)
+                listing_changed = entries.get(provider.provider_id) == CHANGED
+                if not await submit_detail(*args, listing_changed=listing_changed):
+                    await process_provider(*args, listing_changed=listing_changed)
+        return listing
+
+    except Exception as e:
+        logger.error(f"Error processing page {page} for {specialty} ({service_type}): {e}")
+        get_context().dead_letters.record(*listing_letter(search_params, service_type, specialty, page),
+                                          failure="exception", attempts=1, error=f"{type(e).__name__}: {e}")
+        return None
+
 
 async def make_request(page: int, service_type: str, specialty: str, search_params: dict={}, start: int = 0) -> dict:
+    started_at = time.perf_counter()
     zip_code = search_params.get("zipCode", "10001")
-    distance = search_params.get("distance", "50mi")
+    distance = search_params.get("distance", DEFAULT_DISTANCE)
     first_name = search_params.get("firstName", "")
     last_name = search_params.get("lastName", "")
     size = search_params.get("size", 50)
     plan_type = search_params.get("planType", "")
     network_code = search_params.get("networkCode", "")
 
-    aura_context = {
-        "mode": "PROD",
-        "fwuid": "VFJhRGxfRlFsN29ySGg2SXFsaUZsQTFLcUUxeUY3ZVB6dE9hR0VheDVpb2cxMy4zMzU1NDQzMi41MDMzMTY0OA",
-        "app": "siteforce:communityApp",
-        "loaded": {
-            "APPLICATION@markup://siteforce:communityApp": "1411_ppEHPnivv6tDSveOy-pRIw"
-        },
-        "dn": [],
-        "globals": {},
-        "uad": True
-    }
-
     actionid = 188 if page == 1 else 188 + (page - 1) * 2
     
-    max_attempts = 10
+    client = get_context().client
+    captchas = get_context().captcha_router
+    policy = client.retry_policy
+    max_attempts = policy.max_attempts
+    action = None
+    attempts, failure, error = 0, "transport", ""
     
     for attempt in range(1, max_attempts + 1):
+        if attempt > 1:
+            # Transport errors were already retried by the client; these are Aura level retries.
+            if not policy.allow_retry():
+                break
+            logger.info(f"Retrying... (Attempt {attempt}/{max_attempts})")
+            if action is Action.BACK_OFF:
+                await policy.sleep_before_retry(attempt - 1)
+
         initial_rand = random.randint(37, 42)
         random_increment = random.randint(4, 6)
         random_int = (page - 1) * random_increment
@@ -110,95 +244,63 @@ async def make_request(page: int, service_type: str, specialty: str, search_para
         
         url = f"/member/s/sfsites/aura?r={rid}&aura.ApexAction.execute=1"
 
-        # captcha_token = await solve_captcha('2captcha')
-        captcha_token = await solve_captcha()
-    
+        with span("captcha.solve", attempt=attempt):
+            captcha_token, captcha_provider = await captchas.solve()
+
         if not captcha_token:
             logger.error("Failed to solve captcha after multiple attempts")
             
-        logger.debug(f"Using captcha token: {captcha_token}")
-        
-        payload = {
-            "lastName": last_name,
-            "tenantId": "EH",
-            "planId": "",
-            "planType": plan_type,
-            "firstName": first_name,
-            "ServiceType": service_type,
-            "networkId": "",
-            "networkCode": network_code,
-            "distance": distance,
-            "zipCode": zip_code,
-            "providerSpeciality": specialty,
-            "from": start,
-            "size": size,
-            "fhn": "",
-            "captchaResp": captcha_token,
-        }
+        logger.debug(f"Using captcha token: {redact(captcha_token)}")
         
-        message = {
-            "actions": [{
-                "id": f"{actionid};a",
-                "descriptor": "aura://ApexActionController/ACTION$execute",
-                "callingDescriptor": "UNKNOWN",
-                "params": {
-                    "namespace": "vlocity_ins",
-                    "classname": "BusinessProcessDisplayController",
-                    "method": "GenericInvoke2NoCont",
-                    "params": {
-                        "input": json.dumps(payload, separators=(',', ':')),
-                        "options": "{}",
-                        "sClassName": "vlocity_ins.IntegrationProcedureService",
-                        "sMethodName": "Member_findDoctor",
-                    },
-                    "cacheable": False,
-                    "isContinuation": False,
-                },
-            }]
-        }
-
-        params_str = urlencode({
-            "message": json.dumps(message, separators=(',', ':')),
-            "aura.context": json.dumps(aura_context, separators=(',', ':')),
-            "aura.pageURI": '',
-            "aura.token": "null"
-        }, quote_via=quote)
+        def render(context):
+            return find_doctor_body(
+                f"{actionid};a",
+                zip_code=zip_code, specialty=specialty, service_type=service_type, plan_type=plan_type,
+                network_code=network_code, start=start, size=size, captcha_token=captcha_token,
+                distance=distance, first_name=first_name, last_name=last_name, context=context,
+            )
 
         logger.debug(f"Making request to {url} | Attempt {attempt}/{max_attempts}")
 
         # Reduced delay - original was too long for concurrent processing
-        await asyncio.sleep(random.uniform(0.5, 1.5))
+        with span("sleep.pacing"):
+            await asyncio.sleep(random.uniform(PACING_DELAY_MIN, PACING_DELAY_MAX))
 
-        try:
-            response = await client._request("POST",
-                url,
-                data=params_str,
-                headers=HEADERS
-            )
+        response = await post_aura(client, url, render, HEADERS)
+        attempts += 1
 
-            resp = json.loads(response['body'])
-            data = [
-                action for action in resp.get("actions", [])
-                if "returnValue" in action and "returnValue" in action["returnValue"]
-            ]
-
-            for d in data:
-                if d['state'] != "SUCCESS":
-                    continue
-                results = d['returnValue']['returnValue']
-                results = json.loads(results).get("IPResult", [])
-
-                if results:
-                    logger.debug(f"Successfully fetched results | Page: {page} | Specialty: {specialty}")
-                    return results
-
-        except Exception as exc:
-            logger.error(f"Error during request: {exc} | Attempt {attempt}/{max_attempts}")
-            if attempt >= max_attempts:
-                logger.critical(f"Max retries reached. Failing the request. | Zip: {zip_code}, Specialty: {specialty} | Plan Type: {plan_type}")
-                return {}
-            else:
-                logger.info(f"Retrying... (Attempt {attempt}/{max_attempts})")
-                await asyncio.sleep(random.uniform(1, 2))  # Add delay before retry
-    
+        if not response:
+            # The client has exhausted its own retries (or hit a non-retryable status).
+            failure, error = "transport", "No response after the client's retries"
+            break
+
+        with span("listing.parse", bytes=len(response['body'])):
+            classified = classify(response['body'], expects_captcha=True)
+        AURA_RESPONSES.inc(kind="listing", outcome=classified.outcome.value)
+        action = classified.action
+        failure, error = classified.outcome.value, classified.message
+        if action is Action.RETURN or classified.outcome is Outcome.CAPTCHA_REJECTED:
+            captchas.feedback(captcha_provider, accepted=action is Action.RETURN)
+
+        if action is Action.RETURN:
+            logger.debug(f"Fetched {classified.outcome.value} results | Page: {page} | Specialty: {specialty}")
+            LISTING_LATENCY.observe(time.perf_counter() - started_at)
+            LISTING_REQUESTS.inc(outcome=classified.outcome.value)
+            return classified.result
+
+        if classified.outcome is Outcome.THROTTLED:
+            # Throttling answers with HTTP 200, so the client cannot tell the breaker about it.
+            policy.record_failure()
+
+        if action is Action.FAIL_FAST:
+            logger.error(f"Non-retryable Aura response ({classified.outcome.value}): {classified.message} | Zip: {zip_code}, Specialty: {specialty} | Plan Type: {plan_type}")
+            break
+
+        logger.warning(f"Aura response {classified.outcome.value}: {classified.message} | Attempt {attempt}/{max_attempts}")
+
+    logger.critical(f"Giving up on the request. | Zip: {zip_code}, Specialty: {specialty} | Plan Type: {plan_type}")
+    get_context().dead_letters.record(*listing_letter(search_params, service_type, specialty, page),
+                                      failure=failure, attempts=attempts, error=error)
+    LISTING_LATENCY.observe(time.perf_counter() - started_at)
+    LISTING_REQUESTS.inc(outcome="failed")
     return {}
\ No newline at end of file
@@ -0,0 +1,234 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from logger.logger import get_logger
+from .metrics import STORE_WRITES, QUEUE_DEPTH
+from settings import PROVIDER_STORE_BATCH, PROVIDER_STORE_FLUSH_INTERVAL
+
+logger = get_logger("ProviderStore")
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS providers (
+        provider_id TEXT PRIMARY KEY,
+        name TEXT,
+        listing TEXT,
+        detail TEXT,
+        first_seen REAL NOT NULL,
+        last_seen REAL NOT NULL,
+        detail_fetched_at REAL
+    );
+    CREATE TABLE IF NOT EXISTS provider_listings (
+        provider_id TEXT NOT NULL,
+        zip TEXT NOT NULL,
+        plan_type TEXT NOT NULL,
+        network_code TEXT NOT NULL,
+        service_type TEXT NOT NULL,
+        specialty TEXT NOT NULL,
+        first_seen REAL NOT NULL,
+        last_seen REAL NOT NULL,
+        PRIMARY KEY (provider_id, zip, plan_type, network_code, service_type, specialty)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS provider_listings_zip_plan ON provider_listings (zip, plan_type, network_code);
+    CREATE INDEX IF NOT EXISTS provider_listings_plan_specialty ON provider_listings (plan_type, network_code, service_type, specialty);
+    CREATE INDEX IF NOT EXISTS providers_name ON providers (name);
+"""
+
+_UPSERT_LISTING = """
+    INSERT INTO providers (provider_id, name, listing, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (provider_id) DO UPDATE SET name = excluded.name, listing = excluded.listing, last_seen = excluded.last_seen
+"""
+_UPSERT_ASSOCIATION = """
+    INSERT INTO provider_listings (provider_id, zip, plan_type, network_code, service_type, specialty, first_seen, last_seen)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT DO UPDATE SET last_seen = excluded.last_seen
+"""
+_UPSERT_DETAIL = """
+    INSERT INTO providers (provider_id, detail, first_seen, last_seen, detail_fetched_at) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (provider_id) DO UPDATE SET detail = excluded.detail, detail_fetched_at = excluded.detail_fetched_at,
+        last_seen = excluded.last_seen
+"""
+
+_STOP = object()
+
+
+class ProviderStore:
+    """
+    Queryable SQLite store of the scraped providers, upserted as listings and details are fetched.
+
+    ``providers`` holds one row per ``ProviderId`` with its latest listing entry and detail
+    (as JSON). ``provider_listings`` records every zip, plan (``planType`` and ``networkCode``)
+    and specialty a provider was listed for, indexed for lookups like "which providers serve
+    zip X for plan Y".
+
+    The crawl only enqueues: a single writer thread drains the queue and applies up to
+    ``batch_size`` operations per transaction, at least every ``flush_interval`` seconds.
+    The database runs in WAL mode, so `providers_for_zip` and the other reads do not wait
+    for the writer. WAL needs local storage; keep the file off network filesystems.
+    """
+
+    def __init__(self, path: str, batch_size: int = PROVIDER_STORE_BATCH, flush_interval: float = PROVIDER_STORE_FLUSH_INTERVAL):
+        """
+        Args:
+            path (str): Path of the SQLite database file, created if missing.
+            batch_size (int): Operations per write transaction.
+            flush_interval (float): Longest time an operation waits in the queue, in seconds.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pid = os.getpid()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._write_conn = self._connect()
+        self._write_conn.executescript(_SCHEMA)
+        self._read_conn = self._connect()
+        self._read_lock = threading.Lock()
+
+        self._queue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._run, name="provider-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # Producers -------------------------------------------------------------
+
+    def add_listing(self, providers: list, zip_code: str, plan_type: str, network_code: str, service_type: str, specialty: str):
+        """Queue the providers of a listing page for upsert, with the search they were listed for."""
+        now = time.time()
+        for provider in providers:
+            provider_id = provider.get("ProviderId")
+            if provider_id:
+                self._put((_UPSERT_LISTING, (str(provider_id), provider.get("providerFullName"), json.dumps(provider), now, now)))
+                self._put((_UPSERT_ASSOCIATION, (str(provider_id), zip_code, plan_type, network_code, service_type, specialty, now, now)))
+
+    def add_detail(self, provider_id: str, ip_result):
+        """Queue the detail ``IPResult`` of a provider for upsert."""
+        now = time.time()
+        self._put((_UPSERT_DETAIL, (str(provider_id), json.dumps(ip_result), now, now, now)))
+
+    def _put(self, operation):
+        self._queue.put(operation)
+        QUEUE_DEPTH.inc(stage="provider_store")
+
+    # Writer ----------------------------------------------------------------
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, waiters = [], []
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch: list):
+        try:
+            self._write_conn.execute("BEGIN IMMEDIATE")
+            for sql, params in batch:
+                self._write_conn.execute(sql, params)
+            self._write_conn.execute("COMMIT")
+            STORE_WRITES.inc(len(batch), outcome="success")
+        except Exception as e:
+            if self._write_conn.in_transaction:
+                self._write_conn.execute("ROLLBACK")
+            STORE_WRITES.inc(len(batch), outcome="failed")
+            logger.error(f"Failed to write {len(batch)} provider store operations: {e}")
+        finally:
+            QUEUE_DEPTH.dec(len(batch), stage="provider_store")
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until everything queued so far is written. Returns False on timeout."""
+        if not self._writer.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Write what is queued, stop the writer and close the database."""
+        if self.pid != os.getpid():
+            # A forked child must not touch the parent's connections or writer.
+            return
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self._write_conn.close()
+        self._read_conn.close()
+
+    # Reads -----------------------------------------------------------------
+
+    def _query(self, sql: str, params: tuple = ()) -> list[dict]:
+        with self._read_lock:
+            cursor = self._read_conn.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def get(self, provider_id: str) -> dict | None:
+        """The stored row of a provider, with ``listing`` and ``detail`` decoded."""
+        rows = self._query("SELECT * FROM providers WHERE provider_id = ?", (str(provider_id),))
+        if not rows:
+            return None
+        row = rows[0]
+        for column in ("listing", "detail"):
+            row[column] = json.loads(row[column]) if row[column] else None
+        return row
+
+    def known(self, provider_ids: list) -> set:
+        """The ids among ``provider_ids`` already stored."""
+        ids = [str(provider_id) for provider_id in provider_ids]
+        found = set()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self._query(f"SELECT provider_id FROM providers WHERE provider_id IN ({','.join('?' * len(chunk))})", tuple(chunk))
+            found.update(row["provider_id"] for row in rows)
+        return found
+
+    def providers_for_zip(self, zip_code: str, plan_type: str | None = None, network_code: str | None = None,
+                          specialty: str | None = None) -> list[dict]:
+        """
+        Providers listed for a zip, optionally narrowed to a plan, network and specialty.
+
+        Returns:
+            list[dict]: ``provider_id``, ``name``, and the plan, network and specialty they were listed for.
+        """
+        sql = ("SELECT l.provider_id, p.name, l.plan_type, l.network_code, l.service_type, l.specialty "
+               "FROM provider_listings l JOIN providers p USING (provider_id) WHERE l.zip = ?")
+        params = [zip_code]
+        for column, value in (("plan_type", plan_type), ("network_code", network_code), ("specialty", specialty)):
+            if value is not None:
+                sql += f" AND l.{column} = ?"
+                params.append(value)
+        return self._query(sql + " ORDER BY p.name", tuple(params))
+
+    def stats(self) -> dict:
+        """Number of providers, providers with a detail and listing associations."""
+        return self._query(
+            "SELECT (SELECT COUNT(*) FROM providers) AS providers, "
+            "(SELECT COUNT(*) FROM providers WHERE detail IS NOT NULL) AS with_detail, "
+            "(SELECT COUNT(*) FROM provider_listings) AS listings"
+        )[0]
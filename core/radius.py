@@ -0,0 +1,161 @@
+import math
+import time
+
+from settings import (
+    RADIUS_LADDER,
+    RADIUS_DEFAULT_MILES,
+    RADIUS_TARGET_PAGES,
+    RADIUS_MIN_RECORDS,
+    RADIUS_FLOOR_NEIGHBOURS,
+)
+
+_EARTH_RADIUS_MILES = 3958.8
+
+
+def distance_param(miles: float) -> str:
+    """The ``distance`` value of a search, e.g. ``"25mi"``."""
+    return f"{miles:g}mi"
+
+
+# Distance of every search without ADAPTIVE_RADIUS.
+DEFAULT_DISTANCE = distance_param(RADIUS_DEFAULT_MILES)
+
+
+def haversine_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * _EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+class RadiusPlanner:
+    """
+    Picks the search distance per zip and specialty so that a search spans a few pages.
+
+    Radii come from a fixed ladder (``RADIUS_LADDER``). A search starts at the radius learned
+    on a previous run, or ``RADIUS_DEFAULT_MILES``. When the first page reports more than
+    ``RADIUS_TARGET_PAGES`` pages of records the planner moves down the ladder, estimating
+    the records of a smaller radius from the area searched; with fewer than
+    ``RADIUS_MIN_RECORDS`` it moves up. The radius a search settles on is kept in the
+    LMDB cache (``radius:`` keys) for future runs.
+
+    Coverage: a zip's radius never drops below its floor, the distance to its
+    ``RADIUS_FLOOR_NEIGHBOURS``-th nearest input zip. Every point closer to this zip than to
+    any other (its Voronoi cell) then lies, for any reasonably even zip layout, inside the
+    searched disc, so the shrunken discs of all zips together still cover the area. Zips
+    without that many neighbours within the default radius keep the default.
+    """
+
+    def __init__(self, cache, zips: list | None = None, ladder: tuple = RADIUS_LADDER,
+                 default_miles: float = RADIUS_DEFAULT_MILES, target_pages: int = RADIUS_TARGET_PAGES,
+                 min_records: int = RADIUS_MIN_RECORDS, floor_neighbours: int = RADIUS_FLOOR_NEIGHBOURS,
+                 page_size: int = 50):
+        """
+        Args:
+            cache (CacheHandler): Where learned radii are kept.
+            zips (list | None): Input zip rows with ``zip``, ``lat`` and ``lng``; read from the
+                Excel inputs on first use if omitted.
+            ladder (tuple): Allowed radii in miles, ascending.
+            default_miles (float): Radius of a search without a learned one.
+            target_pages (int): Pages a search should not exceed when a smaller radius allows.
+            min_records (int): Records below which a larger radius is tried; 0 never expands.
+            floor_neighbours (int): Neighbour rank whose distance is a zip's smallest radius.
+            page_size (int): Records per listing page.
+        """
+        self.cache = cache
+        self.ladder = tuple(sorted(ladder))
+        self.default_miles = default_miles
+        self.target_records = target_pages * page_size
+        self.min_records = min_records
+        self.floor_neighbours = floor_neighbours
+        self._zips = zips
+        self._grid = None
+        self._floors = {}
+
+    def _build_grid(self):
+        if self._zips is None:
+            from utils import read_uszips_data
+            self._zips = read_uszips_data()
+        # One-degree cells: neighbours within the default radius are at most two cells away.
+        self._grid = {}
+        self._coordinates = {}
+        for row in self._zips:
+            zip_code = str(row["zip"]).zfill(5)
+            lat, lng = float(row["lat"]), float(row["lng"])
+            self._coordinates[zip_code] = (lat, lng)
+            self._grid.setdefault((math.floor(lat), math.floor(lng)), []).append((zip_code, lat, lng))
+
+    def floor(self, zip_code: str) -> float:
+        """Smallest radius, in miles, that keeps ``zip_code`` covered (see the class docstring)."""
+        if zip_code in self._floors:
+            return self._floors[zip_code]
+        if self._grid is None:
+            self._build_grid()
+
+        floor = self.default_miles
+        if zip_code in self._coordinates:
+            lat, lng = self._coordinates[zip_code]
+            cells_lat = math.ceil(self.default_miles / 69)
+            cells_lng = math.ceil(self.default_miles / max(1.0, 69 * math.cos(math.radians(lat))))
+            cell_lat, cell_lng = math.floor(lat), math.floor(lng)
+            distances = sorted(
+                haversine_miles(lat, lng, other_lat, other_lng)
+                for d_lat in range(-cells_lat, cells_lat + 1)
+                for d_lng in range(-cells_lng, cells_lng + 1)
+                for other, other_lat, other_lng in self._grid.get((cell_lat + d_lat, cell_lng + d_lng), ())
+                if other != zip_code
+            )
+            if len(distances) >= self.floor_neighbours and distances[self.floor_neighbours - 1] < self.default_miles:
+                floor = distances[self.floor_neighbours - 1]
+
+        self._floors[zip_code] = floor
+        return floor
+
+    def _rungs(self, zip_code: str) -> list[float]:
+        floor = self.floor(zip_code)
+        return [miles for miles in self.ladder if miles >= floor] or [self.ladder[-1]]
+
+    def _key(self, zip_code: str, search: str) -> str:
+        return f"radius:{zip_code}|{search}"
+
+    def initial(self, zip_code: str, search: str) -> float:
+        """
+        Radius of the first request of a search.
+
+        Args:
+            zip_code (str): The searched zip.
+            search (str): The specialty searched, e.g. ``"Doctor:Cardiology"``.
+        """
+        learned = self.learned(zip_code, search)
+        miles = learned["miles"] if learned else self.default_miles
+        rungs = self._rungs(zip_code)
+        # Snap to the ladder, at or above the floor.
+        return min((rung for rung in rungs if rung >= miles), default=rungs[-1])
+
+    def adjust(self, zip_code: str, search: str, miles: float, total: int, tried: tuple = ()) -> float:
+        """
+        Radius to search next, given the ``total`` records found at ``miles``.
+
+        Returns ``miles`` itself once the search is settled, and then stores it as learned.
+        Radii in ``tried`` are not proposed again, which keeps the search from oscillating.
+        """
+        rungs = [rung for rung in self._rungs(zip_code) if rung == miles or rung not in tried]
+        proposal = miles
+        if total > self.target_records:
+            smaller = [rung for rung in rungs if rung < miles]
+            if smaller:
+                # Records grow roughly with the area searched.
+                fitting = [rung for rung in smaller if total * (rung / miles) ** 2 <= self.target_records]
+                proposal = max(fitting) if fitting else min(smaller)
+        elif total < self.min_records:
+            larger = [rung for rung in rungs if rung > miles]
+            if larger:
+                fitting = [rung for rung in larger if total * (rung / miles) ** 2 >= self.min_records]
+                proposal = min(fitting) if fitting else max(larger)
+
+        if proposal == miles:
+            self.cache.set_json(self._key(zip_code, search), {"miles": miles, "total": total, "at": int(time.time())})
+        return proposal
+
+    def learned(self, zip_code: str, search: str) -> dict | None:
+        """The stored radius of a search (``miles``, ``total``, ``at``), or None."""
+        return self.cache.get_json(self._key(zip_code, search))
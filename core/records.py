@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+
+from .outputs import network_slug
+
+
+def plan_type_of(plan: dict) -> str:
+    """The ``planType`` searched for a plan of plans.json."""
+    return "GHI" if plan['LobMctrType'] == 1003 else "HIP"
+
+
+@dataclass(slots=True, frozen=True)
+class ProviderSummary:
+    """
+    The fields of a listing entry the crawl needs after the page is saved.
+
+    A listing entry carries dozens of fields (addresses, languages, hospital
+    affiliations, ...); they are in the saved page, so the detail stage only keeps
+    the id and the name.
+    """
+
+    provider_id: str
+    name: str = ""
+
+    @classmethod
+    def of(cls, provider: "dict | ProviderSummary") -> "ProviderSummary":
+        """A summary of a listing entry, or of the ``provider`` of a dead letter."""
+        if isinstance(provider, cls):
+            return provider
+        return cls(provider["ProviderId"], provider.get("providerFullName") or "")
+
+    def as_dict(self) -> dict:
+        """The summary in the shape of a listing entry, as stored in dead letters."""
+        return {"ProviderId": self.provider_id, "providerFullName": self.name}
+
+
+@dataclass(slots=True, frozen=True)
+class ListingPage:
+    """``totalRecords`` and the providers of a listing page, without the rest of its ``IPResult``."""
+
+    total_records: int
+    providers: tuple[ProviderSummary, ...] = ()
+
+    @classmethod
+    def from_result(cls, ip_result: dict) -> "ListingPage":
+        return cls(
+            int(ip_result.get("totalRecords") or 0),
+            tuple(ProviderSummary.of(entry) for entry in ip_result.get("providerList") or [] if entry.get("ProviderId")),
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class WorkUnit:
+    """
+    One unit of crawl work: a zip, optionally narrowed to a plan and one specialty.
+
+    The job queue stores units as ``(key, payload)``; `payload` and `from_payload`
+    convert to and from that JSON form.
+    """
+
+    zip: str
+    plan: dict | None = None
+    specialty: dict | None = None
+
+    @property
+    def key(self) -> str:
+        """Key of the unit in the job queue; plans sending the same search share it."""
+        if self.plan is None:
+            return self.zip
+        key = f"{self.zip}|{plan_type_of(self.plan)}|{network_slug(self.plan['NetworkCode'])}|{self.plan['CoverageType']}"
+        if self.specialty is not None:
+            key += f"|{self.specialty['type']}:{self.specialty['code']}"
+        return key
+
+    def payload(self) -> dict:
+        payload = {"zip": self.zip}
+        if self.plan is not None:
+            payload["plan"] = self.plan
+        if self.specialty is not None:
+            payload["specialty"] = self.specialty
+        return payload
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "WorkUnit":
+        return cls(str(payload["zip"]).zfill(5), payload.get("plan"), payload.get("specialty"))
@@ -0,0 +1,195 @@
+import asyncio
+import random
+import time
+
+from logger.logger import get_logger
+from .tracing import span
+from settings import (
+    RETRY_MAX_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    RETRY_BUDGET_RATIO,
+    RETRY_BUDGET_MIN_PER_SEC,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+)
+
+logger = get_logger("RetryPolicy")
+
+# HTTP status codes worth retrying. Everything else in the 4xx range is a
+# caller error and retrying it only burns captcha credits and bandwidth.
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries to a fraction of the overall traffic.
+
+    Every first attempt deposits ``ratio`` tokens, every retry withdraws one.
+    A small time based reserve (``min_per_sec`` for ``ttl`` seconds) keeps
+    retries possible at low traffic. When the upstream is failing everything,
+    retries dry up after roughly ``ratio`` times the request volume instead of
+    multiplying it.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_sec: float = 1.0, ttl: float = 10.0, burst: int = 500):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self._reserve = max(min_per_sec * ttl, 1.0)
+        self._cap = self._reserve + ratio * burst
+        self._tokens = self._reserve
+        self._last_refill = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self._tokens < self._reserve:
+            self._tokens = min(self._reserve, self._tokens + elapsed * self.min_per_sec)
+
+    def deposit(self):
+        """Record a first attempt."""
+        self._refill()
+        self._tokens = min(self._cap, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """Take one retry token. Returns False when the budget is exhausted."""
+        self._refill()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+    @property
+    def balance(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class CircuitBreaker:
+    """
+    Classic closed/open/half-open breaker shared by every request to one upstream.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    callers wait ``reset_timeout`` seconds before a single probe request is let
+    through. A successful probe closes it again; a failed one re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 20, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+    async def wait_until_allowed(self):
+        """Block the caller while the breaker is open."""
+        while True:
+            if self.state == self.CLOSED:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                # A probe that never reported back (cancelled task) must not wedge the breaker.
+                probe_stale = time.monotonic() - self._probe_started > self.reset_timeout
+                if not self._probe_in_flight or probe_stale:
+                    self._probe_in_flight = True
+                    self._probe_started = time.monotonic()
+                    return
+            await asyncio.sleep(max(remaining, 1.0))
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("Circuit breaker closed: upstream recovered")
+        self.state = self.CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit breaker opened after {self._failures} consecutive failures; pausing traffic for {self.reset_timeout}s")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class RetryPolicy:
+    """
+    Single source of truth for retry decisions against the Aura endpoint.
+
+    Classifies HTTP status codes, computes capped full-jitter exponential
+    backoff, enforces a global retry budget and owns the circuit breaker.
+    Aura level outcomes are classified by `core.aura_response.classify`.
+    One instance should be shared by every client that
+    talks to the same upstream so the budget and breaker see all traffic.
+
+    Attributes:
+        max_attempts (int): Total attempts per call, first attempt included.
+        base_delay (float): Backoff base in seconds.
+        max_delay (float): Upper bound of a single backoff sleep in seconds.
+        budget (RetryBudget): Global retry budget.
+        breaker (CircuitBreaker): Circuit breaker for the upstream.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        budget: RetryBudget | None = None,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_PER_SEC)
+        self.breaker = breaker or CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        return status_code in RETRYABLE_STATUS_CODES
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter backoff: uniform(0, min(max_delay, base * 2 ** attempt))."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def before_attempt(self, attempt: int) -> bool:
+        """
+        Gate an attempt on the breaker and, for retries, on the budget.
+
+        Returns False when a retry should not be made because the budget is
+        exhausted; the caller should give up instead.
+        """
+        if attempt == 1:
+            self.budget.deposit()
+        elif not self.allow_retry():
+            return False
+        if self.breaker.state != CircuitBreaker.CLOSED:
+            with span("sleep.circuit_breaker"):
+                await self.breaker.wait_until_allowed()
+        return True
+
+    def allow_retry(self) -> bool:
+        """Withdraw a retry from the global budget. Returns False when it is exhausted."""
+        if self.budget.try_withdraw():
+            return True
+        logger.warning("Retry budget exhausted; giving up instead of retrying")
+        return False
+
+    async def sleep_before_retry(self, attempt: int):
+        with span("sleep.backoff", attempt=attempt):
+            await asyncio.sleep(self.backoff(attempt))
+
+    def record_success(self):
+        self.breaker.record_success()
+
+    def record_failure(self):
+        self.breaker.record_failure()
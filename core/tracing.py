@@ -0,0 +1,121 @@
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from logger.logger import get_logger
+
+logger = get_logger("Tracing")
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """A timed unit of work. Children inherit ``trace_id`` so a whole zip renders on one lane."""
+
+    __slots__ = ("name", "attrs", "span_id", "parent_id", "trace_id", "start_us", "end_us")
+
+    def __init__(self, name: str, attrs: dict, parent: "Span | None"):
+        self.name = name
+        self.attrs = attrs
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.start_us = time.time_ns() // 1000
+        self.end_us = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_chrome_event(self, pid: int) -> dict:
+        return {
+            "name": self.name,
+            "cat": self.name.split(".", 1)[0],
+            "ph": "X",
+            "ts": self.start_us,
+            "dur": (self.end_us or self.start_us) - self.start_us,
+            "pid": pid,
+            "tid": self.trace_id,
+            "args": {**self.attrs, "span_id": self.span_id, "parent_id": self.parent_id},
+        }
+
+
+class Tracer:
+    """
+    Lightweight tracer exporting spans in the Chrome trace-event format.
+
+    Spans are carried through ``contextvars`` so they follow asyncio tasks:
+    a task created inside a span sees that span as its parent. Finished spans
+    are streamed to the output file as they complete, which keeps memory flat
+    on long runs; the file opens directly in chrome://tracing or Perfetto.
+    """
+
+    def __init__(self):
+        self.path = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    def start(self, path: str):
+        """Open ``path`` and begin recording spans."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._pid = os.getpid()
+        self._file = open(path, "w", buffering=1024 * 1024)
+        self._file.write("[\n")
+        self._write({"name": "process_name", "ph": "M", "pid": self._pid, "args": {"name": f"emblem-scraper {self._pid}"}})
+        logger.info(f"Tracing enabled, writing spans to {path}")
+
+    def close(self):
+        """Terminate the trace file. Safe to call when tracing is disabled."""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps({"name": "trace_end", "ph": "i", "s": "g", "pid": self._pid, "tid": 0, "ts": time.time_ns() // 1000}))
+            self._file.write("\n]\n")
+            self._file.close()
+            self._file = None
+        logger.info(f"Trace written to {self.path}")
+
+    def _write(self, event: dict):
+        with self._lock:
+            if self._file is not None:
+                self._file.write(json.dumps(event, default=str) + ",\n")
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """
+        Record ``name`` around the ``with`` block. Yields the `Span`, or None when
+        tracing is disabled so instrumentation costs next to nothing by default.
+        """
+        if self._file is None:
+            yield None
+            return
+
+        span = Span(name, attrs, _current_span.get())
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_us = time.time_ns() // 1000
+            self._write(span.to_chrome_event(self._pid))
+
+
+tracer = Tracer()
+span = tracer.span
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
@@ -0,0 +1,161 @@
+# HTTP backends of BaseClient. Each library is imported on first request, like httpx was before.
+import asyncio
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+from settings import HTTP_BACKEND, HTTP_KEEPALIVE, HTTP_POOL_SIZE
+
+
+class TransportError(Exception):
+    """A request failed without a response: connection, TLS, proxy or timeout error."""
+
+
+@dataclass(slots=True)
+class TransportResponse:
+    status_code: int
+    headers: dict
+    cookies: dict
+    text: str
+    size: int  # body bytes as received
+
+    @property
+    def is_success(self) -> bool:
+        return 200 <= self.status_code < 300
+
+
+class Transport(ABC):
+    """
+    Sends the HTTP requests of a `BaseClient`.
+
+    With ``keepalive`` off, every request opens a connection of its own, as the crawler always
+    did: behind a rotating proxy each request then leaves from a fresh exit IP. With it on,
+    connections are pooled, up to ``pool_size``, and reused across requests.
+
+    Pools belong to the event loop they were opened on; a transport used from another loop
+    (e.g. a second ``asyncio.run``) opens a new pool there.
+    """
+
+    name = ""
+
+    def __init__(self, proxy: str | None = None, timeout: float = 60, keepalive: bool = HTTP_KEEPALIVE, pool_size: int = HTTP_POOL_SIZE):
+        self.proxy = proxy
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.pool_size = pool_size
+        self._pool = None
+        self._loop = None
+
+    @abstractmethod
+    async def request(self, method: str, url: str, **kwargs) -> TransportResponse:
+        """
+        Send one request. ``kwargs`` are those of `BaseClient._request`: ``headers``, ``params``,
+        ``content``, ``data`` and ``json``.
+
+        Raises:
+            TransportError: No response was received.
+        """
+
+    @abstractmethod
+    def _open_pool(self):
+        """A new connection pool (client or session) of the library."""
+
+    def _current_pool(self):
+        loop = asyncio.get_running_loop()
+        if self._pool is None or self._loop is not loop:
+            # A pool of a finished loop cannot be closed from this one; it is dropped.
+            self._pool, self._loop = self._open_pool(), loop
+        return self._pool
+
+    async def aclose(self):
+        """Close the pooled connections, from the loop they were opened on."""
+        pool, self._pool = self._pool, None
+        if pool is not None and self._loop is asyncio.get_running_loop():
+            await self._close_pool(pool)
+
+    async def _close_pool(self, pool):
+        await pool.aclose()
+
+
+class HttpxTransport(Transport):
+    """httpx, over HTTP/2 when the server negotiates it (``http2``) or HTTP/1.1 only."""
+
+    def __init__(self, http2: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.http2 = http2
+        self.name = "httpx-h2" if http2 else "httpx-h1"
+
+    def _open_pool(self):
+        import httpx
+
+        limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size if self.keepalive else 0)
+        return httpx.AsyncClient(proxy=self.proxy, timeout=self.timeout, verify=False, http2=self.http2, limits=limits)
+
+    async def request(self, method: str, url: str, **kwargs) -> TransportResponse:
+        import httpx
+
+        try:
+            if self.keepalive:
+                response = await self._current_pool().request(method, url, **kwargs)
+            else:
+                async with self._open_pool() as client:
+                    response = await client.request(method, url, **kwargs)
+        except httpx.RequestError as e:
+            raise TransportError(f"{type(e).__name__}: {e}") from e
+        return TransportResponse(response.status_code, dict(response.headers), dict(response.cookies), response.text, len(response.content))
+
+
+def _aiohttp():
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError("HTTP_BACKEND=aiohttp needs aiohttp: pip install aiohttp") from e
+    return aiohttp
+
+
+class AiohttpTransport(Transport):
+    """aiohttp over HTTP/1.1. Without keepalive its connector closes each connection after use."""
+
+    name = "aiohttp"
+
+    def _open_pool(self):
+        aiohttp = _aiohttp()
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size, ssl=False, force_close=not self.keepalive),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            # Like a fresh httpx client per request: response cookies are returned, never sent back.
+            cookie_jar=aiohttp.DummyCookieJar(),
+        )
+
+    async def _close_pool(self, pool):
+        await pool.close()
+
+    async def request(self, method: str, url: str, **kwargs) -> TransportResponse:
+        aiohttp = _aiohttp()
+        body = kwargs.get("content", kwargs.get("data"))
+        try:
+            async with self._current_pool().request(method, url, data=body, params=kwargs.get("params"), json=kwargs.get("json"),
+                                                    headers=kwargs.get("headers"), proxy=self.proxy) as response:
+                content = await response.read()
+                return TransportResponse(
+                    response.status,
+                    dict(response.headers),
+                    {name: morsel.value for name, morsel in response.cookies.items()},
+                    content.decode(response.charset or "utf-8", errors="replace"),
+                    len(content),
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise TransportError(f"{type(e).__name__}: {e}") from e
+
+
+BACKENDS = {
+    "httpx-h2": lambda **kwargs: HttpxTransport(http2=True, **kwargs),
+    "httpx-h1": lambda **kwargs: HttpxTransport(http2=False, **kwargs),
+    "aiohttp": AiohttpTransport,
+}
+
+
+def make_transport(backend: str = HTTP_BACKEND, **kwargs) -> Transport:
+    """The `Transport` of ``backend`` (httpx-h2, httpx-h1 or aiohttp), built with ``kwargs``."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown HTTP_BACKEND {backend!r}; choose one of {', '.join(BACKENDS)}")
+    return BACKENDS[backend](**kwargs)
@@ -0,0 +1,163 @@
+import hashlib
+import time
+import uuid
+
+from .metrics import YIELD_SEARCHES
+from settings import YIELD_RUN_ID, YIELD_SKIP_EMPTY, YIELD_REPROBE_RATE, YIELD_MIN_SEARCHES
+
+# Cache key of the run in progress: {"id", "started", "finished"}.
+RUN_KEY = "yield_run"
+
+# Crawls take the id of the run in progress from the cache (`begin_run`), so a crawl restarted
+# after a crash or interruption continues its run. launcher.py passes that id to the shards it
+# spawns, and nodes of a job queue take the id stored with the queue (see `set_run_id`).
+_run = YIELD_RUN_ID or uuid.uuid4().hex
+# Whether this process started the run in progress, and so marks it finished.
+_owned = False
+
+
+def run_id() -> str:
+    """Id of the current run; the statistics of a run are compared with the previous one."""
+    return _run
+
+
+def set_run_id(run: str):
+    """Make ``run`` the id of the current run, for the `YieldStats` created from now on."""
+    global _run
+    _run = run
+
+
+def begin_run(cache, resume_finished: bool = False) -> str:
+    """
+    Make the run in progress in ``cache`` the current run, or start a new one if the last
+    run finished. Does nothing when YIELD_RUN_ID is set: the run then belongs to whoever set it.
+
+    Args:
+        cache (CacheHandler): Where the run in progress is recorded.
+        resume_finished (bool): Continue the last run even if it finished, as the re-drive
+            of its dead letters does.
+
+    Returns:
+        str: The id of the current run.
+    """
+    global _owned
+    if YIELD_RUN_ID:
+        return _run
+
+    def update(stored):
+        if stored is not None and (resume_finished or not stored.get("finished")):
+            return stored
+        now = int(time.time())
+        # A re-drive without a run to continue is a run of its own, finished when it ends.
+        return {"id": uuid.uuid4().hex, "started": now, "finished": now if resume_finished else None}
+
+    stored = cache.update_json(RUN_KEY, update)
+    set_run_id(stored["id"])
+    _owned = not resume_finished
+    return _run
+
+
+def finish_run(cache):
+    """Mark the current run finished, so the next `begin_run` starts a new one and its counts become the previous run's."""
+    if not _owned:
+        return
+
+    def update(stored):
+        if stored is not None and stored["id"] == _run:
+            stored["finished"] = int(time.time())
+        return stored
+
+    cache.update_json(RUN_KEY, update)
+
+
+def region(zip_code: str) -> str:
+    """Region of a zip: its three-digit prefix (sectional center), shared by neighbouring zips."""
+    return str(zip_code).zfill(5)[:3]
+
+
+def yield_key(plan_type: str, network_code: str, search: str, zip_code: str) -> str:
+    return f"yield:{plan_type}|{network_code}|{search}|{region(zip_code)}"
+
+
+def _counts() -> dict:
+    return {"searches": 0, "empty": 0, "records": 0}
+
+
+class YieldStats:
+    """
+    Result counts of the searches per plan, specialty and region, kept in the LMDB cache.
+
+    Each ``yield:`` key holds the counts of the current run and of the run before it
+    (``searches``, ``empty`` searches and ``records``). A combination whose searches all
+    came back empty in the whole region during the last run it was searched is predicted
+    empty, and with YIELD_SKIP_EMPTY not searched again, except for a
+    ``YIELD_REPROBE_RATE`` sample that notices when providers appear. The sample is
+    chosen by hashing the zip, the combination and the run id, so it is stable within a
+    run and changes between runs.
+    """
+
+    def __init__(self, cache, skip_empty: bool = YIELD_SKIP_EMPTY, reprobe_rate: float = YIELD_REPROBE_RATE,
+                 min_searches: int = YIELD_MIN_SEARCHES, run: str | None = None):
+        """
+        Args:
+            cache (CacheHandler): Where the counts are kept.
+            skip_empty (bool): Skip searches predicted empty.
+            reprobe_rate (float): Share of predicted empty searches that are searched anyway.
+            min_searches (int): Empty searches a region needs in the last run before it is predicted empty.
+            run (str | None): Id of the current run, `run_id()` by default.
+        """
+        self.cache = cache
+        self.skip_empty = skip_empty
+        self.reprobe_rate = reprobe_rate
+        self.min_searches = min_searches
+        self.run = run or run_id()
+
+    def last_run(self, key: str) -> dict | None:
+        """Counts of ``key`` in the most recent earlier run that searched it, or None."""
+        stored = self.cache.get_json(key)
+        if stored is None:
+            return None
+        return stored["current"] if stored["run"] != self.run else stored.get("previous")
+
+    def predicted_empty(self, plan_type: str, network_code: str, search: str, zip_code: str) -> bool:
+        last = self.last_run(yield_key(plan_type, network_code, search, zip_code))
+        return bool(last) and last["searches"] >= self.min_searches and last["records"] == 0
+
+    def _reprobe(self, plan_type: str, network_code: str, search: str, zip_code: str) -> bool:
+        digest = hashlib.blake2b(f"{self.run}|{plan_type}|{network_code}|{search}|{zip_code}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") / 2 ** 64 < self.reprobe_rate
+
+    def should_skip(self, plan_type: str, network_code: str, search: str, zip_code: str) -> bool:
+        """
+        Whether to skip a search as predicted empty.
+
+        Args:
+            plan_type (str): ``planType`` of the search.
+            network_code (str): ``networkCode`` of the search.
+            search (str): The specialty searched, e.g. ``"Doctor:Cardiology"``.
+            zip_code (str): The searched zip.
+        """
+        if not self.skip_empty or not self.predicted_empty(plan_type, network_code, search, zip_code):
+            YIELD_SEARCHES.inc(result="searched")
+            return False
+        if self._reprobe(plan_type, network_code, search, zip_code):
+            YIELD_SEARCHES.inc(result="reprobed")
+            return False
+        YIELD_SEARCHES.inc(result="skipped")
+        return True
+
+    def record(self, plan_type: str, network_code: str, search: str, zip_code: str, total: int) -> dict | None:
+        """Add the ``totalRecords`` of a search to the counts of the current run."""
+        def update(stored):
+            if stored is None:
+                stored = {"run": self.run, "current": _counts(), "previous": None}
+            elif stored["run"] != self.run:
+                stored = {"run": self.run, "current": _counts(), "previous": stored["current"]}
+            current = stored["current"]
+            current["searches"] += 1
+            current["empty"] += total == 0
+            current["records"] += total
+            stored["at"] = int(time.time())
+            return stored
+
+        return self.cache.update_json(yield_key(plan_type, network_code, search, zip_code), update)
@@ -0,0 +1,13 @@
+import argparse
+
+from core.parquet_export import export_parquet
+from settings import EXPORT_PATH
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the providers of the saved raw outputs as a partitioned Parquet dataset.")
+    parser.add_argument("--output", default=EXPORT_PATH, help=f"Dataset directory, replaced as a whole (default: {EXPORT_PATH})")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per record batch and row group")
+    parser.add_argument("--no-detail", action="store_true", help="Do not join the saved provider details")
+    args = parser.parse_args()
+
+    export_parquet(args.output, args.batch_size, not args.no_detail)
@@ -0,0 +1,171 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import time
+import zlib
+from contextlib import contextmanager
+
+from logger.logger import get_logger
+from settings import METRICS_PORT, METRICS_SNAPSHOT_PATH, TRACE_PATH
+from utils import init_tmp_path, read_uszips_data
+
+logger = get_logger("Launcher")
+
+
+def shard_inputs(inputs: list, shards: int) -> list[list]:
+    """
+    Partition zip rows into ``shards`` lists by a stable hash of the zip code,
+    so a zip always lands on the same shard across runs.
+    """
+    buckets = [[] for _ in range(shards)]
+    for item in inputs:
+        zipcode = str(item['zip']).zfill(5)
+        buckets[zlib.crc32(zipcode.encode()) % shards].append(item)
+    return buckets
+
+
+def _shard_path(path: str, shard: int) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{shard}{ext}"
+
+
+@contextmanager
+def _environ(overrides: dict):
+    previous = {key: os.environ.get(key) for key in overrides}
+    os.environ.update(overrides)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def _worker(shard: int, inputs: list, events):
+    """
+    Entry point of a crawler process. Runs its own event loop, HTTP clients and
+    LMDB environment (LMDB handles multi-process access as long as each process
+    opens its own environment, hence the spawn start method).
+    """
+    import main
+    from core.metrics import registry
+
+    done = 0
+    last_report = 0.0
+
+    def on_item_done(_item):
+        nonlocal done, last_report
+        done += 1
+        now = time.monotonic()
+        if now - last_report >= 1.0 or done == len(inputs):
+            last_report = now
+            events.put(("progress", shard, done, len(inputs)))
+
+    try:
+        main.run(inputs, on_item_done)
+    finally:
+        events.put(("done", shard, registry.snapshot()))
+
+
+def launch(inputs: list, workers: int, report_interval: float = 30.0) -> dict:
+    """
+    Crawl ``inputs`` with ``workers`` processes and aggregate their progress and metrics.
+
+    Each worker gets its own metrics snapshot file (and trace file when tracing is
+    enabled) suffixed with ``.shard<N>``; when METRICS_PORT is set, worker N serves
+    its endpoint on METRICS_PORT + 1 + N. The merged snapshot of all workers is
+    written to METRICS_SNAPSHOT_PATH at the end. All workers share the yield statistics
+    run of the launcher, which is continued when the launch is started again and marked
+    finished once every worker finished.
+
+    Returns:
+        dict: The merged metrics snapshot.
+    """
+    from core.context import get_context
+    from core.metrics import merge_snapshots
+    from core.yield_stats import begin_run, finish_run
+
+    run = begin_run(get_context().cache)
+    # Workers open their own LMDB environment.
+    get_context().close()
+
+    ctx = mp.get_context("spawn")
+    events = ctx.Queue()
+    shards = shard_inputs(inputs, workers)
+    processes = {}
+    totals = {}
+
+    for shard, shard_items in enumerate(shards):
+        if not shard_items:
+            continue
+        overrides = {
+            "METRICS_SNAPSHOT_PATH": _shard_path(METRICS_SNAPSHOT_PATH, shard),
+            "METRICS_PORT": str(METRICS_PORT + 1 + shard) if METRICS_PORT else "0",
+            # Spawned shards would each pick their own run id; the yield statistics of one run need one.
+            "YIELD_RUN_ID": run,
+        }
+        if TRACE_PATH:
+            overrides["TRACE_PATH"] = _shard_path(TRACE_PATH, shard)
+        # Spawned children start from a copy of the current environment, which is
+        # read by settings.py at import.
+        with _environ(overrides):
+            process = ctx.Process(target=_worker, args=(shard, shard_items, events), name=f"crawler-{shard}")
+            process.start()
+        processes[shard] = process
+        totals[shard] = len(shard_items)
+        logger.info(f"Started worker {shard} (pid {process.pid}) with {len(shard_items)} zips")
+
+    progress = {shard: 0 for shard in processes}
+    snapshots = {}
+    finished = set()
+    last_report = time.monotonic()
+
+    while len(finished) < len(processes):
+        try:
+            event = events.get(timeout=5)
+        except queue.Empty:
+            for shard, process in processes.items():
+                if shard not in finished and not process.is_alive():
+                    logger.error(f"Worker {shard} exited with code {process.exitcode} without reporting")
+                    finished.add(shard)
+            continue
+
+        if event[0] == "progress":
+            _, shard, done, _total = event
+            progress[shard] = done
+        elif event[0] == "done":
+            _, shard, snapshot = event
+            snapshots[shard] = snapshot
+            finished.add(shard)
+            logger.info(f"Worker {shard} finished ({progress[shard]}/{totals[shard]} zips)")
+
+        if time.monotonic() - last_report >= report_interval:
+            last_report = time.monotonic()
+            logger.info(f"Progress: {sum(progress.values())}/{sum(totals.values())} zips across {len(processes) - len(finished)} running workers")
+
+    for process in processes.values():
+        process.join()
+    if all(process.exitcode == 0 for process in processes.values()):
+        finish_run(get_context().cache)
+        get_context().close()
+
+    merged = merge_snapshots(list(snapshots.values()))
+    os.makedirs(os.path.dirname(METRICS_SNAPSHOT_PATH) or ".", exist_ok=True)
+    with open(METRICS_SNAPSHOT_PATH, "w") as f:
+        json.dump(merged, f, indent=2)
+    logger.info(f"All workers done: {sum(progress.values())}/{sum(totals.values())} zips. Merged metrics in {METRICS_SNAPSHOT_PATH}")
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the crawler sharded across several processes.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of crawler processes (default: CPU count)")
+    parser.add_argument("--report-interval", type=float, default=30.0, help="Seconds between aggregated progress log lines")
+    args = parser.parse_args()
+
+    init_tmp_path()
+    launch(read_uszips_data(), args.workers, args.report_interval)
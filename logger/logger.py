@@ -1,42 +1,249 @@
+import atexit
+import contextvars
+import json
 import logging
+import queue
+import random
 import sys
-from logging.handlers import RotatingFileHandler
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
 import datetime
 
+from settings import LOG_LEVEL, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE, LOG_RATE_LIMIT
+
 LOG_DIR = "logs"
-LOG_FILE = os.path.join(LOG_DIR, f"scraper_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-os.makedirs(LOG_DIR, exist_ok=True)
+_STARTED_AT = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+
+# Structured fields (zip, plan, specialty, provider) of the work in progress. Being a
+# context variable, they follow the asyncio task that set them.
+_log_fields: contextvars.ContextVar[dict] = contextvars.ContextVar("log_fields", default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """
+    Attach fields to every record logged inside the block, by this task and the tasks it creates.
+
+    Example:
+        >>> with log_context(zip="10001", plan="HIP"):
+        ...     logger.info("Searching")  # JSON record carries "zip" and "plan"
+    """
+    token = _log_fields.set({**_log_fields.get(), **{key: value for key, value in fields.items() if value is not None}})
+    try:
+        yield
+    finally:
+        _log_fields.reset(token)
+
+
+def redact(secret: str | None, keep: int = 8) -> str:
+    """Shorten a secret such as a captcha token for logging."""
+    if not secret:
+        return repr(secret)
+    return f"{secret[:keep]}...({len(secret)} chars)" if len(secret) > keep else secret
+
+
+def log_file_path() -> str:
+    """
+    Log file of the current process. The pid keeps processes of a sharded run
+    (launcher.py) or forked workers from rotating the same file.
+    """
+    return os.path.join(LOG_DIR, f"scraper_{_STARTED_AT}_{os.getpid()}.log")
+
+
+class LazyRotatingFileHandler(RotatingFileHandler):
+    """Rotating file handler that creates its directory and file on the first record."""
+
+    def __init__(self, filename: str, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class ContextFilter(logging.Filter):
+    """Copy the `log_context` fields onto the record, in the thread and task that logged it."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.fields = _log_fields.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a ``rate`` fraction of DEBUG records."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let at most ``per_second`` DEBUG records per call site through each second.
+
+    INFO and above always pass. The number of records dropped at a call site is
+    attached to the next record it logs (``suppressed``).
+    """
+
+    def __init__(self, per_second: int = 0):
+        super().__init__()
+        self.per_second = per_second
+        # (pathname, lineno) -> [second, records let through, records dropped]
+        self._windows: dict[tuple[str, int], list[int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.per_second <= 0 or record.levelno > logging.DEBUG:
+            return True
+        second = int(record.created)
+        window = self._windows.get((record.pathname, record.lineno))
+        if window is None:
+            window = self._windows[(record.pathname, record.lineno)] = [second, 0, 0]
+        elif window[0] != second:
+            window[0], window[1] = second, 0
+        if window[1] >= self.per_second:
+            window[2] += 1
+            return False
+        window[1] += 1
+        if window[2]:
+            record.suppressed, window[2] = window[2], 0
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """The classic ``time | level | message`` line, noting records dropped by rate limiting."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{line} ({suppressed} similar suppressed)" if suppressed else line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the `log_context` fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class InProcessQueueHandler(QueueHandler):
+    """
+    Queue handler for a listener in the same process.
+
+    Only the message is rendered on the logging side; the record is otherwise queued
+    as-is, and formatting and I/O happen on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+# Handlers shared by every logger of the process, created by the first get_logger call.
+_queue_handler: InProcessQueueHandler | None = None
+_listener: QueueListener | None = None
+_file_handlers: tuple[LazyRotatingFileHandler, LazyRotatingFileHandler] | None = None
+
+
+def _output_handlers() -> tuple[logging.Handler, ...]:
+    global _file_handlers
+    # Console handler
+    ch = logging.StreamHandler(sys.stdout)
+    ch.setFormatter(TextFormatter(TEXT_FORMAT))
+
+    # Rotating file handler (5MB max, 3 backups), JSON lines unless LOG_FORMAT=text
+    fh = LazyRotatingFileHandler(log_file_path(), maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
+    fh.setLevel(logging.DEBUG)
+    fh.setFormatter(TextFormatter(TEXT_FORMAT) if LOG_FORMAT == "text" else JsonFormatter())
+
+    # Failed URLs handler - only logs CRITICAL level (5MB max, 3 backups)
+    failed_fh = LazyRotatingFileHandler(os.path.join(LOG_DIR, "failed_urls.log"), maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
+    failed_fh.setLevel(logging.CRITICAL)
+    failed_fh.setFormatter(logging.Formatter("%(asctime)s | %(message)s"))
+
+    _file_handlers = (fh, failed_fh)
+    return ch, fh, failed_fh
+
+
+def _shared_queue_handler() -> InProcessQueueHandler:
+    """
+    The handler every logger writes to. It only enqueues records; a `QueueListener`
+    thread formats them and writes the console and files, off the event loop.
+    """
+    global _queue_handler, _listener
+    if _queue_handler is None:
+        _queue_handler = InProcessQueueHandler(queue.SimpleQueue())
+        _queue_handler.addFilter(SamplingFilter(LOG_DEBUG_SAMPLE_RATE))
+        _queue_handler.addFilter(RateLimitFilter(LOG_RATE_LIMIT))
+        _queue_handler.addFilter(ContextFilter())
+
+        _listener = QueueListener(_queue_handler.queue, *_output_handlers(), respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+    return _queue_handler
+
+
+def stop_logging():
+    """Write out the queued records and stop the listener thread. Runs at exit."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    for handler in _file_handlers or ():
+        handler.close()
+
+
+def _after_fork_in_child():
+    """
+    The listener thread does not survive fork(): give the child a new queue and listener,
+    writing to its own log file instead of the parent's open one.
+    """
+    global _listener
+    if _queue_handler is None:
+        return
+    fh, failed_fh = _file_handlers
+    for handler in (fh, failed_fh):
+        handler.close()
+    fh.baseFilename = os.path.abspath(log_file_path())
+
+    handlers = _listener.handlers if _listener is not None else ()
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
 
-def get_logger(name: str = "scraper", level=logging.DEBUG) -> logging.Logger:
+def get_logger(name: str = "scraper", level: int | str = LOG_LEVEL) -> logging.Logger:
     """
-    Returns a configured logger with both console and rotating file handlers.
+    Returns a configured logger writing to the console and the rotating log files
+    through a background thread. Log files are only created once something is logged.
     """
     logger = logging.getLogger(name)
     logger.setLevel(level)
 
-    if not logger.hasHandlers():
-        # Console handler
-        ch = logging.StreamHandler(sys.stdout)
-        ch.setLevel(level)
-        ch_formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
-        ch.setFormatter(ch_formatter)
-
-        # Rotating file handler (5MB max, 3 backups)
-        fh = RotatingFileHandler(LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
-        fh.setLevel(level)
-        fh_formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
-        fh.setFormatter(fh_formatter)
-
-        # Failed URLs handler - only logs CRITICAL level (5MB max, 3 backups)
-        failed_fh = RotatingFileHandler(os.path.join(LOG_DIR, "failed_urls.log"), maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
-        failed_fh.setLevel(logging.CRITICAL)
-        failed_fh_formatter = logging.Formatter("%(asctime)s | %(message)s")
-        failed_fh.setFormatter(failed_fh_formatter)
-
-
-        logger.addHandler(ch)
-        logger.addHandler(fh)
-        logger.addHandler(failed_fh)
+    if not logger.handlers:
+        logger.addHandler(_shared_queue_handler())
+        # The queue handler already reaches every output; the root logger would print twice.
+        logger.propagate = False
 
     return logger
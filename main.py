@@ -1,13 +1,24 @@
+import argparse
 import asyncio
 import json
-import gc
-import logging
-from utils import init_tmp_path, read_uszips_data
-from core.process_listing import search_doctors
-from settings import SEMAPHORE, BATCH_SIZE
+from contextlib import asynccontextmanager
+from utils import init_tmp_path, iter_uszips_data
+from core.process_listing import search_doctors, fetch_listing_page, page_count
+from core.process_detail import process_provider
+from core.dead_letter import DETAIL
+from core.pipeline import DetailStage, unit_details
+from core.memory import MemoryReporter
+from core.metrics import QUEUE_DEPTH, serve_metrics, snapshot_periodically, write_snapshot
+from core.tracing import tracer, span
+from core.records import WorkUnit, plan_type_of
+from core.context import get_context
+from core.event_loop import run_async
+from logger.logger import get_logger, log_context
+from settings import SEMAPHORE, BATCH_SIZE, MEMORY_REPORT_INTERVAL, METRICS_PORT, METRICS_SNAPSHOT_PATH, METRICS_SNAPSHOT_INTERVAL, TRACE_PATH
+from settings import RETRY_FAILED_CONCURRENCY, YIELD_RUN_ID
+from settings import JOB_QUEUE_URL, JOB_GRANULARITY, JOB_LEASE_SECONDS, JOB_HEARTBEAT_INTERVAL, JOB_POLL_INTERVAL, JOB_MAX_ATTEMPTS, WORKER_ID
 
-logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
+logger = get_logger("Main")
 
 with open("inputs/raw_files/specialities-doctor-types.json", "r") as f:
     DOCTOR_SPECIALITIES = [{**d, "type": "Doctor"} for d in json.load(f)]
@@ -21,25 +32,23 @@ with open("inputs/raw_files/specialities-dental-types.json", "r") as f:
 with open("inputs/raw_files/plans.json", "r") as f:
     PLANS = json.load(f)
 
-async def main(inputs:dict):
-    dental_specialities = [{**d, "type": "Dental"} for d in DENTAL_SPECIALITIES]
-    doctor_specialities = [{**d, "type": "Doctor"} for d in DOCTOR_SPECIALITIES]
-    pcp_specialities = [{**d, "type": "PCP"} for d in PCP_SPECIALITIES]
+# Built once and shared by every zip and plan.
+MEDICAL_SPECIALITIES = DOCTOR_SPECIALITIES + PCP_SPECIALITIES
 
-    specialities = doctor_specialities + pcp_specialities
-    zipcode = str(inputs['zip']).zfill(5)
-    for plan in PLANS:
-        logger.info(f"Processing plan: {plan}")
-
-        plan_type = "HIP"
-        if plan['LobMctrType'] == 1003:
-            plan_type = "GHI" 
-        
-        coverage_type = plan['CoverageType']
-        if coverage_type == 'D':
-            specialities = dental_specialities
-     
-        await search_doctors(search_params={
+
+def specialities_for(plan: dict) -> list:
+    """Dental specialties for dental coverage, doctor and PCP specialties otherwise."""
+    if plan['CoverageType'] == 'D':
+        return DENTAL_SPECIALITIES
+    return MEDICAL_SPECIALITIES
+
+
+async def search_plan(zipcode: str, plan: dict, specialities: list) -> bool:
+    plan_type = plan_type_of(plan)
+    coverage_type = plan['CoverageType']
+    with span("plan", plan_type=plan_type, network_code=plan['NetworkCode'], coverage_type=coverage_type), \
+            log_context(plan=plan_type, network=plan['NetworkCode'], coverage=coverage_type):
+        return await search_doctors(search_params={
             "zipCode": zipcode,
             "planType": plan_type,
             "networkCode": plan['NetworkCode'],
@@ -48,38 +57,325 @@ async def main(inputs:dict):
             "coverage_type": coverage_type
            })
 
- 
 
-if __name__ == "__main__":
-    init_tmp_path()
-    inputs = read_uszips_data()
-    
-    semaphore = asyncio.Semaphore(SEMAPHORE)  # Controls concurrency within batch
+async def main(inputs:dict) -> bool:
+    zipcode = str(inputs['zip']).zfill(5)
+    complete = True
+    with span("zip", zip=zipcode), log_context(zip=zipcode):
+        for plan in PLANS:
+            if not plan.get('NetworkCode'):
+                logger.warning(f"Skipping plan without NetworkCode: {plan.get('Name')}")
+                continue
+            logger.info(f"Processing plan: {plan}")
+            complete = await search_plan(zipcode, plan, specialities_for(plan)) and complete
+    return complete
+
+
+def work_units(inputs, granularity: str = JOB_GRANULARITY):
+    """
+    Yield the `WorkUnit`s covering the zip rows of ``inputs``.
+
+    Plans sending the same search (plan type, network codes and coverage) share a
+    unit, so duplicate rows of plans.json are only crawled once per zip.
+    """
+    for item in inputs:
+        zipcode = str(item['zip']).zfill(5)
+        if granularity == "zip":
+            yield WorkUnit(zipcode)
+            continue
+
+        seen = set()
+        for plan in PLANS:
+            if not plan.get('NetworkCode'):
+                continue
+            unit = WorkUnit(zipcode, {key: plan.get(key) for key in ("LobMctrType", "NetworkCode", "CoverageType")})
+            if unit.key in seen:
+                continue
+            seen.add(unit.key)
+
+            if granularity == "plan":
+                yield unit
+            else:
+                for sp in specialities_for(plan):
+                    yield WorkUnit(zipcode, unit.plan, sp)
+
+
+async def run_unit(unit: WorkUnit) -> bool:
+    """Crawl one job queue unit. Returns True if every page was fetched."""
+    if unit.plan is None:
+        return await main({"zip": unit.zip})
+
+    specialities = [unit.specialty] if unit.specialty is not None else specialities_for(unit.plan)
+    with span("zip", zip=unit.zip), log_context(zip=unit.zip):
+        return await search_plan(unit.zip, unit.plan, specialities)
+
+
+@asynccontextmanager
+async def observability():
+    """Metrics endpoint, periodic snapshot and memory reporter for the duration of a crawl."""
+    metrics_server = await serve_metrics(METRICS_PORT) if METRICS_PORT else None
+    snapshot_task = asyncio.create_task(snapshot_periodically(METRICS_SNAPSHOT_PATH, METRICS_SNAPSHOT_INTERVAL))
+    memory_task = asyncio.create_task(MemoryReporter().run()) if MEMORY_REPORT_INTERVAL else None
+    try:
+        yield
+    finally:
+        snapshot_task.cancel()
+        if memory_task:
+            memory_task.cancel()
+        if metrics_server:
+            metrics_server.close()
+        await get_context().aclose()
+        write_snapshot(METRICS_SNAPSHOT_PATH)
+        tracer.close()
+
+
+async def process_all_batches(inputs, on_item_done=None, total: int | None = None):
+    """
+    Crawl the zip rows of ``inputs`` with SEMAPHORE zips in flight.
+
+    ``inputs`` may be any iterable and is read lazily: at most BATCH_SIZE rows wait in a
+    bounded queue ahead of the zips in flight. Provider details go through a `DetailStage`,
+    so listing pages wait for room in its queue instead of piling up, and a zip counts as
+    done once its details are processed.
+
+    Args:
+        inputs (Iterable[dict]): Zip code rows as yielded by `iter_uszips_data`.
+        on_item_done (callable | None): Called with the input item after it has been processed,
+            used by the multi-process launcher to report progress.
+        total (int | None): Number of rows, for progress reporting; ``len(inputs)`` if it has one.
+    """
+    if total is None and hasattr(inputs, "__len__"):
+        total = len(inputs)
+    pending = asyncio.Queue(maxsize=max(1, BATCH_SIZE))
+    done = 0
+
+    async def feed():
+        read = 0
+        for input_item in inputs:
+            await pending.put(input_item)
+            read += 1
+            QUEUE_DEPTH.set(pending.qsize(), stage="zip_waiting")
+            if total is not None:
+                QUEUE_DEPTH.set(total - read, stage="zip_pending")
+        for _ in range(SEMAPHORE):
+            await pending.put(None)
+
+    async def worker():
+        nonlocal done
+        while (input_item := await pending.get()) is not None:
+            QUEUE_DEPTH.set(pending.qsize(), stage="zip_waiting")
+            QUEUE_DEPTH.inc(stage="zip_in_flight")
+            try:
+                async with unit_details():
+                    await main(input_item)
+            except Exception as e:
+                logger.error(f"Zip {input_item.get('zip')} failed: {type(e).__name__}: {e}")
+            finally:
+                QUEUE_DEPTH.dec(stage="zip_in_flight")
+                if on_item_done:
+                    on_item_done(input_item)
+            done += 1
+            if done % max(1, BATCH_SIZE) == 0:
+                logger.info(f"Completed {done}{f'/{total}' if total is not None else ''} zips")
+
+    logger.info(f"Processing {total if total is not None else 'streamed'} zips with {SEMAPHORE} concurrent tasks")
+    async with observability(), DetailStage():
+        feeder = asyncio.create_task(feed())
+        try:
+            await asyncio.gather(*(worker() for _ in range(SEMAPHORE)))
+        finally:
+            feeder.cancel()
+        QUEUE_DEPTH.set(0, stage="zip_pending")
+    logger.info(f"Completed {done} zips")
+
+
+async def process_queue(job_queue, worker_id: str):
+    """
+    Claim and crawl units from a shared job queue until none are left.
+
+    Up to SEMAPHORE units are leased at a time and their leases are renewed every
+    JOB_HEARTBEAT_INTERVAL seconds while they run. A unit is completed only when
+    all its pages were fetched; otherwise it is handed back for another attempt.
+    When every remaining unit is leased by other workers, the loop keeps polling
+    so units of crashed workers are picked up once their lease expires.
+
+    Args:
+        job_queue (JobQueue): The queue backend (see `core/job_queue.py`).
+        worker_id (str): Identity of this worker in the queue.
+    """
+    in_flight = {}
 
-    async def limited_main(input_item):
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+            if in_flight:
+                renewed = await asyncio.to_thread(job_queue.heartbeat, worker_id, list(in_flight))
+                if renewed < len(in_flight):
+                    logger.warning(f"Lost the lease of {len(in_flight) - renewed} in-flight units")
+
+    async def work(job):
+        error = ""
+        try:
+            # The unit is only complete once the details of its providers are processed too.
+            async with unit_details():
+                complete = await run_unit(WorkUnit.from_payload(job.payload))
+        except Exception as e:
+            complete = False
+            error = f"{type(e).__name__}: {e}"
+        try:
+            if complete:
+                await asyncio.to_thread(job_queue.complete, job.key, worker_id)
+            else:
+                logger.warning(f"Unit {job.key} incomplete (attempt {job.attempts}), handing it back")
+                await asyncio.to_thread(job_queue.fail, job.key, worker_id, error or "incomplete")
+        finally:
+            in_flight.pop(job.key, None)
+            QUEUE_DEPTH.set(len(in_flight), stage="jobs_in_flight")
+
+    async with observability(), DetailStage():
+        heartbeat_task = asyncio.create_task(heartbeat())
+        try:
+            while True:
+                free = SEMAPHORE - len(in_flight)
+                jobs = await asyncio.to_thread(job_queue.claim, worker_id, free) if free > 0 else []
+                for job in jobs:
+                    in_flight[job.key] = asyncio.create_task(work(job))
+                QUEUE_DEPTH.set(len(in_flight), stage="jobs_in_flight")
+
+                if in_flight:
+                    await asyncio.wait(list(in_flight.values()), return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+                stats = await asyncio.to_thread(job_queue.stats)
+                if not stats.get("pending", 0) and not stats.get("leased", 0):
+                    break
+                logger.info(f"Waiting for units leased by other workers: {stats}")
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+        finally:
+            heartbeat_task.cancel()
+            for task in in_flight.values():
+                task.cancel()
+
+    logger.info(f"Job queue drained: {await asyncio.to_thread(job_queue.stats)}")
+
+
+async def redrive(letter: dict) -> bool:
+    """Run a dead-lettered unit again. Returns True if it succeeded."""
+    unit = letter["unit"]
+    if letter["kind"] == DETAIL:
+        return await process_provider(unit["provider"], unit["plan_type"], unit["network_code"],
+                                      unit["service_type"], unit["provider_speciality"])
+
+    search_params, sp, page = unit["search_params"], unit["specialty"], unit["page"]
+    with span("listing.page", page=page, specialty=sp["code"], zip=search_params.get("zipCode")), \
+            log_context(zip=search_params.get("zipCode"), plan=search_params.get("planType"), specialty=sp["code"],
+                        service_type=sp["type"], page=page):
+        listing = await fetch_listing_page(search_params, sp["type"], sp["code"], page)
+        if listing is not None and page == 1:
+            # The later pages were never attempted: their count comes from the first one.
+            # Each of them is dead-lettered on its own if it fails.
+            for next_page in range(2, page_count(listing.total_records) + 1):
+                await fetch_listing_page(search_params, sp["type"], sp["code"], next_page)
+    return listing is not None
+
+
+async def retry_failed(concurrency: int = RETRY_FAILED_CONCURRENCY):
+    """
+    Re-drive the pending units of the dead-letter store, ``concurrency`` at a time.
+
+    Units that succeed are marked resolved; units that fail again are stored again,
+    with their new failure class and error.
+    """
+    store = get_context().dead_letters
+    letters = store.pending()
+    logger.info(f"Retrying {len(letters)} dead-lettered units: {store.stats()}")
+    semaphore = asyncio.Semaphore(concurrency)
+    resolved = 0
+
+    async def retry(letter):
+        nonlocal resolved
         async with semaphore:
-            await main(input_item)
-            gc.collect()  # free memory after each item
-
-    async def process_batch(batch):
-        """Process a single batch with controlled concurrency"""
-        logger.info(f"Processing {len(batch)} items in this batch with {SEMAPHORE} concurrent tasks")
-        await asyncio.gather(
-            *(limited_main(input_item) for input_item in batch), 
-            return_exceptions=True
-        )
-        gc.collect()  # free memory after each batch
-
-    async def process_all_batches():
-        """Process all inputs in batches sequentially"""
-        total_batches = (len(inputs) + BATCH_SIZE - 1) // BATCH_SIZE
-        
-        for i in range(0, len(inputs), BATCH_SIZE):
-            batch = inputs[i:i + BATCH_SIZE]
-            batch_num = i // BATCH_SIZE + 1
-            
-            logger.info(f"Starting batch {batch_num}/{total_batches} ({len(batch)} items)")
-            await process_batch(batch)
-            logger.info(f"Completed batch {batch_num}/{total_batches}")
-
-    asyncio.run(process_all_batches())
\ No newline at end of file
+            try:
+                ok = await redrive(letter)
+            except Exception as e:
+                logger.error(f"Retry of {letter['key']} failed: {e}")
+                ok = False
+            if ok:
+                store.resolve(letter["key"])
+                resolved += 1
+
+    async with observability():
+        await asyncio.gather(*(retry(letter) for letter in letters))
+    logger.info(f"Resolved {resolved}/{len(letters)} dead-lettered units; still pending: {store.stats()}")
+
+
+def run(inputs, on_item_done=None, total: int | None = None):
+    """
+    Crawl ``inputs`` (a list or an iterable of zip rows) on a fresh event loop in the current process.
+    A crawl that does not return continues its yield statistics run when started again.
+    """
+    from core.yield_stats import begin_run, finish_run
+
+    if TRACE_PATH:
+        tracer.start(TRACE_PATH)
+    try:
+        begin_run(get_context().cache)
+        run_async(process_all_batches(inputs, on_item_done, total))
+        finish_run(get_context().cache)
+    finally:
+        get_context().close()
+
+
+def run_queue(queue_url: str, worker_id: str = WORKER_ID, seed: bool = False):
+    """
+    Crawl units from the job queue at ``queue_url``, seeding it first from the Excel inputs if ``seed``.
+    Seeding is idempotent, so every node of a multi-machine run may pass it.
+    """
+    from core.job_queue import open_job_queue, default_worker_id
+    from core.yield_stats import run_id, set_run_id
+
+    job_queue = open_job_queue(queue_url, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS)
+    try:
+        if seed:
+            added = job_queue.enqueue_many((unit.key, unit.payload()) for unit in work_units(iter_uszips_data()))
+            logger.info(f"Seeded {added} new {JOB_GRANULARITY} units: {job_queue.stats()}")
+        if not YIELD_RUN_ID:
+            # Every node of the queue counts its searches under the run id of the first node.
+            set_run_id(job_queue.meta("yield_run_id", run_id()))
+        if TRACE_PATH:
+            tracer.start(TRACE_PATH)
+        run_async(process_queue(job_queue, worker_id or default_worker_id()))
+    finally:
+        job_queue.close()
+        get_context().close()
+
+
+def run_retry_failed(concurrency: int = RETRY_FAILED_CONCURRENCY):
+    """Re-drive the dead-letter store on a fresh event loop, counting its searches in the last run."""
+    from core.yield_stats import begin_run
+
+    if TRACE_PATH:
+        tracer.start(TRACE_PATH)
+    try:
+        begin_run(get_context().cache, resume_finished=True)
+        run_async(retry_failed(concurrency))
+    finally:
+        get_context().close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl EmblemHealth provider listings.")
+    parser.add_argument("--queue", default=JOB_QUEUE_URL, help="Job queue URL (e.g. sqlite:////mnt/shared/jobs.db); omit to crawl the Excel inputs directly")
+    parser.add_argument("--seed", action="store_true", help="Enqueue the Excel inputs before working the queue")
+    parser.add_argument("--worker-id", default=WORKER_ID)
+    parser.add_argument("--retry-failed", action="store_true", help="Only re-drive the units recorded in the dead-letter store")
+    parser.add_argument("--retry-concurrency", type=int, default=RETRY_FAILED_CONCURRENCY)
+    args = parser.parse_args()
+
+    init_tmp_path()
+    if args.retry_failed:
+        run_retry_failed(args.retry_concurrency)
+    elif args.queue:
+        run_queue(args.queue, args.worker_id, args.seed)
+    else:
+        run(iter_uszips_data())
@@ -0,0 +1,35 @@
+import argparse
+import json
+import os
+import sys
+
+from core.provider_store import ProviderStore
+from settings import PROVIDER_STORE_PATH
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the provider store filled by crawls with PROVIDER_STORE_PATH set.")
+    parser.add_argument("--db", default=PROVIDER_STORE_PATH, help="Provider store database (default: PROVIDER_STORE_PATH)")
+    parser.add_argument("--zip", help="Print the providers listed for this zip, one JSON object per line")
+    parser.add_argument("--plan", help="With --zip, only this planType")
+    parser.add_argument("--network", help="With --zip, only this networkCode")
+    parser.add_argument("--specialty", help="With --zip, only this specialty")
+    parser.add_argument("--id", help="Print the stored listing entry and detail of one ProviderId")
+    args = parser.parse_args()
+
+    if not args.db or not os.path.exists(args.db):
+        sys.exit(f"No provider store at {args.db!r}; set PROVIDER_STORE_PATH or pass --db")
+    store = ProviderStore(args.db)
+    try:
+        if args.id:
+            row = store.get(args.id)
+            if row is None:
+                sys.exit(f"Provider {args.id} is not in the store")
+            print(json.dumps(row))
+        elif args.zip:
+            for row in store.providers_for_zip(args.zip, args.plan, args.network, args.specialty):
+                print(json.dumps(row))
+        else:
+            print(json.dumps(store.stats()))
+    finally:
+        store.close()
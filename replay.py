@@ -0,0 +1,137 @@
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from core.extract import listing_records, extract_ip_result, detail_record
+from core.outputs import parse_listing_filename, parse_detail_filename, iter_raw, load_raw
+from core.context import get_context
+from logger.logger import get_logger
+from settings import DERIVED_PATH
+
+logger = get_logger("Replay")
+
+KINDS = ("listing", "detail")
+
+
+def replay_file(task: tuple[str, str, str | None]) -> tuple[str, str, object, float, str | None]:
+    """
+    Run one saved response through the same extraction path as the live crawl.
+
+    Executed in worker processes, so it only touches the filesystem. Packs are
+    memory-mapped once per worker.
+
+    Returns:
+        tuple: ``(kind, path, records, mtime, error)``. ``records`` is a list of provider
+            records for listing pages and a single record for details.
+    """
+    kind, path, key = task
+    try:
+        name, raw, mtime = load_raw(kind, path, key)
+        if key is not None:
+            path = f"{path}:{name}"
+        content = json.loads(raw)
+
+        if kind == "listing":
+            context = parse_listing_filename(name)
+            if context is None:
+                return kind, path, None, mtime, "unrecognised listing filename"
+            return kind, path, listing_records(content, context), mtime, None
+
+        provider_id = parse_detail_filename(name)
+        ip_result = extract_ip_result(content.get("body", ""))
+        if not ip_result:
+            return kind, path, None, mtime, "no IPResult in saved response"
+        return kind, path, detail_record(provider_id, ip_result), mtime, None
+    except Exception as e:
+        return kind, path, None, 0.0, f"{type(e).__name__}: {e}"
+
+
+def replay(kinds: tuple = KINDS, workers: int | None = None, chunksize: int = 64, populate_cache: bool = True) -> dict:
+    """
+    Rebuild the derived outputs under DERIVED_PATH from the raw files under OUTPUT_PATH,
+    loose or packed by ``compact.py``.
+
+    Files are parsed in parallel across a process pool; the parent process is the
+    only writer of the NDJSON outputs and of the LMDB cache (opened through the
+    process `AppContext`, so forked pool workers never inherit it). Each derived file is
+    written next to its final name and swapped in atomically once complete.
+
+    Args:
+        kinds (tuple): Which raw outputs to replay, any of "listing" and "detail".
+        workers (int | None): Worker processes; defaults to the CPU count.
+        chunksize (int): Files handed to a worker at a time.
+        populate_cache (bool): Mark replayed providers as processed in the LMDB cache.
+
+    Returns:
+        dict: Counters of files, records and errors per kind.
+    """
+    os.makedirs(DERIVED_PATH, exist_ok=True)
+    stats = {kind: {"files": 0, "records": 0, "errors": 0} for kind in kinds}
+    outputs = {
+        "listing": os.path.join(DERIVED_PATH, "listing_providers.ndjson"),
+        "detail": os.path.join(DERIVED_PATH, "provider_details.ndjson"),
+    }
+    handles = {kind: open(f"{outputs[kind]}.tmp", "w") for kind in kinds}
+
+    cache = get_context().cache if populate_cache and "detail" in kinds else None
+    pending_cache = []
+
+    workers = workers or os.cpu_count() or 1
+    tasks = ((kind, path, key) for kind in kinds for path, key in iter_raw(kind))
+    # Feed the pool in windows so millions of paths never sit in memory at once.
+    window = workers * chunksize * 4
+    started = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                batch = list(itertools.islice(tasks, window))
+                if not batch:
+                    break
+                for kind, path, records, mtime, error in pool.map(replay_file, batch, chunksize=chunksize):
+                    stats[kind]["files"] += 1
+                    if error:
+                        stats[kind]["errors"] += 1
+                        logger.warning(f"Skipping {path}: {error}")
+                        continue
+
+                    records = records if isinstance(records, list) else [records]
+                    for record in records:
+                        handles[kind].write(json.dumps(record) + "\n")
+                    stats[kind]["records"] += len(records)
+
+                    if cache is not None and kind == "detail":
+                        pending_cache.append((records[0]["ProviderId"], str(int(mtime))))
+                        if len(pending_cache) >= 1000:
+                            cache.set_many(pending_cache)
+                            pending_cache.clear()
+
+                logger.info(f"Replayed {sum(s['files'] for s in stats.values())} files in {time.perf_counter() - started:.1f}s")
+
+        for kind, handle in handles.items():
+            handle.close()
+            os.replace(f"{outputs[kind]}.tmp", outputs[kind])
+    finally:
+        for handle in handles.values():
+            handle.close()
+        if cache is not None:
+            if pending_cache:
+                cache.set_many(pending_cache)
+            get_context().close()
+
+    logger.info(f"Replay complete: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild derived outputs and the LMDB cache from saved raw responses, without any network.")
+    parser.add_argument("--kind", choices=KINDS, action="append", help="Replay only this kind of raw output (repeatable)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=64)
+    parser.add_argument("--no-cache", action="store_true", help="Do not repopulate the LMDB cache")
+    args = parser.parse_args()
+
+    replay(tuple(args.kind or KINDS), args.workers, args.chunksize, not args.no_cache)
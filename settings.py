@@ -16,6 +16,12 @@ PROXY_PORT=os.getenv("PROXY_PORT")
 PROXY_USERNAME= os.getenv("PROXY_USERNAME")
 PROXY_PASSWORD= os.getenv("PROXY_PASSWORD")
 
+# HTTP transport
+HTTP_BACKEND=os.getenv("HTTP_BACKEND", "httpx-h2").lower() # Library sending requests: httpx-h2, httpx-h1 or aiohttp (pip install aiohttp)
+HTTP_KEEPALIVE=os.getenv("HTTP_KEEPALIVE", "False").lower() == "true" # Reuse pooled connections; off opens one connection per request, so a rotating proxy rotates per request
+HTTP_POOL_SIZE=int(os.getenv("HTTP_POOL_SIZE", 100)) # Connections kept open at once with HTTP_KEEPALIVE
+EVENT_LOOP=os.getenv("EVENT_LOOP", "asyncio").lower() # Event loop of the crawler: asyncio or uvloop (pip install uvloop)
+
 # Browser
 HEADLESS=os.getenv("HEADLESS")
 
@@ -23,6 +29,41 @@ HEADLESS=os.getenv("HEADLESS")
 OUTPUT_PATH=os.getenv("OUTPUT_PATH", "outputs/raw")
 STATIC_FILE_PATH=os.getenv("STATIC_FILE_PATH", "outputs/static")
 TMP_PATH=os.getenv("TMP_PATH", "outputs/tmp")
+DERIVED_PATH=os.getenv("DERIVED_PATH", "outputs/derived") # Outputs rebuilt from raw files by replay.py
+EXPORT_PATH=os.getenv("EXPORT_PATH", "outputs/parquet") # Parquet dataset written by export.py
+OUTPUT_SHARD_DEPTH=int(os.getenv("OUTPUT_SHARD_DEPTH", 2)) # Hash-prefix directory levels of raw listing/detail files; 0 keeps them flat
+
+# Upstream
+AURA_BASE_URL=os.getenv("AURA_BASE_URL", "https://my.emblemhealth.com")
+AURA_FWUID=os.getenv("AURA_FWUID", "VFJhRGxfRlFsN29ySGg2SXFsaUZsQTFLcUUxeUY3ZVB6dE9hR0VheDVpb2cxMy4zMzU1NDQzMi41MDMzMTY0OA") # Framework build id sent in aura.context
+AURA_APP=os.getenv("AURA_APP", "siteforce:communityApp")
+AURA_APP_VERSION=os.getenv("AURA_APP_VERSION", "1411_ppEHPnivv6tDSveOy-pRIw") # Loaded application hash sent in aura.context
+AURA_COMMUNITY_PATH=os.getenv("AURA_COMMUNITY_PATH", "/member/s/find-care-plans") # Page the current aura.context is read from after a deploy
+AURA_REFRESH_COOLDOWN=float(os.getenv("AURA_REFRESH_COOLDOWN", 60)) # Seconds before retrying a failed context refresh
+
+# Cache
+CACHE_PATH=os.getenv("CACHE_PATH", "./lmdb_cache")
+
+# Incremental refresh
+INCREMENTAL=os.getenv("INCREMENTAL", "False").lower() == "true" # Only rewrite changed pages and details, skip fresh details of unchanged providers
+DETAIL_FRESHNESS_DAYS=float(os.getenv("DETAIL_FRESHNESS_DAYS", 30)) # In incremental mode, details fetched more recently are not fetched again
+
+# Dead letters
+DEAD_LETTER_PATH=os.getenv("DEAD_LETTER_PATH", "outputs/dead_letter") # NDJSON segments of permanently failed pages and providers
+RETRY_FAILED_CONCURRENCY=int(os.getenv("RETRY_FAILED_CONCURRENCY", 3)) # Units re-driven at once by --retry-failed
+
+# Provider store
+PROVIDER_STORE_PATH=os.getenv("PROVIDER_STORE_PATH", "") # SQLite database providers are upserted into as they are fetched; empty disables it
+PROVIDER_STORE_BATCH=int(os.getenv("PROVIDER_STORE_BATCH", 500)) # Upserts per write transaction
+PROVIDER_STORE_FLUSH_INTERVAL=float(os.getenv("PROVIDER_STORE_FLUSH_INTERVAL", 1.0)) # Longest time an upsert waits before it is written, in seconds
+
+# Captcha routing
+CAPTCHA_PROVIDERS=os.getenv("CAPTCHA_PROVIDERS", "capsolver") # Providers the router chooses between, in order of preference: capsolver, 2captcha, browser
+CAPTCHA_COSTS=os.getenv("CAPTCHA_COSTS", "capsolver=0.001,2captcha=0.00299,browser=0") # Price per token of each provider (USD)
+CAPTCHA_SOLVE_TIMEOUT=float(os.getenv("CAPTCHA_SOLVE_TIMEOUT", 120)) # Seconds before falling back to the next provider
+CAPTCHA_LATENCY_WEIGHT=float(os.getenv("CAPTCHA_LATENCY_WEIGHT", 0.0001)) # Price of one second of solve latency when ranking providers
+CAPTCHA_FAILURE_THRESHOLD=int(os.getenv("CAPTCHA_FAILURE_THRESHOLD", 3)) # Consecutive failures before a provider cools down
+CAPTCHA_COOLDOWN=float(os.getenv("CAPTCHA_COOLDOWN", 300)) # Seconds a failing provider is skipped
 
 # Browser session path
 PLAYWRIGHT_SESSION_PATH=os.getenv("PLAYWRIGHT_SESSION_PATH", "sessions/recaptcha_profile")
@@ -30,7 +71,66 @@ PLAYWRIGHT_SESSION_PATH=os.getenv("PLAYWRIGHT_SESSION_PATH", "sessions/recaptcha
 # Crawler Flow
 SEQUENTIAL_FLOW=os.getenv("SEQUENTIAL_FLOW", "True").lower() == "true"
 
+# Pagination
+PAGINATION_CUTOFF_PAGES=int(os.getenv("PAGINATION_CUTOFF_PAGES", 0)) # Consecutive pages of already listed providers before a search stops paginating; 0 walks every page
+PAGINATION_SAMPLE_STRIDE=int(os.getenv("PAGINATION_SAMPLE_STRIDE", 0)) # After the cut-off, fetch every Nth page instead of stopping; 0 stops
+
+# Adaptive search radius
+ADAPTIVE_RADIUS=os.getenv("ADAPTIVE_RADIUS", "False").lower() == "true" # Pick the search distance per zip and specialty from observed totalRecords
+RADIUS_LADDER=tuple(float(miles) for miles in os.getenv("RADIUS_LADDER", "5,10,25,50,100").split(",")) # Allowed distances in miles
+RADIUS_DEFAULT_MILES=float(os.getenv("RADIUS_DEFAULT_MILES", 50)) # Distance of every search when ADAPTIVE_RADIUS is off, and of searches without a learned radius when it is on
+RADIUS_TARGET_PAGES=int(os.getenv("RADIUS_TARGET_PAGES", 4)) # Shrink the radius of searches with more listing pages than this
+RADIUS_MIN_RECORDS=int(os.getenv("RADIUS_MIN_RECORDS", 0)) # Widen the radius of searches with fewer records than this; 0 never widens
+RADIUS_FLOOR_NEIGHBOURS=int(os.getenv("RADIUS_FLOOR_NEIGHBOURS", 3)) # The radius never drops below the distance to this many nearest input zips
+
+# Yield statistics
+YIELD_SKIP_EMPTY=os.getenv("YIELD_SKIP_EMPTY", "False").lower() == "true" # Skip plan/specialty searches that were empty across their zip3 region in the last run
+YIELD_REPROBE_RATE=float(os.getenv("YIELD_REPROBE_RATE", 0.1)) # Share of predicted empty searches that are searched anyway
+YIELD_MIN_SEARCHES=int(os.getenv("YIELD_MIN_SEARCHES", 1)) # Empty searches a region needs in the last run before it is predicted empty
+YIELD_RUN_ID=os.getenv("YIELD_RUN_ID", "") # Id shared by all workers of one run; by default a crawl continues the unfinished run recorded in the cache, or the run stored with its job queue
+
 # Concurrency Control
 SEMAPHORE=int(os.getenv("SEMAPHORE", 5))
-BATCH_SIZE=int(os.getenv("BATCH_SIZE", 50))
+BATCH_SIZE=int(os.getenv("BATCH_SIZE", 50)) # Zip rows read ahead of the SEMAPHORE zips in flight
+DETAIL_WORKERS=int(os.getenv("DETAIL_WORKERS", 5)) # Provider details fetched at once by the detail stage
+DETAIL_QUEUE_SIZE=int(os.getenv("DETAIL_QUEUE_SIZE", 250)) # Providers waiting for the detail stage before listing pages wait for room
+PACING_DELAY_MIN=float(os.getenv("PACING_DELAY_MIN", 0.5)) # Random delay before each listing request
+PACING_DELAY_MAX=float(os.getenv("PACING_DELAY_MAX", 1.5))
+
+# Memory reporting
+MEMORY_REPORT_INTERVAL=float(os.getenv("MEMORY_REPORT_INTERVAL", 0)) # Seconds between RSS log lines; 0 disables the reporter
+MEMORY_TRACEMALLOC_FRAMES=int(os.getenv("MEMORY_TRACEMALLOC_FRAMES", 0)) # Stack frames tracemalloc records per allocation; 0 reports RSS only
+MEMORY_TOP_N=int(os.getenv("MEMORY_TOP_N", 10)) # Allocation sites listed per report
+
+# Retry policy
+RETRY_MAX_ATTEMPTS=int(os.getenv("RETRY_MAX_ATTEMPTS", 4))
+RETRY_BASE_DELAY=float(os.getenv("RETRY_BASE_DELAY", 1.0))
+RETRY_MAX_DELAY=float(os.getenv("RETRY_MAX_DELAY", 30.0))
+RETRY_BUDGET_RATIO=float(os.getenv("RETRY_BUDGET_RATIO", 0.2)) # Retries allowed as a fraction of first attempts
+RETRY_BUDGET_MIN_PER_SEC=float(os.getenv("RETRY_BUDGET_MIN_PER_SEC", 1.0))
+BREAKER_FAILURE_THRESHOLD=int(os.getenv("BREAKER_FAILURE_THRESHOLD", 20)) # Consecutive failures before pausing traffic
+BREAKER_RESET_TIMEOUT=float(os.getenv("BREAKER_RESET_TIMEOUT", 30.0))
+
+# Metrics
+METRICS_PORT=int(os.getenv("METRICS_PORT", 0)) # 0 disables the Prometheus endpoint
+METRICS_SNAPSHOT_PATH=os.getenv("METRICS_SNAPSHOT_PATH", "outputs/static/metrics.json")
+METRICS_SNAPSHOT_INTERVAL=float(os.getenv("METRICS_SNAPSHOT_INTERVAL", 30))
+
+# Tracing
+TRACE_PATH=os.getenv("TRACE_PATH", "") # Chrome trace-event file; empty disables tracing
+
+# Logging
+LOG_LEVEL=os.getenv("LOG_LEVEL", "DEBUG").upper()
+LOG_FORMAT=os.getenv("LOG_FORMAT", "json").lower() # Log file format: json (one object per line) or text
+LOG_DEBUG_SAMPLE_RATE=float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 1.0)) # Fraction of DEBUG records kept
+LOG_RATE_LIMIT=int(os.getenv("LOG_RATE_LIMIT", 20)) # DEBUG records per call site and second; 0 disables
+
 
+# Distributed job queue
+JOB_QUEUE_URL=os.getenv("JOB_QUEUE_URL", "") # e.g. sqlite:////mnt/shared/jobs.db; empty crawls the Excel inputs directly
+JOB_GRANULARITY=os.getenv("JOB_GRANULARITY", "plan") # Unit of work: zip, plan (zip + plan) or specialty (zip + plan + specialty)
+JOB_LEASE_SECONDS=float(os.getenv("JOB_LEASE_SECONDS", 600))
+JOB_HEARTBEAT_INTERVAL=float(os.getenv("JOB_HEARTBEAT_INTERVAL", 60))
+JOB_POLL_INTERVAL=float(os.getenv("JOB_POLL_INTERVAL", 30)) # Wait before re-polling while other workers hold the remaining leases
+JOB_MAX_ATTEMPTS=int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+WORKER_ID=os.getenv("WORKER_ID", "") # Defaults to <hostname>-<pid>
@@ -1,6 +1,13 @@
 import os
+import struct
+from array import array
 from settings import STATIC_FILE_PATH, OUTPUT_PATH, PLAYWRIGHT_SESSION_PATH
 
+# Header of the compact zip cache: magic, source mtime (ns), source size, row count.
+_ZIP_CACHE_HEADER = struct.Struct("<8sQQI")
+_ZIP_CACHE_MAGIC = b"EMZIP001"
+ZIP_COLUMNS = ("zip", "lat", "lng", "state_id")
+
 def init_tmp_path():
     """
     Method to initialize the final output dirs. Creates dirs if not already created
@@ -12,19 +19,83 @@ def init_tmp_path():
 
 
 
-def read_uszips_data(file_path:str = 'inputs/uszips.xlsx') -> list:
+def _zip_cache_path(file_path: str) -> str:
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(STATIC_FILE_PATH, f"{name}.zipcache")
+
+
+def _load_zip_cache(cache_path: str, stat: os.stat_result) -> tuple | None:
     """
-    Reads the 'inputs/uszips.xlsx' file and returns its content as a list of dictionaries.
-    Each dictionary represents a row, with column headers as keys.
+    Load the columns of the compact zip cache as ``(zips, lats, lngs, states)``,
+    or None if it is missing or was built from another version of the Excel file.
     """
+    try:
+        with open(cache_path, "rb") as f:
+            magic, mtime_ns, size, count = _ZIP_CACHE_HEADER.unpack(f.read(_ZIP_CACHE_HEADER.size))
+            if magic != _ZIP_CACHE_MAGIC or mtime_ns != stat.st_mtime_ns or size != stat.st_size:
+                return None
+            zips, lats, lngs = array("I"), array("d"), array("d")
+            zips.fromfile(f, count)
+            lats.fromfile(f, count)
+            lngs.fromfile(f, count)
+            states = f.read(2 * count).decode("ascii")
+    except (OSError, struct.error, EOFError):
+        return None
+    return zips, lats, lngs, states
+
+
+def _build_zip_cache(file_path: str, cache_path: str, stat: os.stat_result):
+    """Parse the Excel file once and store the columns the crawler uses as typed arrays."""
     import pandas as pd
-    
+
+    df = pd.read_excel(file_path, usecols=list(ZIP_COLUMNS))
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_ZIP_CACHE_HEADER.pack(_ZIP_CACHE_MAGIC, stat.st_mtime_ns, stat.st_size, len(df)))
+        array("I", (int(z) for z in df["zip"])).tofile(f)
+        array("d", (float(lat) for lat in df["lat"])).tofile(f)
+        array("d", (float(lng) for lng in df["lng"])).tofile(f)
+        f.write("".join(str(state)[:2].ljust(2) for state in df["state_id"]).encode("ascii"))
+    # Concurrent processes may build the cache at the same time; the last rename wins.
+    os.replace(tmp_path, cache_path)
+
+
+def iter_uszips_data(file_path: str = 'inputs/uszips.xlsx'):
+    """
+    Yield the rows of the 'inputs/uszips.xlsx' file one at a time, as dictionaries with the
+    `zip`, `lat`, `lng` and `state_id` columns.
+
+    Parsing the Excel file takes seconds, so the columns are cached as typed arrays under
+    STATIC_FILE_PATH on first use and reloaded in milliseconds until the Excel file changes.
+    Only those arrays are held in memory; a row's dictionary is built when it is yielded.
+    """
     try:
-        df = pd.read_excel(file_path)
-        return df.to_dict(orient='records')
+        stat = os.stat(file_path)
+        cache_path = _zip_cache_path(file_path)
+        columns = _load_zip_cache(cache_path, stat)
+        if columns is None:
+            _build_zip_cache(file_path, cache_path, stat)
+            columns = _load_zip_cache(cache_path, stat)
     except FileNotFoundError:
         print(f"Error: The file '{file_path}' was not found.")
-        return []
+        return
     except Exception as e:
         print(f"An error occurred while reading the Excel file: {e}")
-        return []
+        return
+    if columns is None:
+        print(f"An error occurred while reading the zip cache of '{file_path}'")
+        return
+
+    zips, lats, lngs, states = columns
+    for i in range(len(zips)):
+        yield {"zip": zips[i], "lat": lats[i], "lng": lngs[i], "state_id": states[2 * i:2 * i + 2]}
+
+
+def read_uszips_data(file_path:str = 'inputs/uszips.xlsx') -> list:
+    """
+    Reads the 'inputs/uszips.xlsx' file and returns its content as a list of dictionaries
+    with the `zip`, `lat`, `lng` and `state_id` columns (see `iter_uszips_data`).
+    """
+    return list(iter_uszips_data(file_path))